@@ -0,0 +1,134 @@
+"""A local stand-in for the parts of the Discord HTTP API the bot uses.
+
+Answers message sends and webhook executions after a configurable latency,
+and injects 429 responses and permanent failures at configurable rates. It
+runs in its own process so its work doesn't compete with the bot's loop.
+Timestamps use time.monotonic(), which is shared between processes.
+
+    python -m benchmarks.fake_discord --port 8090 --latency-ms 50 --rate-limit-rate 0.01
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import re
+import time
+from dataclasses import dataclass, asdict
+
+from aiohttp import web
+
+MARKER = re.compile(rb"\[bench:(\d+)\]")
+
+
+@dataclass
+class FakeDiscordConfig:
+    latency_ms: float = 50.0
+    rate_limit_rate: float = 0.0
+    failure_rate: float = 0.0
+    retry_after: float = 0.05
+    seed: int = 0
+
+
+class FakeDiscord:
+    def __init__(self, config: FakeDiscordConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.rate_limited = 0
+        self.failed = 0
+        # marker -> [messages, monotonic time of the last one]
+        self.markers: dict[int, list] = {}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/v10/users/@me", self.me)
+        app.router.add_post("/api/v10/channels/{channel_id}/messages", self.send)
+        app.router.add_post("/api/v10/webhooks/{webhook_id}/{token}", self.send)
+        app.router.add_get("/_bench/stats", self.stats)
+        app.router.add_post("/_bench/reset", self.reset_handler)
+        app.router.add_post("/_bench/config", self.configure)
+        return app
+
+    async def me(self, request: web.Request) -> web.Response:
+        return web.json_response({"id": "1", "username": "bench", "discriminator": "0", "avatar": None, "bot": True})
+
+    async def send(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        config = self.config
+        if config.latency_ms:
+            await asyncio.sleep(config.latency_ms / 1000 * self.random.uniform(0.5, 1.5))
+
+        roll = self.random.random()
+        if roll < config.rate_limit_rate:
+            self.rate_limited += 1
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": config.retry_after, "global": False},
+                status=429,
+                headers={"Retry-After": str(config.retry_after), "X-RateLimit-Scope": "user"},
+            )
+        if roll < config.rate_limit_rate + config.failure_rate:
+            self.failed += 1
+            if self.random.random() < 0.5:
+                return web.json_response({"message": "Missing Permissions", "code": 50013}, status=403)
+            return web.json_response({"message": "Unknown Channel", "code": 10003}, status=404)
+
+        now = time.monotonic()
+        self.messages += 1
+        for marker in MARKER.findall(body):
+            entry = self.markers.setdefault(int(marker), [0, now])
+            entry[0] += 1
+            entry[1] = now
+        return web.json_response(
+            {"id": str(self.messages), "channel_id": request.match_info.get("channel_id", "0")},
+            headers={
+                "X-RateLimit-Limit": "1000",
+                "X-RateLimit-Remaining": "999",
+                "X-RateLimit-Reset-After": "1",
+                "X-RateLimit-Bucket": "bench",
+            },
+        )
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "messages": self.messages,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "markers": self.markers,
+        })
+
+    async def reset_handler(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({})
+
+    async def configure(self, request: web.Request) -> web.Response:
+        self.config = FakeDiscordConfig(**{**asdict(self.config), **await request.json()})
+        self.random = random.Random(self.config.seed)
+        return web.json_response(asdict(self.config))
+
+
+def serve(port: int, config: FakeDiscordConfig):
+    web.run_app(FakeDiscord(config).app(), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def start_in_process(port: int, config: FakeDiscordConfig) -> multiprocessing.Process:
+    process = multiprocessing.Process(target=serve, args=(port, config), daemon=True)
+    process.start()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Discord HTTP API")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    serve(args.port, FakeDiscordConfig(args.latency_ms, args.rate_limit_rate, args.failure_rate, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""A local stand-in for Statuspage's public status API.
+
+Serves /{page}/api/v2/summary.json and /{page}/api/v2/incidents.json for any
+number of pages. Every --change-interval seconds one random page changes: a
+component changes status, or an incident is opened, updated or resolved.
+Responses carry an ETag and Last-Modified and answer conditional requests
+with 304, so the poller can be exercised end to end:
+
+    python -m benchmarks.fake_statuspage --port 8091 --pages 200
+    POLL_SOURCES=page0=http://127.0.0.1:8091/page0,... python main.py
+"""
+import argparse
+import asyncio
+import random
+from email.utils import formatdate
+
+from aiohttp import web
+
+from benchmarks.payloads import COMPONENT_STATUSES, COMPONENTS, INCIDENT_STAGES, UPDATE_BODIES, PayloadGenerator
+
+
+class FakePage:
+    def __init__(self, name: str, rng: random.Random):
+        self.name = name
+        self.random = rng
+        self.version = 0
+        self.modified = formatdate(usegmt=True)
+        self.components = {
+            component.lower().replace(" ", "-"): {"name": component, "status": "operational"}
+            for component in COMPONENTS
+        }
+        self.open_incidents: dict[str, dict] = {}
+        self.resolved: list[dict] = []
+        self.updates = 0
+
+    def change(self, now: str):
+        roll = self.random.random()
+        if roll < 0.5:
+            component_id = self.random.choice(list(self.components))
+            component = self.components[component_id]
+            component["status"] = self.random.choice([s for s in COMPONENT_STATUSES if s != component["status"]])
+            component["updated_at"] = now
+        elif self.open_incidents and roll < 0.85:
+            incident = self.open_incidents[self.random.choice(list(self.open_incidents))]
+            stage = INCIDENT_STAGES[INCIDENT_STAGES.index(incident["status"]) + 1]
+            self._add_update(incident, stage, now)
+            if stage == "resolved":
+                self.resolved.insert(0, self.open_incidents.pop(incident["id"]))
+                del self.resolved[50:]
+        else:
+            component = self.random.choice(COMPONENTS)
+            incident = {
+                "id": f"{self.name}-incident-{self.updates}",
+                "name": f"Elevated errors on {component}",
+                "impact": self.random.choice(["minor", "major", "critical"]),
+                "created_at": now,
+                "incident_updates": [],
+                "component": component,
+            }
+            self._add_update(incident, "investigating", now)
+            self.open_incidents[incident["id"]] = incident
+        self.version += 1
+        self.modified = formatdate(usegmt=True)
+
+    def _add_update(self, incident: dict, status: str, now: str):
+        self.updates += 1
+        incident["status"] = status
+        incident["updated_at"] = now
+        incident["incident_updates"].insert(0, {
+            "id": f"{self.name}-update-{self.updates}",
+            "status": status,
+            "body": UPDATE_BODIES[status].format(component=incident["component"]),
+            "created_at": now,
+        })
+
+    def _page(self) -> dict:
+        worst = max((COMPONENT_STATUSES.index(c["status"]) for c in self.components.values()), default=0)
+        indicator = ["none", "minor", "minor", "major", "critical"][worst]
+        return {
+            "page": {"id": self.name, "name": self.name, "url": f"https://{self.name}.example.com"},
+            "status": {"indicator": indicator, "description": "All Systems Operational" if worst == 0 else "Partial System Outage"},
+        }
+
+    def summary(self) -> dict:
+        return {
+            **self._page(),
+            "components": [{"id": cid, **component} for cid, component in self.components.items()],
+            "incidents": list(self.open_incidents.values()),
+            "scheduled_maintenances": [],
+        }
+
+    def incidents(self) -> dict:
+        return {**self._page(), "incidents": list(self.open_incidents.values()) + self.resolved}
+
+
+class FakeStatuspage:
+    def __init__(self, pages: int, seed: int = 0):
+        self.random = random.Random(seed)
+        self.clock = PayloadGenerator(seed=seed)
+        self.pages = {f"page{n}": FakePage(f"page{n}", self.random) for n in range(pages)}
+        self.requests = 0
+        self.not_modified = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/{page}/api/v2/summary.json", self.summary)
+        app.router.add_get("/{page}/api/v2/incidents.json", self.incidents)
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_post("/_change/{page}", self.change_handler)
+        return app
+
+    def change(self, page: FakePage):
+        self.clock.payload(0)
+        page.change(self.clock.now.strftime("%Y-%m-%dT%H:%M:%S.000Z"))
+
+    async def summary(self, request: web.Request) -> web.Response:
+        page = self.pages.get(request.match_info["page"])
+        if page is None:
+            raise web.HTTPNotFound()
+        self.requests += 1
+        etag = f'"{page.name}-{page.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(page.summary(), headers={"ETag": etag, "Last-Modified": page.modified})
+
+    async def incidents(self, request: web.Request) -> web.Response:
+        page = self.pages.get(request.match_info["page"])
+        if page is None:
+            raise web.HTTPNotFound()
+        return web.json_response(page.incidents())
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": self.requests, "not_modified": self.not_modified})
+
+    async def change_handler(self, request: web.Request) -> web.Response:
+        page = self.pages.get(request.match_info["page"])
+        if page is None:
+            raise web.HTTPNotFound()
+        self.change(page)
+        return web.json_response({"version": page.version})
+
+    async def change_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.change(self.random.choice(list(self.pages.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Statuspage status API")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--change-interval", type=float, default=5.0, help="seconds between changes (0 disables)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeStatuspage(args.pages, args.seed)
+    app = fake.app()
+    if args.change_interval:
+        async def start_changes(app):
+            task = asyncio.create_task(fake.change_loop(args.change_interval))
+            yield
+            task.cancel()
+        app.cleanup_ctx.append(start_changes)
+    print("POLL_SOURCES=" + ",".join(f"{name}=http://127.0.0.1:{args.port}/{name}" for name in fake.pages))
+    web.run_app(app, host="127.0.0.1", port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""End-to-end webhook-to-send latency benchmark.
+
+Posts Statuspage webhooks to the FastAPI app and measures the time until the
+notification has been sent to every channel, with Discord replaced by an
+in-process stub. Compares the integrated runtime (uvicorn serving on the
+bot's loop) with the old model of uvicorn in its own thread, where every
+accepted webhook had to be handed over to the bot's loop.
+
+    python -m benchmarks.latency_bench [--webhooks N] [--channels N] [--concurrency N] [--interval S]
+
+With no interval the webhooks are posted as fast as they are acknowledged,
+which measures latency under saturation; an interval of a few times the
+per-webhook cost measures latency on an otherwise idle bot.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("FANOUT_GLOBAL_RATE", "1000000")
+os.environ.setdefault("COALESCE_WINDOW", "0")
+
+import aiohttp
+import uvicorn
+
+from src.bot.database import Database
+from src.bot.migrations import migrate
+from src.webhook.breakers import ChannelBreakers
+from src.webhook.dashboard import Dashboards
+from src.webhook.delivery import DeliveryQueue
+from src.webhook.routing import RoutingTable
+from src.webhook.server import app
+
+
+class StubHTTP:
+    """Stands in for discord.py's HTTPClient and records when each webhook is fully sent."""
+
+    def __init__(self, channels: int):
+        self.channels = channels
+        self.sent: dict[str, int] = {}
+        self.finished: dict[str, float] = {}
+
+    async def send_message(self, channel_id, params):
+        fields = params.payload["embeds"][0]["fields"]
+        marker = next(field["value"] for field in fields if field["name"] == "Incident")
+        self.sent[marker] = self.sent.get(marker, 0) + 1
+        if self.sent[marker] == self.channels:
+            self.finished[marker] = time.perf_counter()
+
+
+class StubBot:
+    def __init__(self, channels: int, db_path: str):
+        self.http = StubHTTP(channels)
+        self.db = Database(db_path)
+        self.routes = RoutingTable()
+        self.breakers = ChannelBreakers(self)
+        self.dashboards = Dashboards(self)
+        self.routes.add_service(1, "bench", "/webhook/bench")
+        for channel_id in range(1, channels + 1):
+            self.routes.subscribe(1, channel_id, channel_id)
+        self.delivery = DeliveryQueue(self)
+
+
+class ThreadedDelivery:
+    """The old cross-thread handoff: the server thread schedules each submit on the bot's loop."""
+
+    def __init__(self, delivery: DeliveryQueue, loop: asyncio.AbstractEventLoop):
+        self._delivery = delivery
+        self._loop = loop
+
+    def __getattr__(self, name):
+        return getattr(self._delivery, name)
+
+    def submit(self, job) -> bool:
+        self._loop.call_soon_threadsafe(self._delivery.submit, job)
+        return True
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def webhook_payload(i: int) -> dict:
+    return {
+        "page": {"status_indicator": "minor", "status_description": "Minor Service Outage"},
+        "incident": {
+            "name": f"bench-{i}",
+            "status": "investigating",
+            "impact": "minor",
+            "incident_updates": [{"id": f"update-{i}", "body": "Investigating elevated error rates."}],
+        },
+    }
+
+
+def post_webhooks(port: int, count: int, concurrency: int, interval: float) -> dict[str, float]:
+    """Post from a separate thread and loop, as Statuspage would from outside the process."""
+    started: dict[str, float] = {}
+
+    async def run():
+        url = f"http://127.0.0.1:{port}/webhook/bench"
+        semaphore = asyncio.Semaphore(concurrency)
+        async with aiohttp.ClientSession() as session:
+            async def post(i: int):
+                async with semaphore:
+                    started[f"bench-{i}"] = time.perf_counter()
+                    async with session.post(url, json=webhook_payload(i)) as response:
+                        response.raise_for_status()
+                    await asyncio.sleep(interval)
+
+            await asyncio.gather(*(post(i) for i in range(count)))
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),))
+    thread.start()
+    thread.join()
+    return started
+
+
+async def wait_for_port(port: int):
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+
+
+async def run_mode(mode: str, args) -> list[float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = StubBot(args.channels, os.path.join(tmp, "bench.db"))
+        await bot.db.connect()
+        await migrate(bot.db)
+        await bot.delivery.start()
+        app.state.bot = bot
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        if mode == "integrated":
+            serving = asyncio.create_task(server.serve())
+        else:
+            bot.delivery = ThreadedDelivery(bot.delivery, asyncio.get_running_loop())
+            serving = threading.Thread(target=asyncio.run, args=(server.serve(),))
+            serving.start()
+        await wait_for_port(port)
+
+        started = await asyncio.to_thread(post_webhooks, port, args.webhooks, args.concurrency, args.interval)
+        while len(bot.http.finished) < args.webhooks:
+            await asyncio.sleep(0.01)
+
+        server.should_exit = True
+        if mode == "integrated":
+            await serving
+        else:
+            await asyncio.to_thread(serving.join)
+        await bot.delivery.close()
+        await bot.db.close()
+        app.state.bot = None
+
+    return [(bot.http.finished[marker] - started[marker]) * 1000 for marker in started]
+
+
+def report(mode: str, latencies: list[float]):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{mode:11} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  mean {statistics.mean(latencies):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--webhooks", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.0, help="pause after each request, in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.webhooks} webhooks to {args.channels} channels, {args.concurrency} in flight, {args.interval}s apart")
+    for mode in ("threaded", "integrated"):
+        report(mode, asyncio.run(run_mode(mode, args)))
+
+
+if __name__ == "__main__":
+    main()
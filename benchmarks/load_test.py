@@ -0,0 +1,279 @@
+"""Load test of the full webhook -> Discord delivery path.
+
+Serves the real FastAPI app on a NotificationBot's delivery pipeline
+(routing table, dedup, rendering, outbox, fan-out and discord.py's HTTP
+client), with discord.http.Route.BASE pointed at the fake Discord API in
+benchmarks/fake_discord.py. Synthetic Statuspage traffic from
+benchmarks/payloads.py is posted for each subscribed-channel count, and the
+run reports webhooks/s, messages/s and end-to-end p50/p99 latency (webhook
+posted -> last channel's message received by the fake API).
+
+    python -m benchmarks.load_test --channels 10,100,1000,10000,100000
+    python -m benchmarks.load_test --json results.json
+    python -m benchmarks.load_test --baseline results.json
+
+Injected 403/404s would otherwise open the channel breakers and turn most of
+the remaining sends into skips, so by default the run lets every send through
+(--breaker-cooldown 0, a --failure-threshold no channel reaches). Sends the
+breakers did skip are reported separately from the fake API's counts.
+
+Runs are seeded, so the same arguments replay the same traffic. With
+--baseline the results are compared to an earlier --json file and the exit
+status is 1 if throughput or p99 latency regressed by more than --tolerance.
+
+The gateway is never connected; setup_hook, the cogs and the command tree
+sync are not part of the measured path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+
+from benchmarks.fake_discord import FakeDiscordConfig, start_in_process
+from benchmarks.latency_bench import free_port, wait_for_port
+from benchmarks.payloads import PayloadGenerator
+
+
+def skipped_sends() -> int:
+    """Sends skipped by open channel breakers so far, across every service."""
+    from src.webhook.metrics import DELIVERY_FAILURES
+    return sum(child.value for (_, reason), child in DELIVERY_FAILURES._children.items() if reason == "circuit_open")
+
+
+def configure_environment(args):
+    # Read when the bot and its delivery pipeline are created, so set them first
+    os.environ["FANOUT_GLOBAL_RATE"] = str(args.global_rate)
+    os.environ["COALESCE_WINDOW"] = str(args.coalesce_window)
+    os.environ["DELIVERY_MODE"] = args.delivery_mode
+    os.environ["CHANNEL_BREAKER_COOLDOWN"] = str(args.breaker_cooldown)
+    os.environ["CHANNEL_FAILURE_THRESHOLD"] = str(args.failure_threshold)
+    os.environ.setdefault("DELIVERY_QUEUE_SIZE", "100000")
+
+
+def post_webhooks(port: int, payloads: list[dict], concurrency: int) -> tuple[dict[int, float], float]:
+    """Post every payload from a separate thread and loop, as Statuspage would.
+
+    Returns the monotonic send time of each webhook and the seconds taken to
+    get all of them acknowledged.
+    """
+    started: dict[int, float] = {}
+
+    async def run():
+        url = f"http://127.0.0.1:{port}/webhook/bench"
+        semaphore = asyncio.Semaphore(concurrency)
+        async with aiohttp.ClientSession() as session:
+            async def post(i: int, payload: dict):
+                async with semaphore:
+                    started[i] = time.monotonic()
+                    async with session.post(url, json=payload) as response:
+                        if response.status != 202:
+                            print(f"Webhook {i} answered {response.status}: {await response.text()}")
+
+            await asyncio.gather(*(post(i, payload) for i, payload in enumerate(payloads)))
+
+    begin = time.monotonic()
+    thread = threading.Thread(target=asyncio.run, args=(run(),))
+    thread.start()
+    thread.join()
+    return started, time.monotonic() - begin
+
+
+async def create_subscriptions(db, channels: int, webhook_mode: bool):
+    """Subscribe `channels` channels, one per guild, to the bench service."""
+    from src.bot.database import INSERT_SERVICE, UPSERT_CHANNEL
+    from src.bot.migrations import migrate
+
+    await migrate(db)
+    service_id = await db.write(INSERT_SERVICE, ("bench", "/webhook/bench"))
+    await db.transaction([(UPSERT_CHANNEL, [
+        (service_id, n << 22, n, n if webhook_mode else None, "bench" if webhook_mode else None)
+        for n in range(1, channels + 1)
+    ])])
+
+
+async def drained(bot) -> bool:
+    delivery = bot.delivery
+    return delivery.depth == 0 and delivery.coalescer.held == 0 and delivery.fanout.active_lanes == 0
+
+
+async def run_level(channels: int, webhooks: int, args, discord_url: str) -> dict:
+    from src.bot.bot import NotificationBot
+    from src.bot.database import Database
+    from src.webhook.server import app
+
+    async with aiohttp.ClientSession() as session:
+        await session.post(f"{discord_url}/_bench/reset")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = NotificationBot()
+        bot.db = Database(os.path.join(tmp, "bench.db"))
+        await bot.http.static_login("bench-token")
+        await bot.db.connect()
+        await create_subscriptions(bot.db, channels, args.delivery_mode == "webhook")
+        await bot.delivery.start()
+        await bot.routes.load(bot.db)
+        app.state.bot = bot
+        skipped_before = skipped_sends()
+
+        import uvicorn
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        await wait_for_port(port)
+
+        generator = PayloadGenerator(seed=args.seed, tag=lambda i: f" [bench:{i}]")
+        payloads = [generator.payload(i) for i in range(webhooks)]
+        started, intake_seconds = await asyncio.to_thread(post_webhooks, port, payloads, args.concurrency)
+
+        deadline = time.monotonic() + args.timeout
+        while not await drained(bot) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        timed_out = not await drained(bot)
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{discord_url}/_bench/stats") as response:
+                stats = await response.json()
+
+        server.should_exit = True
+        await serving
+        skipped = skipped_sends() - skipped_before
+        await bot.delivery.close()
+        await bot.db.close()
+        await bot.http.close()
+        app.state.bot = None
+
+    markers = {int(marker): value for marker, value in stats["markers"].items()}
+    latencies = sorted((markers[i][1] - started[i]) * 1000 for i in started if i in markers)
+    first_post = min(started.values())
+    last_message = max((value[1] for value in markers.values()), default=first_post)
+    return {
+        "channels": channels,
+        "webhooks": webhooks,
+        "messages": stats["messages"],
+        "rate_limited": stats["rate_limited"],
+        "failed": stats["failed"],
+        "skipped": skipped,
+        "timed_out": timed_out,
+        "webhooks_per_second": webhooks / intake_seconds,
+        "messages_per_second": stats["messages"] / max(last_message - first_post, 1e-9),
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+HEADER = (
+    f"{'channels':>9} {'webhooks':>8} {'webhooks/s':>11} {'messages/s':>11} "
+    f"{'p50 ms':>9} {'p99 ms':>9} {'429s':>6} {'failed':>6} {'skipped':>7}"
+)
+
+
+def report(result: dict) -> str:
+    return (
+        f"{result['channels']:>9} {result['webhooks']:>8} {result['webhooks_per_second']:>11.1f} "
+        f"{result['messages_per_second']:>11.1f} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+        f"{result['rate_limited']:>6} {result['failed']:>6} {result['skipped']:>7}"
+        + ("  (timed out)" if result["timed_out"] else "")
+    )
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> bool:
+    """Print the change against a baseline run. Returns False if anything regressed."""
+    previous = {result["channels"]: result for result in baseline}
+    ok = True
+    for result in results:
+        before = previous.get(result["channels"])
+        if not before:
+            continue
+        changes = {
+            "messages/s": result["messages_per_second"] / before["messages_per_second"] - 1,
+            "webhooks/s": result["webhooks_per_second"] / before["webhooks_per_second"] - 1,
+            # Lower is better for latency, so flip the sign
+            "p99": -(result["p99_ms"] / before["p99_ms"] - 1),
+        }
+        regressed = [name for name, change in changes.items() if change < -tolerance]
+        ok = ok and not regressed
+        summary = ", ".join(f"{name} {change:+.0%}" for name, change in changes.items())
+        print(f"{result['channels']:>9} channels: {summary}" + (f"  REGRESSED: {', '.join(regressed)}" if regressed else ""))
+    return ok
+
+
+async def run_all(args) -> list[dict]:
+    import discord.http
+
+    discord_port = free_port()
+    fake = start_in_process(discord_port, FakeDiscordConfig(
+        latency_ms=args.latency_ms,
+        rate_limit_rate=args.rate_limit_rate,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    ))
+    try:
+        await wait_for_port(discord_port)
+        discord_url = f"http://127.0.0.1:{discord_port}"
+        discord.http.Route.BASE = f"{discord_url}/api/v10"
+
+        results = []
+        for channels in args.channels:
+            webhooks = max(3, min(args.webhooks, args.message_budget // channels))
+            results.append(await run_level(channels, webhooks, args, discord_url))
+
+        # Printed at the end so the table isn't interleaved with delivery logs
+        print(HEADER)
+        for result in results:
+            print(report(result))
+        return results
+    finally:
+        fake.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the webhook delivery path against a fake Discord")
+    parser.add_argument("--channels", default="10,100,1000,10000",
+                        type=lambda value: [int(part) for part in value.split(",")],
+                        help="comma-separated subscribed channel counts to run")
+    parser.add_argument("--webhooks", type=int, default=200, help="webhooks per level (capped by --message-budget)")
+    parser.add_argument("--message-budget", type=int, default=200000, help="maximum Discord messages per level")
+    parser.add_argument("--concurrency", type=int, default=20, help="webhooks in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean fake Discord response time")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of sends answered with 429")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of sends answered with 403/404")
+    parser.add_argument("--breaker-cooldown", type=float, default=0, help="CHANNEL_BREAKER_COOLDOWN for the run")
+    parser.add_argument("--failure-threshold", type=int, default=1000000000,
+                        help="CHANNEL_FAILURE_THRESHOLD for the run")
+    parser.add_argument("--global-rate", type=float, default=1000000, help="FANOUT_GLOBAL_RATE for the run")
+    parser.add_argument("--coalesce-window", type=float, default=0, help="COALESCE_WINDOW for the run")
+    parser.add_argument("--delivery-mode", choices=("bot", "webhook"), default="bot")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for a level to drain")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written by an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression against the baseline")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    results = asyncio.run(run_all(args))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"arguments": vars(args) | {"channels": args.channels}, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
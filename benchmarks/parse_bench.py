@@ -0,0 +1,56 @@
+"""Micro-benchmark for webhook body parsing.
+
+Measures the cost per payload of decoding with the standard library json
+module, of decoding with the decoder src.webhook.parsing picked (orjson when
+installed), of the full parse into typed models, and of reading the body
+through the bounded stream reader.
+
+    python -m benchmarks.parse_bench [payloads]
+"""
+import asyncio
+import json
+import sys
+import timeit
+
+from benchmarks.payloads import PayloadGenerator
+from src.webhook import parsing
+from src.webhook.parsing import parse_payload, read_body
+
+
+class StreamedRequest:
+    """Just enough of a Starlette request for read_body: the body in 64 KiB chunks, as uvicorn delivers it."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.headers = {"content-length": str(len(body))}
+
+    async def stream(self):
+        for start in range(0, len(self.body), 65536):
+            yield self.body[start:start + 65536]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    generator = PayloadGenerator(seed=1)
+    bodies = [json.dumps(generator.payload(i)).encode() for i in range(count)]
+    size = sum(len(body) for body in bodies) / count
+
+    async def read_all():
+        for body in bodies:
+            await read_body(StreamedRequest(body))
+
+    loop = asyncio.new_event_loop()
+    decoder = f"{parsing.loads.__module__}.loads"
+    for name, func in (
+        ("json.loads", lambda: [json.loads(body) for body in bodies]),
+        (decoder, lambda: [parsing.loads(body) for body in bodies]),
+        ("parse_payload", lambda: [parse_payload(body) for body in bodies]),
+        ("read_body", lambda: loop.run_until_complete(read_all())),
+    ):
+        seconds = min(timeit.repeat(func, number=5, repeat=5)) / 5 / count
+        print(f"{name:14} {seconds * 1e6:8.2f} µs per payload ({count} payloads, {size:.0f} bytes on average)")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
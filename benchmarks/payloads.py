@@ -0,0 +1,114 @@
+"""Synthetic Statuspage webhook payloads.
+
+Shapes follow Statuspage's incident and component webhooks: incidents move
+through investigating -> identified -> monitoring -> resolved with a growing
+list of incident_updates, and component updates walk a component between
+statuses. A seeded random.Random keeps runs repeatable.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+COMPONENTS = [
+    "API", "Website", "Dashboard", "Webhooks", "Git Operations", "Actions", "Packages", "Pages",
+    "Chat Completions", "Embeddings", "Fine-tuning", "Voice", "Media Proxy", "Push Notifications",
+]
+COMPONENT_STATUSES = ["operational", "degraded_performance", "partial_outage", "major_outage", "under_maintenance"]
+INCIDENT_STAGES = ["investigating", "identified", "monitoring", "resolved"]
+IMPACTS = ["none", "minor", "major", "critical"]
+INDICATORS = {"none": "none", "minor": "minor", "major": "major", "critical": "critical"}
+DESCRIPTIONS = {
+    "none": "All Systems Operational",
+    "minor": "Minor Service Outage",
+    "major": "Partial System Outage",
+    "critical": "Major System Outage",
+}
+UPDATE_BODIES = {
+    "investigating": "We are investigating reports of elevated error rates and increased latency for {component}.",
+    "identified": "The issue has been identified and a fix is being implemented for {component}.",
+    "monitoring": "A fix has been implemented and we are monitoring the results. {component} is recovering.",
+    "resolved": "This incident has been resolved. {component} is operating normally.",
+}
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+class PayloadGenerator:
+    """Yields a realistic mix of incident and component webhooks.
+
+    tag(i) is appended to the incident or component name so the receiving
+    side can tell which webhook a Discord message came from.
+    """
+
+    def __init__(self, seed: int = 0, incident_ratio: float = 0.4, tag=None):
+        self.random = random.Random(seed)
+        self.incident_ratio = incident_ratio
+        self.tag = tag or (lambda i: "")
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._component_status = {name: "operational" for name in COMPONENTS}
+
+    def payload(self, i: int) -> dict:
+        self.now += timedelta(seconds=self.random.randint(1, 90))
+        if self.random.random() < self.incident_ratio:
+            return self.incident(i)
+        return self.component_update(i)
+
+    def incident(self, i: int) -> dict:
+        component = self.random.choice(COMPONENTS)
+        impact = self.random.choice(IMPACTS[1:])
+        stage = self.random.randrange(len(INCIDENT_STAGES))
+        created = self.now - timedelta(minutes=15 * stage)
+        updates = [
+            {
+                "id": uuid.UUID(int=self.random.getrandbits(128)).hex[:12],
+                "status": status,
+                "body": UPDATE_BODIES[status].format(component=component),
+                "created_at": _timestamp(created + timedelta(minutes=15 * n)),
+                "updated_at": _timestamp(created + timedelta(minutes=15 * n)),
+            }
+            for n, status in enumerate(INCIDENT_STAGES[:stage + 1])
+        ]
+        updates.reverse()
+        return {
+            "meta": {"unsubscribe": "https://status.example.com/?unsubscribe=x", "generated_at": _timestamp(self.now)},
+            "page": {
+                "id": "bench",
+                "status_indicator": INDICATORS[impact],
+                "status_description": DESCRIPTIONS[impact],
+            },
+            "incident": {
+                "id": uuid.UUID(int=self.random.getrandbits(128)).hex[:12],
+                "name": f"Elevated errors on {component}{self.tag(i)}",
+                "status": INCIDENT_STAGES[stage],
+                "impact": impact,
+                "shortlink": "https://stspg.io/bench",
+                "created_at": _timestamp(created),
+                "updated_at": _timestamp(self.now),
+                "incident_updates": updates,
+            },
+        }
+
+    def component_update(self, i: int) -> dict:
+        name = self.random.choice(COMPONENTS)
+        old_status = self._component_status[name]
+        new_status = self.random.choice([status for status in COMPONENT_STATUSES if status != old_status])
+        self._component_status[name] = new_status
+        return {
+            "meta": {"unsubscribe": "https://status.example.com/?unsubscribe=x", "generated_at": _timestamp(self.now)},
+            "page": {"id": "bench", "status_indicator": "minor", "status_description": DESCRIPTIONS["minor"]},
+            "component_update": {
+                "id": uuid.UUID(int=self.random.getrandbits(128)).hex[:12],
+                "created_at": _timestamp(self.now),
+                "old_status": old_status,
+                "new_status": new_status,
+                "component_id": name.lower().replace(" ", "-"),
+            },
+            "component": {
+                "id": name.lower().replace(" ", "-"),
+                "name": f"{name}{self.tag(i)}",
+                "status": new_status,
+                "created_at": _timestamp(self.now - timedelta(days=365)),
+            },
+        }
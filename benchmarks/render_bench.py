@@ -0,0 +1,61 @@
+"""Micro-benchmark for notification rendering.
+
+Compares building and serializing the embed separately for every channel
+(what happened before render-once) with rendering it once and reusing the
+result, and measures the full render of one notification.
+
+    python -m benchmarks.render_bench [channels]
+"""
+import json
+import sys
+import timeit
+
+from src.webhook.formatting import format_statuspage_notification
+from src.webhook.render import RenderedNotification, render_notification
+
+SAMPLE_PAYLOAD = {
+    "meta": {"unsubscribe": "https://example.statuspage.io/unsubscribe", "generated_at": "2024-01-01T12:00:00.000Z"},
+    "page": {"id": "abc123", "status_indicator": "major", "status_description": "Partial System Outage"},
+    "incident": {
+        "name": "Elevated error rates for API requests",
+        "status": "investigating",
+        "impact": "major",
+        "shortlink": "https://stspg.io/abc123",
+        "created_at": "2024-01-01T11:42:00.000Z",
+        "updated_at": "2024-01-01T12:00:00.000Z",
+        "incident_updates": [{
+            "id": "upd123",
+            "status": "investigating",
+            "body": "We are investigating elevated error rates affecting a subset of API requests. " * 8,
+            "created_at": "2024-01-01T12:00:00.000Z",
+        }],
+    },
+}
+
+
+def per_channel(channels: int):
+    embed = format_statuspage_notification(SAMPLE_PAYLOAD, "example")
+    for _ in range(channels):
+        json.dumps({"embeds": [embed.to_dict()]})
+
+
+def render_once(channels: int):
+    rendered = RenderedNotification.from_embed(format_statuspage_notification(SAMPLE_PAYLOAD, "example"))
+    for _ in range(channels):
+        rendered.body
+
+
+def main():
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    number = 50
+
+    for name, func in (("per-channel", per_channel), ("render-once", render_once)):
+        seconds = min(timeit.repeat(lambda: func(channels), number=number, repeat=5)) / number
+        print(f"{name:12} {seconds * 1000:8.3f} ms per notification ({channels} channels)")
+
+    seconds = min(timeit.repeat(lambda: render_notification(SAMPLE_PAYLOAD, "example"), number=1000, repeat=5)) / 1000
+    print(f"{'render':12} {seconds * 1000:8.3f} ms per notification")
+
+
+if __name__ == "__main__":
+    main()
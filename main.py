@@ -1,10 +1,14 @@
 import asyncio
+import contextlib
 import os
+import signal
+import sys
+import time
 from dotenv import load_dotenv
 import uvicorn
 from src.bot.bot import NotificationBot
+from src.webhook.ingest import ingest_mode_enabled
 from src.webhook.server import app
-import threading
 
 # Load environment variables
 load_dotenv()
@@ -15,24 +19,91 @@ bot = NotificationBot()
 # Store bot instance in FastAPI state
 app.state.bot = bot
 
-def run_webhook_server():
-    """Run the FastAPI webhook server"""
-    uvicorn.run(
+
+class WebhookServer(uvicorn.Server):
+    """uvicorn server that runs on the bot's loop and leaves signals to main()"""
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+def create_webhook_server(port: int) -> WebhookServer:
+    """Create the FastAPI webhook server"""
+    config = uvicorn.Config(
         app,
         host="0.0.0.0",
-        port=int(os.getenv("PORT")),
+        port=port,
         log_level="info"
     )
+    return WebhookServer(config)
+
+
+async def start_intake_workers() -> asyncio.subprocess.Process:
+    """Run the stateless ingestion workers (INGEST_MODE=split) as a uvicorn process group"""
+    return await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "src.webhook.intake:app",
+        "--host", "0.0.0.0",
+        "--port", os.getenv("PORT"),
+        "--workers", os.getenv("INGEST_WORKERS", "2"),
+        "--log-level", "info"
+    )
+
 
 async def main():
-    # Start the webhook server in a separate thread
-    webhook_thread = threading.Thread(target=run_webhook_server)
-    webhook_thread.daemon = True
-    webhook_thread.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still raises KeyboardInterrupt
+            pass
 
-    # Start the bot
     async with bot:
-        await bot.start(os.getenv("DISCORD_TOKEN"))
+        # Logging in runs setup_hook (database, delivery workers, routing table), so
+        # the webhook server only starts listening once webhooks can be queued
+        started = time.perf_counter()
+        await bot.login(os.getenv("DISCORD_TOKEN"))
+        print(f"Ready to connect after {time.perf_counter() - started:.2f}s")
+
+        if bot.scope.partial and not ingest_mode_enabled():
+            print("Warning: this process only delivers to its own shards; use INGEST_MODE=split so every process sees every webhook")
+
+        gateway = asyncio.create_task(bot.connect(), name="discord-gateway")
+        server = None
+        if ingest_mode_enabled():
+            # With the shards split across processes, only one of them runs the workers
+            intake = await start_intake_workers() if int(os.getenv("INGEST_WORKERS", "2")) > 0 else None
+            webhooks = asyncio.create_task(intake.wait() if intake else asyncio.Event().wait(), name="intake-workers")
+            # The bot's own app still serves /metrics and /queue for this process
+            if os.getenv("METRICS_PORT"):
+                server = create_webhook_server(int(os.getenv("METRICS_PORT")))
+        else:
+            server = create_webhook_server(int(os.getenv("PORT")))
+            webhooks = None
+        serving = asyncio.create_task(server.serve(), name="webhook-server") if server else None
+        stopping = asyncio.create_task(stop.wait(), name="shutdown-signal")
+        tasks = {task for task in (gateway, webhooks, serving, stopping) if task}
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+
+        # Stop taking webhooks and finish in-flight requests before delivery shuts down
+        if ingest_mode_enabled():
+            if intake is None:
+                webhooks.cancel()
+            elif intake.returncode is None:
+                intake.terminate()
+        if server:
+            server.should_exit = True
+        await asyncio.gather(*(task for task in (webhooks, serving) if task), return_exceptions=True)
+        await bot.close()
+        gateway.cancel()
+        await asyncio.gather(gateway, return_exceptions=True)
+
+        for task in done - {stopping}:
+            if not task.cancelled() and task.exception():
+                raise task.exception()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
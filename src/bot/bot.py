@@ -1,75 +1,278 @@
+import asyncio
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import os
 import importlib
 import pkgutil
+import contextlib
+import hashlib
+import json
+import time
+from collections import Counter
+from src.webhook.breakers import ChannelBreakers
+from src.webhook.dashboard import Dashboards
+from src.webhook.delivery import DeliveryQueue
+from src.webhook.metrics import SUBSCRIPTIONS_PRUNED
+from src.webhook.poller import StatusPoller, poll_sources
+from src.webhook.webhooks import webhook_mode_enabled
+from src.webhook.ingest import IngestConsumer, ingest_mode_enabled
+from src.webhook.routing import RoutingTable
+from src.bot.database import Database, DELETE_CHANNEL_SUBSCRIPTIONS, DELETE_GUILD_SUBSCRIPTIONS
+from src.bot.migrations import check_query_plans, migrate
+from src.bot.owner_notices import OwnerNotices
+from src.bot.sharding import ShardScope
+from src.bot.teardown import ServiceTeardown
 
-class NotificationBot(commands.Bot):
+class NotificationBot(commands.AutoShardedBot):
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
-        super().__init__(command_prefix="!", intents=intents)
+        self.scope = ShardScope.from_env()
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            shard_count=self.scope.count,
+            shard_ids=self.scope.ids
+        )
+        self.delivery = DeliveryQueue(self)
+        self.routes = RoutingTable(self.scope)
+        self.breakers = ChannelBreakers(self)
+        self.teardowns = ServiceTeardown(self, self.scope)
+        self.dashboards = Dashboards(self, self.scope)
+        self.db = Database()
+        self.ingest = IngestConsumer(self) if ingest_mode_enabled() else None
+        self.poller = StatusPoller(self) if poll_sources() else None
+        self.owner_notices = OwnerNotices(self)
+        self.startup_timings: dict[str, float] = {}
+        # Presence updates are rate limited by the gateway, so requests are coalesced
+        self.presence_interval = float(os.getenv("PRESENCE_INTERVAL", "20"))
+        self.presence_debounce = float(os.getenv("PRESENCE_DEBOUNCE", "2"))
+        self._presence: str | None = None
+        self._presence_updated_at = float("-inf")
+        # When the oldest and the latest unserved requests came in; None while there are none
+        self._presence_first_request: float | None = None
+        self._presence_last_request: float | None = None
+        self._presence_task: asyncio.Task | None = None
         
     async def setup_hook(self):
+        # Migrate the schema once, before the delivery workers and cogs use it
+        with self._phase("database"):
+            await self.db.connect()
+            await migrate(self.db)
+            for scan in await check_query_plans(self.db):
+                print(f"Warning: query is not using an index: {scan}")
+        print(f"Running {self.scope}")
+        
+        # Start the notification delivery workers on the bot's loop
+        with self._phase("delivery"):
+            await self.delivery.start()
+        
         # Load all command cogs
-        commands_package = 'src.bot.commands'
-        for _, name, _ in pkgutil.iter_modules([commands_package.replace('.', '/')]):
-            if name != 'base_cog':  # Skip the base cog
-                await self.load_extension(f"{commands_package}.{name}")
+        with self._phase("cogs"):
+            commands_package = 'src.bot.commands'
+            for _, name, _ in pkgutil.iter_modules([commands_package.replace('.', '/')]):
+                if name != 'base_cog':  # Skip the base cog
+                    await self.load_extension(f"{commands_package}.{name}")
+        with self._phase("command sync"):
+            await self.sync_commands()
+        
+        # Build the in-memory routing table
+        with self._phase("routing"):
+            await self.routes.load(self.db)
+            self.verify_routes.start()
+            # Finish removing services deleted before a restart
+            await self.teardowns.resume()
+            # Guilds whose dashboard replaces messages are muted in the routes just loaded
+            await self.dashboards.start()
+        
+        # In split mode webhooks arrive through the ingest queue instead of app.state.bot
+        if self.ingest:
+            with self._phase("ingest"):
+                await self.ingest.start()
+        
+        # Status pages without webhook support are polled into the same delivery path
+        if self.poller:
+            await self.poller.start()
+        
+        print("Startup: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.startup_timings.items()))
+        
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[name] = time.perf_counter() - started
+        
+    async def sync_commands(self):
+        """Sync the command tree with Discord only when its signatures have changed.
+        
+        Syncing is slow and rate limited, so a hash of the synced commands is kept
+        in the database and compared on every boot. FORCE_COMMAND_SYNC=1 syncs anyway.
+        """
+        signatures = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands()),
+            key=lambda command: (command["name"], command.get("type", 1))
+        )
+        digest = hashlib.sha256(
+            json.dumps([self.application_id, signatures], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        if os.getenv("FORCE_COMMAND_SYNC") != "1" and await self.db.get_meta("command_tree_hash") == digest:
+            print("Command tree unchanged, skipping sync")
+            return
         await self.tree.sync()
+        await self.db.set_meta("command_tree_hash", digest)
+        print(f"Synced {len(signatures)} commands")
         
-    async def update_status(self):
+    @tasks.loop(minutes=int(os.getenv("ROUTING_CHECK_MINUTES", "15")))
+    async def verify_routes(self):
+        if self.verify_routes.current_loop == 0:
+            # The first iteration would only re-read what load() just read
+            return
         try:
-            # Get the first cog that inherits from BaseServiceCog to access the database
-            base_cog = next(
-                (cog for cog in self.cogs.values() if hasattr(cog, 'db_path')),
-                None
-            )
-            if base_cog:
-                import sqlite3
-                with sqlite3.connect(base_cog.db_path) as conn:
-                    service_count = conn.execute("SELECT COUNT(*) FROM services").fetchone()[0]
-                    
-                activity = discord.Activity(
-                    type=discord.ActivityType.watching,
-                    name=f"{service_count} services in {len(self.guilds)} servers"
-                )
-                await self.change_presence(activity=activity)
+            await self.routes.verify(self.db)
+            # Pick up services deleted through another shard process
+            await self.teardowns.resume()
         except Exception as e:
-            print(f"Error updating status: {e}")
+            print(f"Error verifying routing table: {e}")
+        
+    def update_status(self):
+        """Ask for the presence to be refreshed.
+        
+        Requests are debounced and coalesced: the update goes out once there
+        have been no requests for PRESENCE_DEBOUNCE seconds, or PRESENCE_INTERVAL
+        seconds after the first one if they keep coming, and never more than
+        once per PRESENCE_INTERVAL.
+        """
+        now = asyncio.get_running_loop().time()
+        if self._presence_first_request is None:
+            self._presence_first_request = now
+        self._presence_last_request = now
+        if self._presence_task is None or self._presence_task.done():
+            self._presence_task = asyncio.create_task(self._update_presence(), name="presence")
+        
+    async def _update_presence(self):
+        loop = asyncio.get_running_loop()
+        while self._presence_first_request is not None:
+            due = max(
+                min(self._presence_last_request + self.presence_debounce,
+                    self._presence_first_request + self.presence_interval),
+                self._presence_updated_at + self.presence_interval,
+            )
+            if loop.time() < due:
+                # Requests made meanwhile move the deadline, so look again after sleeping
+                await asyncio.sleep(due - loop.time())
+                continue
+            self._presence_first_request = self._presence_last_request = None
+            try:
+                # The routing table holds every service, so nothing is read from the database
+                name = f"{len(self.routes)} services in {await self.count_guilds()} servers"
+                if name != self._presence:
+                    await self.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name=name))
+                    self._presence = name
+                    self._presence_updated_at = loop.time()
+            except Exception as e:
+                print(f"Error updating status: {e}")
+        
+    async def count_guilds(self) -> int:
+        if not self.scope.partial:
+            return len(self.guilds)
+        # The other shards live in other processes; each one records its own counts
+        counts = Counter({shard_id: 0 for shard_id in self.scope.ids})
+        counts.update(guild.shard_id for guild in self.guilds)
+        return await self.db.record_shard_guilds(counts, self.scope.count)
         
     async def on_ready(self):
         print(f'Logged in as {self.user} (ID: {self.user.id})')
-        await self.update_status()
+        # Sent again after a reconnect, which resets the presence
+        self._presence = None
+        self.update_status()
         print('------')
         
+        # The channel cache is populated now, so resend anything left over from the last run
+        await self.delivery.replay()
+        
     async def on_guild_join(self, guild):
         # Update bot status
-        await self.update_status()
-        
-        # Send notification to designated channel
-        notification_channel = self.get_channel(1316890394415599706)
-        if notification_channel:
-            embed = discord.Embed(
-                title="🎉 New Server Joined",
-                description=f"Bot has been added to a new server!",
-                color=discord.Color.green(),
-                timestamp=discord.utils.utcnow()
-            )
-            
-            embed.add_field(
-                name="Server Info",
-                value=f"**Name:** {guild.name}\n**ID:** {guild.id}\n**Members:** {guild.member_count}",
-                inline=False
-            )
-            
-            embed.add_field(
-                name="Owner",
-                value=f"{guild.owner} (ID: {guild.owner_id})",
-                inline=False
-            )
-            
-            await notification_channel.send(embed=embed)
+        self.update_status()
+        
+        # Notify the owner once notification delivery is idle
+        self.owner_notices.guild_joined(guild)
         
     async def on_guild_remove(self, guild):
-        await self.update_status() 
\ No newline at end of file
+        # Kicked or the guild was deleted: nothing can be sent there any more
+        self.purge_guild(guild.id, "guild_removed")
+        self.update_status()
+        
+    async def on_guild_channel_delete(self, channel):
+        self.purge_channel(channel.id, "channel_deleted")
+        self.dashboards.forget_channel(channel.id)
+        
+    async def on_guild_channel_update(self, before, after):
+        if after.id in self.routes.channels_in(after.guild.id):
+            self.check_channel_permissions(after)
+        
+    async def on_guild_role_update(self, before, after):
+        if before.permissions != after.permissions and after in after.guild.me.roles:
+            self.check_guild_permissions(after.guild)
+        
+    async def on_member_update(self, before, after):
+        if after.id == self.user.id and before.roles != after.roles:
+            self.check_guild_permissions(after.guild)
+        
+    def check_guild_permissions(self, guild):
+        for channel_id in self.routes.channels_in(guild.id):
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                self.check_channel_permissions(channel)
+        
+    def check_channel_permissions(self, channel):
+        """Pause delivery to a subscribed channel the bot can no longer post in, or resume it."""
+        if webhook_mode_enabled() and self.routes.webhook_for(channel.id):
+            # Channel webhooks post without the bot user's permissions
+            return
+        permissions = channel.permissions_for(channel.guild.me)
+        if permissions.view_channel and permissions.send_messages and permissions.embed_links:
+            self.breakers.resume(channel.id)
+        else:
+            self.breakers.pause(channel.id)
+        
+    def purge_channel(self, channel_id: int, reason: str):
+        """Remove every subscription delivering to the channel."""
+        removed = self.routes.remove_channel(channel_id)
+        self.breakers.forget(channel_id)
+        if removed:
+            self.db.submit([(DELETE_CHANNEL_SUBSCRIPTIONS, (channel_id,))])
+            self._count_pruned(removed, reason)
+            print(f"Removed {removed} subscriptions for channel {channel_id} ({reason})")
+        
+    def purge_guild(self, guild_id: int, reason: str):
+        """Remove every subscription in the guild."""
+        channel_ids = self.routes.remove_guild(guild_id)
+        self.dashboards.forget_guild(guild_id)
+        for channel_id in channel_ids:
+            self.breakers.forget(channel_id)
+        # Also covers rows the routing table doesn't hold, e.g. for services it hasn't loaded
+        self.db.submit([(DELETE_GUILD_SUBSCRIPTIONS, (guild_id,))])
+        if channel_ids:
+            self._count_pruned(len(channel_ids), reason)
+            print(f"Removed {len(channel_ids)} subscriptions for guild {guild_id} ({reason})")
+        
+    def _count_pruned(self, count: int, reason: str):
+        self.breakers.pruned += count
+        SUBSCRIPTIONS_PRUNED.labels(reason).inc(count)
+        
+    async def close(self):
+        self.verify_routes.cancel()
+        if self._presence_task:
+            self._presence_task.cancel()
+        await self.owner_notices.close()
+        await self.teardowns.close()
+        await self.dashboards.close()
+        if self.ingest:
+            await self.ingest.close()
+        if self.poller:
+            await self.poller.close()
+        await self.delivery.close()
+        await super().close()
+        await self.db.close() 
\ No newline at end of file
@@ -16,91 +16,89 @@ class AddServiceCog(BaseServiceCog):
         category = interaction.channel.category
         channel_name = f"{service_name.lower().replace(' ', '-')}-status"
         
+        # Creating the channel and its webhook can take several rate-limited calls,
+        # more than the 3 seconds Discord allows before the first response
+        await interaction.response.defer(ephemeral=True)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # First try to get existing service
-                service = conn.execute(
-                    "SELECT id FROM services WHERE name = ?",
-                    (service_name,)
-                ).fetchone()
-                
-                if service:
-                    service_id = service[0]
-                else:
-                    # Only bot owner can create new services
-                    if interaction.user.id != OWNER_ID:
-                        await interaction.response.send_message(
-                            f"Service '{service_name}' doesn't exist yet. Please contact the bot owner to add new services.",
-                            ephemeral=True
-                        )
-                        return
-                        
-                    # Create new service if it doesn't exist
-                    cursor = conn.execute(
-                        "INSERT INTO services (name, webhook_path) VALUES (?, ?)",
-                        (service_name, webhook_path)
+            # First try to get existing service
+            service = await self.bot.db.get_service(service_name)
+            
+            if service:
+                service_id = service[0]
+                self.bot.routes.add_service(service_id, service_name, service[1])
+            else:
+                # Only bot owner can create new services
+                if interaction.user.id != OWNER_ID:
+                    await interaction.followup.send(
+                        f"Service '{service_name}' doesn't exist yet. Please contact the bot owner to add new services.",
+                        ephemeral=True
                     )
-                    service_id = cursor.lastrowid
+                    return
                     
-                    # Update bot status to reflect new service count
-                    await self.bot.update_status()
+                # Create new service if it doesn't exist
+                service_id = await self.bot.db.create_service(service_name, webhook_path)
+                self.bot.routes.add_service(service_id, service_name, webhook_path)
                 
-                # Try to find existing channel with the same name in the category
-                existing_channel = None
-                if category:
-                    for channel in category.text_channels:
-                        if channel.name == channel_name:
-                            existing_channel = channel
-                            break
-                
-                if existing_channel:
-                    new_channel = existing_channel
-                else:
-                    # Create a new channel if none exists
-                    new_channel = await interaction.guild.create_text_channel(
-                        name=channel_name,
-                        category=category,
-                        topic=f"Status updates for {service_name}"
-                    )
-                
-                # Add or update server channel mapping
-                conn.execute("""
-                    INSERT OR REPLACE INTO server_channels 
-                    (service_id, guild_id, channel_id) VALUES (?, ?, ?)
-                """, (service_id, interaction.guild_id, new_channel.id))
-                
-                embed = discord.Embed(
-                    title="Service Added Successfully",
-                    color=discord.Color.green()
+                # Update bot status to reflect new service count
+                self.bot.update_status()
+            
+            # Try to find existing channel with the same name in the category
+            existing_channel = None
+            if category:
+                for channel in category.text_channels:
+                    if channel.name == channel_name:
+                        existing_channel = channel
+                        break
+            
+            if existing_channel:
+                new_channel = existing_channel
+            else:
+                # Create a new channel if none exists
+                new_channel = await interaction.guild.create_text_channel(
+                    name=channel_name,
+                    category=category,
+                    topic=f"Status updates for {service_name}"
                 )
-                embed.add_field(name="Service Name", value=service_name, inline=False)
-                embed.add_field(name="Webhook URL", value=webhook_url, inline=False)
-                embed.add_field(name="Channel", value=new_channel.mention, inline=False)
-                
-                if service:
-                    embed.add_field(
-                        name="Note",
-                        value="Using existing service. Notifications will now be sent to this server.",
-                        inline=False
-                    )
-                
-                if existing_channel:
-                    embed.add_field(
-                        name="Channel Note",
-                        value="Using existing channel with matching name.",
-                        inline=False
-                    )
-                
-                await interaction.response.send_message(embed=embed, ephemeral=True)
+            
+            # Add or update server channel mapping
+            webhook = await self._get_webhook(new_channel)
+            await self.bot.db.subscribe(service_id, interaction.guild_id, new_channel.id, webhook)
+            self.bot.routes.subscribe(service_id, interaction.guild_id, new_channel.id, webhook)
+            self.bot.dashboards.touch(interaction.guild_id)
+            
+            embed = discord.Embed(
+                title="Service Added Successfully",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="Service Name", value=service_name, inline=False)
+            embed.add_field(name="Webhook URL", value=webhook_url, inline=False)
+            embed.add_field(name="Channel", value=new_channel.mention, inline=False)
+            
+            if service:
+                embed.add_field(
+                    name="Note",
+                    value="Using existing service. Notifications will now be sent to this server.",
+                    inline=False
+                )
+            
+            if existing_channel:
+                embed.add_field(
+                    name="Channel Note",
+                    value="Using existing channel with matching name.",
+                    inline=False
+                )
+            
+            await interaction.followup.send(embed=embed, ephemeral=True)
                 
         except sqlite3.Error as e:
             print(f"Database error: {e}")
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 "An error occurred while setting up the service.",
                 ephemeral=True
             )
         except discord.Forbidden:
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 "I don't have permission to create channels!",
                 ephemeral=True
             )
@@ -1,36 +1,26 @@
-import sqlite3
-import os
+import discord
 from discord.ext import commands
 from ..bot import NotificationBot
+from src.webhook.webhooks import webhook_mode_enabled
 
 class BaseServiceCog(commands.Cog):
     def __init__(self, bot: NotificationBot):
         self.bot = bot
-        self.db_path = "config/services.db"
-        self._init_db()
 
-    def _init_db(self):
-        os.makedirs("config", exist_ok=True)
-        with sqlite3.connect(self.db_path) as conn:
-            # Create services table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS services (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE,
-                    webhook_path TEXT UNIQUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create server_channels table for mapping services to channels in different servers
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS server_channels (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    service_id INTEGER,
-                    guild_id INTEGER,
-                    channel_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(service_id, guild_id),
-                    FOREIGN KEY(service_id) REFERENCES services(id)
-                )
-            """) 
\ No newline at end of file
+    async def _get_webhook(self, channel: discord.TextChannel) -> tuple[int, str] | None:
+        """Find or create the channel's delivery webhook when webhook mode is enabled."""
+        if not webhook_mode_enabled():
+            return None
+        try:
+            for webhook in await channel.webhooks():
+                if webhook.token and webhook.user and webhook.user.id == self.bot.user.id:
+                    return webhook.id, webhook.token
+            webhook = await channel.create_webhook(
+                name=self.bot.user.name,
+                reason="Status notification delivery"
+            )
+            return webhook.id, webhook.token
+        except discord.HTTPException as e:
+            # Without Manage Webhooks the channel is still served by the bot user
+            print(f"Could not set up webhook for channel {channel.id}: {e}")
+            return None 
\ No newline at end of file
@@ -0,0 +1,52 @@
+import discord
+from discord import app_commands
+import sqlite3
+from .base_cog import BaseServiceCog
+
+class DashboardCog(BaseServiceCog):
+    @app_commands.command(name="dashboard", description="Show every service's status in one live message")
+    @app_commands.describe(
+        enabled="Turn the dashboard on or off",
+        channel="Channel to post the dashboard in (defaults to this one)",
+        replace_messages="Stop posting a message for every update while the dashboard is on"
+    )
+    async def dashboard(self, interaction: discord.Interaction, enabled: bool = True,
+                        channel: discord.TextChannel = None, replace_messages: bool = True):
+        if not enabled:
+            if await self.bot.dashboards.disable(interaction.guild_id):
+                message = "Dashboard turned off. Updates will be posted in each service's channel again."
+            else:
+                message = "This server doesn't have a dashboard."
+            await interaction.response.send_message(message, ephemeral=True)
+            return
+
+        channel = channel or interaction.channel
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            await self.bot.dashboards.enable(interaction.guild_id, channel.id, replace_messages)
+        except discord.Forbidden:
+            await interaction.edit_original_response(content=f"I don't have permission to post in {channel.mention}!")
+            return
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            await interaction.edit_original_response(content="An error occurred while setting up the dashboard.")
+            return
+
+        embed = discord.Embed(
+            title="Dashboard Enabled",
+            description=(
+                f"The status of every service this server follows is pinned in {channel.mention} "
+                f"and updated at most every {self.bot.dashboards.interval:.0f} seconds."
+            ),
+            color=discord.Color.green()
+        )
+        if replace_messages:
+            embed.add_field(
+                name="Note",
+                value="Individual updates are no longer posted in the service channels. Run `/dashboard enabled:False` to get them back.",
+                inline=False
+            )
+        await interaction.edit_original_response(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(DashboardCog(bot))
@@ -1,14 +1,19 @@
+import asyncio
 import discord
 from discord import app_commands
 import os
 import sqlite3
 from .base_cog import BaseServiceCog
+from ..teardown import TeardownProgress
 
 OWNER_ID = int(os.getenv("OWNER_ID", "353922987235213313"))
+# Seconds between progress edits of the original response
+PROGRESS_INTERVAL = 5
 
 class DeleteServiceCog(BaseServiceCog):
     @app_commands.command(name="deleteservice", description="[Owner Only] Completely delete a service")
-    async def delete_service(self, interaction: discord.Interaction, service_name: str):
+    @app_commands.describe(delete_channels="Delete the service's channels instead of posting a removal notice in them")
+    async def delete_service(self, interaction: discord.Interaction, service_name: str, delete_channels: bool = False):
         # Check if the user is the bot owner
         if interaction.user.id != OWNER_ID:
             await interaction.response.send_message(
@@ -17,68 +22,61 @@ class DeleteServiceCog(BaseServiceCog):
             )
             return
 
+        # Tearing down a widely used service takes far longer than an interaction may wait
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # First check if the service exists
-                service = conn.execute(
-                    "SELECT id FROM services WHERE name = ?",
-                    (service_name,)
-                ).fetchone()
-                
-                if not service:
-                    await interaction.response.send_message(
-                        f"Service '{service_name}' not found!",
-                        ephemeral=True
-                    )
-                    return
-                
-                # Get all servers using this service
-                channels = conn.execute("""
-                    SELECT guild_id, channel_id FROM server_channels
-                    WHERE service_id = ?
-                """, (service[0],)).fetchall()
-                
-                # Delete the service and all its channel mappings
-                conn.execute("DELETE FROM server_channels WHERE service_id = ?", (service[0],))
-                conn.execute("DELETE FROM services WHERE id = ?", (service[0],))
-                
-                # Update bot status to reflect the removed service
-                await self.bot.update_status()
-                
-                # Notify and delete channels in all servers
-                deleted_count = 0
-                for guild_id, channel_id in channels:
-                    guild = self.bot.get_guild(guild_id)
-                    if guild:
-                        channel = guild.get_channel(channel_id)
-                        if channel:
-                            try:
-                                # Send notification message
-                                await channel.send(
-                                    f"The service '{service_name}' has been removed. This channel needs to be deleted."
-                                )
-                                deleted_count += 1
-                            except discord.Forbidden:
-                                continue
-                
-                embed = discord.Embed(
-                    title="Service Deleted",
-                    description=f"Service '{service_name}' has been completely deleted. The webhook URL will no longer accept notifications.",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="Cleanup",
-                    value=f"Deleted {deleted_count} channels across {len(channels)} servers.",
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed, ephemeral=True)
+            # First check if the service exists
+            service = await self.bot.db.get_service(service_name)
+            
+            if not service:
+                await interaction.edit_original_response(content=f"Service '{service_name}' not found!")
+                return
+            
+            # Delete the service and all its channel mappings, then clean up the channels in the background
+            task = await self.bot.teardowns.begin(service[0], service_name, delete_channels)
+            progress = self.bot.teardowns.progress.get(service[0])
+            
+            # Update bot status to reflect the removed service
+            self.bot.update_status()
 
         except sqlite3.Error as e:
             print(f"Database error: {e}")
-            await interaction.response.send_message(
-                "An error occurred while deleting the service.",
-                ephemeral=True
+            await interaction.edit_original_response(content="An error occurred while deleting the service.")
+            return
+
+        if progress is None:
+            # The teardown already finished, or resume() took it over and finished it first
+            await interaction.edit_original_response(
+                content=f"Service '{service_name}' has been completely deleted. The webhook URL will no longer accept notifications."
             )
+            return
+
+        # Report progress until the teardown finishes or the interaction token expires
+        while True:
+            done, _ = await asyncio.wait([task], timeout=PROGRESS_INTERVAL)
+            try:
+                await interaction.edit_original_response(embed=self._progress_embed(progress, finished=bool(done)))
+            except discord.HTTPException:
+                return
+            if done:
+                return
+
+    @staticmethod
+    def _progress_embed(progress: TeardownProgress, finished: bool) -> discord.Embed:
+        action = "Deleted" if progress.delete_channels else "Notified"
+        embed = discord.Embed(
+            title="Service Deleted" if finished else "Deleting Service",
+            description=f"Service '{progress.service_name}' has been completely deleted. The webhook URL will no longer accept notifications.",
+            color=discord.Color.red()
+        )
+        embed.add_field(
+            name="Cleanup" if finished else "Cleanup (in progress)",
+            value=f"{action} {progress.done - progress.failed} of {progress.total} channels"
+                  + (f", {progress.failed} could not be reached." if progress.failed else "."),
+            inline=False
+        )
+        return embed
 
 async def setup(bot):
     await bot.add_cog(DeleteServiceCog(bot)) 
\ No newline at end of file
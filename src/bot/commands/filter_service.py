@@ -0,0 +1,58 @@
+import discord
+from discord import app_commands
+import sqlite3
+from .base_cog import BaseServiceCog
+from src.webhook.filters import SEVERITY_LEVELS, compile_filter
+
+class FilterServiceCog(BaseServiceCog):
+    @app_commands.command(name="filterservice", description="Choose which updates a service posts in your server")
+    @app_commands.describe(
+        events="Post incidents, component changes, or both",
+        min_severity="Skip updates below this severity",
+        components="Comma-separated component names to follow (leave empty for all)"
+    )
+    @app_commands.choices(
+        events=[app_commands.Choice(name=name, value=name) for name in ("all", "incidents", "components")],
+        min_severity=[app_commands.Choice(name=name, value=value) for name, value in SEVERITY_LEVELS.items()]
+    )
+    async def filter_service(self, interaction: discord.Interaction, service_name: str,
+                             events: str = "all", min_severity: int = 0, components: str = None):
+        subscription_filter = compile_filter(events, min_severity, components)
+        try:
+            service = await self.bot.db.get_service(service_name)
+            if not service:
+                await interaction.response.send_message(
+                    f"Service '{service_name}' not found!",
+                    ephemeral=True
+                )
+                return
+
+            row = subscription_filter.row() if subscription_filter else ("all", 0, None)
+            if not await self.bot.db.set_filter(service[0], interaction.guild_id, *row):
+                await interaction.response.send_message(
+                    f"This server isn't subscribed to '{service_name}'. Use `/addservice` first.",
+                    ephemeral=True
+                )
+                return
+            self.bot.routes.set_filter(service[0], interaction.guild_id, subscription_filter)
+
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            await interaction.response.send_message(
+                "An error occurred while updating the filter.",
+                ephemeral=True
+            )
+            return
+
+        embed = discord.Embed(
+            title="Filter Updated",
+            description=(
+                f"'{service_name}' now posts: {subscription_filter.describe()}."
+                if subscription_filter else f"'{service_name}' now posts every update."
+            ),
+            color=discord.Color.green()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(FilterServiceCog(bot))
@@ -23,6 +23,12 @@ class HelpCog(BaseServiceCog):
                 "➜ Remove a service from your server\n"
                 "➜ Deletes the associated notification channel\n"
                 "➜ Stops all notifications for that service\n\n"
+                "**`/filterservice <service_name> [events] [min_severity] [components]`**\n"
+                "➜ Choose which updates a service posts in your server\n"
+                "➜ Run without options to receive everything again\n\n"
+                "**`/dashboard [enabled] [channel] [replace_messages]`**\n"
+                "➜ Pin one live message with the status of every service\n"
+                "➜ Replaces the per-update messages unless told otherwise\n\n"
                 "**`/about`**\n"
                 "➜ Learn about the bot and its creator\n\n"
                 "**`/help`**\n"
@@ -1,7 +1,6 @@
 import discord
 from discord import app_commands
 import os
-import sqlite3
 from .base_cog import BaseServiceCog
 
 OWNER_ID = int(os.getenv("OWNER_ID", "353922987235213313"))
@@ -17,13 +16,7 @@ class ListServicesCog(BaseServiceCog):
             )
             return
 
-        with sqlite3.connect(self.db_path) as conn:
-            services = conn.execute("""
-                SELECT s.name, s.webhook_path, COUNT(sc.channel_id) as server_count
-                FROM services s
-                LEFT JOIN server_channels sc ON s.id = sc.service_id
-                GROUP BY s.id
-            """).fetchall()
+        services = await self.bot.db.list_services_with_counts()
         
         if not services:
             await interaction.response.send_message(
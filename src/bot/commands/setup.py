@@ -1,85 +1,135 @@
+import asyncio
+import os
 import discord
 from discord import app_commands
 import sqlite3
 from .base_cog import BaseServiceCog
 
+# Channel creations in flight at once; discord.py waits out the guild's rate limit between them
+SETUP_CONCURRENCY = int(os.getenv("SETUP_CONCURRENCY", "5"))
+# Seconds between progress edits of the original response
+PROGRESS_INTERVAL = 2
+
 class SetupCog(BaseServiceCog):
     @app_commands.command(name="setup", description="Create a new category with channels for all services")
     async def setup_command(self, interaction: discord.Interaction, category_name: str = "Service Status"):
+        # Respond straight away; creating the channels takes longer than an interaction may wait
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        category = None
+        created: dict[int, tuple[str, discord.TextChannel]] = {}
+        webhooks: dict[int, tuple[int, str] | None] = {}
+        progress = None
         try:
-            # Create new category
-            category = await interaction.guild.create_category(category_name)
-            
             # Get all existing services
-            with sqlite3.connect(self.db_path) as conn:
-                services = conn.execute("SELECT id, name FROM services").fetchall()
-            
+            services = await self.bot.db.list_services()
+
             if not services:
-                await interaction.response.send_message(
-                    "No services found to set up channels for.",
-                    ephemeral=True
-                )
+                await interaction.edit_original_response(content="No services found to set up channels for.")
                 return
-            
-            # Send initial response
-            await interaction.response.send_message(
-                "Setting up channels... Please wait.",
-                ephemeral=True
-            )
-            
-            created_channels = []
-            for service_id, service_name in services:
-                channel_name = f"{service_name.lower().replace(' ', '-')}-status"
-                
-                # Create channel in the new category
-                channel = await interaction.guild.create_text_channel(
-                    name=channel_name,
-                    category=category,
-                    topic=f"Status updates for {service_name}"
-                )
-                
-                # Add channel mapping to database
-                conn.execute("""
-                    INSERT OR REPLACE INTO server_channels 
-                    (service_id, guild_id, channel_id) VALUES (?, ?, ?)
-                """, (service_id, interaction.guild_id, channel.id))
-                
-                created_channels.append((service_name, channel))
-            
-            # Create summary embed
-            embed = discord.Embed(
-                title="Setup Complete",
-                description=f"Created category '{category_name}' with channels for all services",
-                color=discord.Color.green()
-            )
-            
-            channels_text = "\n".join([f"• {name}: {channel.mention}" for name, channel in created_channels])
-            embed.add_field(
-                name=f"Created Channels ({len(created_channels)})",
-                value=channels_text or "No channels created",
-                inline=False
+
+            await interaction.edit_original_response(
+                content=f"Setting up channels for {len(services)} services... Please wait."
             )
-            
-            # Edit the original response with the summary
-            await interaction.edit_original_response(content="", embed=embed)
-            
+            progress = asyncio.create_task(self._report_progress(interaction, created, len(services)))
+
+            # Create new category
+            category = await interaction.guild.create_category(category_name)
+
+            semaphore = asyncio.Semaphore(SETUP_CONCURRENCY)
+
+            async def create_channel(service_id: int, service_name: str):
+                async with semaphore:
+                    # Create channel in the new category
+                    channel = await interaction.guild.create_text_channel(
+                        name=f"{service_name.lower().replace(' ', '-')}-status",
+                        category=category,
+                        topic=f"Status updates for {service_name}"
+                    )
+                    created[service_id] = (service_name, channel)
+                    webhooks[service_id] = await self._get_webhook(channel)
+
+            tasks = [asyncio.create_task(create_channel(*service)) for service in services]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # The first failure cancels the remaining creations
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+            # Add every channel mapping in one transaction, so setup is applied completely or not at all
+            await self.bot.db.subscribe_many(interaction.guild_id, [
+                (service_id, channel.id, webhooks.get(service_id)) for service_id, (_, channel) in created.items()
+            ])
+            for service_id, (_, channel) in created.items():
+                self.bot.routes.subscribe(service_id, interaction.guild_id, channel.id, webhooks.get(service_id))
+            self.bot.dashboards.touch(interaction.guild_id)
+
         except discord.Forbidden:
-            await interaction.response.send_message(
-                "I don't have permission to create categories or channels!",
-                ephemeral=True
-            )
+            await self._fail(interaction, progress, category, created,
+                             "I don't have permission to create categories or channels!")
+            return
         except sqlite3.Error as e:
             print(f"Database error: {e}")
-            await interaction.response.send_message(
-                "An error occurred while setting up the channels.",
-                ephemeral=True
-            )
+            await self._fail(interaction, progress, category, created,
+                             "An error occurred while setting up the channels.")
+            return
         except Exception as e:
             print(f"Error during setup: {e}")
-            await interaction.response.send_message(
-                "An unexpected error occurred during setup.",
-                ephemeral=True
-            )
+            await self._fail(interaction, progress, category, created,
+                             "An unexpected error occurred during setup.")
+            return
+
+        progress.cancel()
+        await asyncio.gather(progress, return_exceptions=True)
+
+        # Create summary embed
+        embed = discord.Embed(
+            title="Setup Complete",
+            description=f"Created category '{category_name}' with channels for all services",
+            color=discord.Color.green()
+        )
+
+        channels_text = "\n".join([f"• {name}: {channel.mention}" for name, channel in created.values()])
+        embed.add_field(
+            name=f"Created Channels ({len(created)})",
+            value=channels_text[:1024] or "No channels created",
+            inline=False
+        )
+
+        # Edit the original response with the summary
+        await interaction.edit_original_response(content="", embed=embed)
+
+    async def _report_progress(self, interaction: discord.Interaction, created: dict, total: int):
+        reported = 0
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            if len(created) != reported:
+                reported = len(created)
+                try:
+                    await interaction.edit_original_response(content=f"Created {reported}/{total} channels...")
+                except discord.HTTPException:
+                    pass
+
+    async def _fail(self, interaction: discord.Interaction, progress: asyncio.Task | None,
+                    category: discord.CategoryChannel | None, created: dict, message: str):
+        """Remove whatever setup had created, then report the failure."""
+        if progress:
+            progress.cancel()
+            await asyncio.gather(progress, return_exceptions=True)
+        for _, channel in created.values():
+            try:
+                await channel.delete(reason="Setup failed")
+            except discord.HTTPException:
+                pass
+        if category:
+            try:
+                await category.delete(reason="Setup failed")
+            except discord.HTTPException:
+                pass
+        await interaction.edit_original_response(content=message)
 
 async def setup(bot):
-    await bot.add_cog(SetupCog(bot)) 
\ No newline at end of file
+    await bot.add_cog(SetupCog(bot))
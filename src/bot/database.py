@@ -0,0 +1,285 @@
+import asyncio
+import os
+import time
+from typing import Any, Iterable
+
+import aiosqlite
+
+from src.webhook.metrics import DB_QUERY_SECONDS, Timer
+
+DB_PATH = "config/services.db"
+
+# Queries used on hot paths. sqlite3 keeps compiled statements in a per-connection
+# cache keyed by SQL text, so reusing these constants on one long-lived connection
+# means each is prepared once.
+GET_SERVICE = "SELECT id, webhook_path FROM services WHERE name = ?"
+INSERT_SERVICE = "INSERT INTO services (name, webhook_path) VALUES (?, ?)"
+DELETE_SERVICE = "DELETE FROM services WHERE id = ?"
+COUNT_SERVICES = "SELECT COUNT(*) FROM services"
+LIST_SERVICES = "SELECT id, name FROM services"
+LIST_SERVICES_WITH_COUNTS = """
+    SELECT s.name, s.webhook_path, COUNT(sc.channel_id) as server_count
+    FROM services s
+    LEFT JOIN server_channels sc ON s.id = sc.service_id
+    GROUP BY s.id
+"""
+LIST_ROUTE_SERVICES = "SELECT id, name, webhook_path FROM services"
+LIST_ROUTE_CHANNELS = """
+    SELECT service_id, guild_id, channel_id, webhook_id, webhook_token, filter_events, min_severity, filter_components
+    FROM server_channels ORDER BY id
+"""
+# Re-subscribing a guild moves it to the new channel but keeps its filter
+UPSERT_CHANNEL = """
+    INSERT INTO server_channels
+    (service_id, guild_id, channel_id, webhook_id, webhook_token) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (service_id, guild_id) DO UPDATE SET
+        channel_id = excluded.channel_id, webhook_id = excluded.webhook_id, webhook_token = excluded.webhook_token
+"""
+SET_FILTER = """
+    UPDATE server_channels SET filter_events = ?, min_severity = ?, filter_components = ?
+    WHERE service_id = ? AND guild_id = ?
+"""
+CLEAR_WEBHOOK = "UPDATE server_channels SET webhook_id = NULL, webhook_token = NULL WHERE channel_id = ?"
+DELETE_CHANNEL = "DELETE FROM server_channels WHERE service_id = ? AND guild_id = ?"
+GET_SUBSCRIPTION = "SELECT channel_id FROM server_channels WHERE service_id = ? AND guild_id = ?"
+GET_SERVICE_CHANNELS = "SELECT guild_id, channel_id FROM server_channels WHERE service_id = ?"
+GET_GUILD_CHANNELS = "SELECT service_id, channel_id FROM server_channels WHERE guild_id = ?"
+DELETE_CHANNEL_SUBSCRIPTIONS = "DELETE FROM server_channels WHERE channel_id = ?"
+DELETE_GUILD_SUBSCRIPTIONS = "DELETE FROM server_channels WHERE guild_id = ?"
+# Keyset pagination by rowid, so each page of an export is an index range read
+EXPORT_SUBSCRIPTIONS = """
+    SELECT sc.id, s.name, sc.guild_id, sc.channel_id, sc.filter_events, sc.min_severity, sc.filter_components
+    FROM server_channels sc JOIN services s ON s.id = sc.service_id
+    WHERE sc.id > ? ORDER BY sc.id LIMIT ?
+"""
+GET_META = "SELECT value FROM bot_meta WHERE key = ?"
+SET_META = "INSERT OR REPLACE INTO bot_meta (key, value) VALUES (?, ?)"
+UPSERT_SHARD_STATS = "INSERT OR REPLACE INTO shard_stats (shard_id, guild_count) VALUES (?, ?)"
+SUM_SHARD_GUILDS = "SELECT COALESCE(SUM(guild_count), 0) FROM shard_stats WHERE shard_id < ?"
+
+# (sql, params). A list of parameter tuples runs the statement with executemany.
+Statement = tuple[str, Any]
+
+
+class Database:
+    """Async access to config/services.db shared by the cogs and the webhook server.
+
+    Work goes through two long-lived aiosqlite connections in WAL mode, so
+    queries run on aiosqlite's threads instead of the gateway loop. Writes are
+    handed to a single writer task which groups whatever is waiting into one
+    transaction; each caller's statements run inside their own savepoint, so
+    one failing write doesn't undo the others in the batch. Reads use their
+    own connection and so only ever see committed data, never the writes of
+    a batch that is still open or about to be rolled back.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.batch_size = int(os.getenv("DB_WRITE_BATCH", "100"))
+        self._conn: aiosqlite.Connection | None = None
+        self._reader: aiosqlite.Connection | None = None
+        self._writes: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
+
+    async def connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # isolation_level=None leaves transaction control to the writer task
+        self._conn = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=256)
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("PRAGMA synchronous=NORMAL")
+        await self._conn.execute("PRAGMA busy_timeout=5000")
+        # Off by default in SQLite; server_channels rows are deleted with their service
+        await self._conn.execute("PRAGMA foreign_keys=ON")
+        self._reader = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=256)
+        await self._reader.execute("PRAGMA busy_timeout=5000")
+        await self._reader.execute("PRAGMA query_only=ON")
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop(), name="db-writer")
+
+    async def close(self):
+        if self._writer:
+            # Let queued writes land before shutting the connection
+            await self._writes.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self._reader:
+            await self._reader.close()
+            self._reader = None
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+
+    async def fetchone(self, sql: str, params: Iterable = ()) -> tuple | None:
+        with Timer(DB_QUERY_SECONDS.labels("read")):
+            async with self._reader.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql: str, params: Iterable = ()) -> list[tuple]:
+        with Timer(DB_QUERY_SECONDS.labels("read")):
+            return list(await self._reader.execute_fetchall(sql, params))
+
+    async def write(self, sql: str, params: Iterable = ()) -> int:
+        """Run a single write statement and return its lastrowid."""
+        return (await self.transaction([(sql, params)]))[0]
+
+    async def transaction(self, statements: list[Statement]) -> list[int]:
+        """Run statements atomically through the writer task.
+
+        Returns the lastrowid of each statement.
+        """
+        return await self._enqueue(statements)
+
+    def submit(self, statements: list[Statement]):
+        """Queue statements for the writer without waiting for the commit.
+
+        Writes are applied in submission order, so a later transaction()
+        always sees them. Errors are logged rather than raised.
+        """
+        self._enqueue(statements).add_done_callback(self._log_failure)
+
+    async def flush(self):
+        """Wait until every write queued so far, submitted ones included, has been committed."""
+        await self._enqueue([])
+
+    def _enqueue(self, statements: list[Statement]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((statements, future))
+        return future
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception():
+            print(f"Database error in background write: {future.exception()}")
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < self.batch_size and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+
+            results = []
+            started = time.perf_counter()
+            try:
+                await self._conn.execute("BEGIN IMMEDIATE")
+                for statements, future in batch:
+                    results.append((future, *await self._run_unit(statements)))
+                await self._conn.execute("COMMIT")
+            except Exception as e:
+                print(f"Database error committing batch: {e}")
+                results = [(future, None, e) for _, future in batch]
+                try:
+                    if self._conn.in_transaction:
+                        await self._conn.execute("ROLLBACK")
+                except Exception as rollback_error:
+                    # Logged rather than raised, or the writer task would die and every later write would hang
+                    print(f"Database error rolling back batch: {rollback_error}")
+            finally:
+                DB_QUERY_SECONDS.labels("write").observe(time.perf_counter() - started)
+                for future, value, error in results:
+                    if future.done():
+                        continue
+                    if error:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(value)
+                for _ in batch:
+                    self._writes.task_done()
+
+    async def _run_unit(self, statements: list[Statement]) -> tuple[list[int] | None, Exception | None]:
+        await self._conn.execute("SAVEPOINT unit")
+        try:
+            rowids = []
+            for sql, params in statements:
+                if isinstance(params, list):
+                    async with self._conn.executemany(sql, params) as cursor:
+                        rowids.append(cursor.lastrowid)
+                else:
+                    async with self._conn.execute(sql, params) as cursor:
+                        rowids.append(cursor.lastrowid)
+            await self._conn.execute("RELEASE unit")
+            return rowids, None
+        except Exception as e:
+            await self._conn.execute("ROLLBACK TO unit")
+            await self._conn.execute("RELEASE unit")
+            return None, e
+
+    # Services
+
+    async def get_service(self, name: str) -> tuple | None:
+        return await self.fetchone(GET_SERVICE, (name,))
+
+    async def create_service(self, name: str, webhook_path: str) -> int:
+        return await self.write(INSERT_SERVICE, (name, webhook_path))
+
+    async def delete_service(self, service_id: int):
+        # The service's channel mappings go with it (ON DELETE CASCADE)
+        await self.write(DELETE_SERVICE, (service_id,))
+
+    async def count_services(self) -> int:
+        return (await self.fetchone(COUNT_SERVICES))[0]
+
+    async def list_services(self) -> list[tuple]:
+        return await self.fetchall(LIST_SERVICES)
+
+    async def list_services_with_counts(self) -> list[tuple]:
+        return await self.fetchall(LIST_SERVICES_WITH_COUNTS)
+
+    # Subscriptions
+
+    async def subscribe(self, service_id: int, guild_id: int, channel_id: int,
+                        webhook: tuple[int, str] | None = None):
+        webhook_id, webhook_token = webhook or (None, None)
+        await self.write(UPSERT_CHANNEL, (service_id, guild_id, channel_id, webhook_id, webhook_token))
+
+    async def subscribe_many(self, guild_id: int, subscriptions: list[tuple[int, int, tuple[int, str] | None]]):
+        """Subscribe several (service_id, channel_id, webhook) in one transaction."""
+        rows = []
+        for service_id, channel_id, webhook in subscriptions:
+            webhook_id, webhook_token = webhook or (None, None)
+            rows.append((service_id, guild_id, channel_id, webhook_id, webhook_token))
+        await self.transaction([(UPSERT_CHANNEL, rows)])
+
+    async def unsubscribe(self, service_id: int, guild_id: int):
+        await self.write(DELETE_CHANNEL, (service_id, guild_id))
+
+    async def set_filter(self, service_id: int, guild_id: int, events: str, min_severity: int,
+                         components: str | None) -> bool:
+        """Store a subscription's filter. Returns False if the guild isn't subscribed."""
+        await self.write(SET_FILTER, (events, min_severity, components, service_id, guild_id))
+        return await self.fetchone(GET_SUBSCRIPTION, (service_id, guild_id)) is not None
+
+    async def apply_subscription_batch(self, subscribed: list[tuple], filters: list[tuple], removed: list[tuple]):
+        """Write one chunk of a bulk import in a single transaction.
+
+        subscribed holds UPSERT_CHANNEL rows, filters SET_FILTER rows and
+        removed DELETE_CHANNEL rows.
+        """
+        statements = [(DELETE_CHANNEL, removed), (UPSERT_CHANNEL, subscribed), (SET_FILTER, filters)]
+        await self.transaction([(sql, rows) for sql, rows in statements if rows])
+
+    async def export_subscriptions(self, after_id: int, limit: int) -> list[tuple]:
+        """The next page of subscriptions after server_channels.id after_id, with service names."""
+        return await self.fetchall(EXPORT_SUBSCRIPTIONS, (after_id, limit))
+
+    async def get_service_channels(self, service_id: int) -> list[tuple]:
+        return await self.fetchall(GET_SERVICE_CHANNELS, (service_id,))
+
+    async def get_guild_channels(self, guild_id: int) -> list[tuple]:
+        return await self.fetchall(GET_GUILD_CHANNELS, (guild_id,))
+
+    # Metadata
+
+    async def get_meta(self, key: str) -> str | None:
+        row = await self.fetchone(GET_META, (key,))
+        return row[0] if row else None
+
+    async def set_meta(self, key: str, value: str):
+        await self.write(SET_META, (key, value))
+
+    # Shards
+
+    async def record_shard_guilds(self, counts: dict[int, int], shard_count: int) -> int:
+        """Store this process's guild count per shard and return the total across all shards."""
+        await self.transaction([(UPSERT_SHARD_STATS, list(counts.items()))])
+        return (await self.fetchone(SUM_SHARD_GUILDS, (shard_count,)))[0]
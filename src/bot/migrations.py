@@ -0,0 +1,238 @@
+"""Versioned schema migrations for config/services.db.
+
+The schema version is kept in SQLite's user_version. Each migration runs in
+one transaction together with its version bump, so an existing database is
+upgraded in place and an interrupted upgrade resumes from the last step that
+completed. Migrations are append-only: never edit one that has shipped.
+"""
+from src.bot.database import (
+    CLEAR_WEBHOOK, Database, DELETE_CHANNEL, DELETE_CHANNEL_SUBSCRIPTIONS, DELETE_GUILD_SUBSCRIPTIONS,
+    DELETE_SERVICE, EXPORT_SUBSCRIPTIONS, GET_GUILD_CHANNELS, GET_SERVICE, GET_SERVICE_CHANNELS, GET_SUBSCRIPTION, SET_FILTER,
+)
+
+
+async def _baseline(db: Database) -> list[str]:
+    # The schema BaseServiceCog used to create, for databases that predate versioning
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            webhook_path TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS server_channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service_id INTEGER,
+            guild_id INTEGER,
+            channel_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(service_id, guild_id),
+            FOREIGN KEY(service_id) REFERENCES services(id)
+        )
+        """,
+        "CREATE TABLE IF NOT EXISTS bot_meta (key TEXT PRIMARY KEY, value TEXT)",
+        """
+        CREATE TABLE IF NOT EXISTS shard_stats (
+            shard_id INTEGER PRIMARY KEY,
+            guild_count INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]
+    # Webhook delivery mode stores each channel's Discord webhook alongside the mapping
+    columns = {row[1] for row in await db.fetchall("PRAGMA table_info(server_channels)")}
+    if "webhook_id" not in columns:
+        statements += [
+            "ALTER TABLE server_channels ADD COLUMN webhook_id INTEGER",
+            "ALTER TABLE server_channels ADD COLUMN webhook_token TEXT",
+        ]
+    return statements
+
+
+async def _cascade_service_channels(db: Database) -> list[str]:
+    # SQLite can't alter a foreign key, so the table is rebuilt. Mappings left behind
+    # by services deleted before this migration are dropped on the way.
+    return [
+        """
+        CREATE TABLE server_channels_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service_id INTEGER NOT NULL REFERENCES services(id) ON DELETE CASCADE,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            webhook_id INTEGER,
+            webhook_token TEXT,
+            UNIQUE(service_id, guild_id)
+        )
+        """,
+        """
+        INSERT INTO server_channels_new
+            (id, service_id, guild_id, channel_id, created_at, webhook_id, webhook_token)
+        SELECT id, service_id, guild_id, channel_id, created_at, webhook_id, webhook_token
+        FROM server_channels
+        WHERE service_id IN (SELECT id FROM services) AND guild_id IS NOT NULL AND channel_id IS NOT NULL
+        """,
+        "DROP TABLE server_channels",
+        "ALTER TABLE server_channels_new RENAME TO server_channels",
+    ]
+
+
+async def _channel_indexes(db: Database) -> list[str]:
+    # UNIQUE(service_id, guild_id) already covers lookups by service
+    return [
+        "CREATE INDEX IF NOT EXISTS idx_server_channels_channel ON server_channels(channel_id)",
+        "CREATE INDEX IF NOT EXISTS idx_server_channels_guild ON server_channels(guild_id)",
+    ]
+
+
+async def _service_teardowns(db: Database) -> list[str]:
+    # Deleted services whose channels are still being notified or deleted in the background
+    return [
+        """
+        CREATE TABLE service_teardowns (
+            service_id INTEGER PRIMARY KEY,
+            service_name TEXT NOT NULL,
+            delete_channels INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE teardown_channels (
+            service_id INTEGER NOT NULL REFERENCES service_teardowns(service_id) ON DELETE CASCADE,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            PRIMARY KEY (service_id, channel_id)
+        )
+        """,
+    ]
+
+
+async def _subscription_filters(db: Database) -> list[str]:
+    # NULL components means every component; see src/webhook/filters.py
+    return [
+        "ALTER TABLE server_channels ADD COLUMN filter_events TEXT NOT NULL DEFAULT 'all'",
+        "ALTER TABLE server_channels ADD COLUMN min_severity INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE server_channels ADD COLUMN filter_components TEXT",
+    ]
+
+
+async def _dashboards(db: Database) -> list[str]:
+    # Each service's last known status, and the guilds showing it on a dashboard message
+    return [
+        """
+        CREATE TABLE service_states (
+            service_id INTEGER PRIMARY KEY REFERENCES services(id) ON DELETE CASCADE,
+            state TEXT NOT NULL,
+            updated_at REAL
+        )
+        """,
+        """
+        CREATE TABLE guild_dashboards (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER,
+            replace_messages INTEGER NOT NULL DEFAULT 1
+        )
+        """,
+        "CREATE INDEX idx_guild_dashboards_channel ON guild_dashboards(channel_id)",
+    ]
+
+
+async def _delivery_tables(db: Database) -> list[str]:
+    # The outbox, dedup and ingest tables used to be created by their modules at startup.
+    # IF NOT EXISTS adopts the copies existing databases already have.
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS outbox_events (
+            id TEXT PRIMARY KEY,
+            service_name TEXT,
+            payload TEXT,
+            embed TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS outbox_deliveries (
+            event_id TEXT,
+            guild_id INTEGER,
+            channel_id INTEGER,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL,
+            last_error TEXT,
+            PRIMARY KEY (event_id, channel_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_outbox_deliveries_due ON outbox_deliveries(status, next_attempt_at)",
+        "CREATE TABLE IF NOT EXISTS webhook_dedup (key TEXT PRIMARY KEY, seen_at REAL)",
+        """
+        CREATE TABLE IF NOT EXISTS ingest_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service_name TEXT,
+            payload TEXT,
+            received_at REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ingest_cursors (
+            consumer TEXT PRIMARY KEY,
+            last_id INTEGER,
+            updated_at REAL
+        )
+        """,
+    ]
+
+
+# Version N is reached by running MIGRATIONS[N - 1]
+MIGRATIONS = [
+    _baseline,
+    _cascade_service_channels,
+    _channel_indexes,
+    _service_teardowns,
+    _subscription_filters,
+    _dashboards,
+    _delivery_tables,
+]
+
+# Hot queries and the parameters to plan them with; none of them may scan a table
+INDEXED_QUERIES = [
+    (GET_SERVICE, ("",)),
+    (GET_SERVICE_CHANNELS, (0,)),
+    (GET_GUILD_CHANNELS, (0,)),
+    (DELETE_CHANNEL, (0, 0)),
+    (SET_FILTER, ("all", 0, None, 0, 0)),
+    (GET_SUBSCRIPTION, (0, 0)),
+    (DELETE_SERVICE, (0,)),
+    (CLEAR_WEBHOOK, (0,)),
+    (DELETE_CHANNEL_SUBSCRIPTIONS, (0,)),
+    (DELETE_GUILD_SUBSCRIPTIONS, (0,)),
+    (EXPORT_SUBSCRIPTIONS, (0, 1000)),
+]
+
+
+async def migrate(db: Database) -> int:
+    """Upgrade the database to the latest schema version and return it."""
+    version = (await db.fetchone("PRAGMA user_version"))[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        statements = [(sql, ()) for sql in await migration(db)]
+        # PRAGMA doesn't take parameters; number is always an int
+        await db.transaction(statements + [(f"PRAGMA user_version = {number}", ())])
+        print(f"Migrated database to schema version {number} ({migration.__name__.strip('_')})")
+    return len(MIGRATIONS)
+
+
+async def check_query_plans(db: Database) -> list[str]:
+    """Return the hot queries SQLite would answer with a full table scan."""
+    scans = []
+    # EXPLAIN never reads the database, so it would plan against the reader's
+    # cached schema; a real read first picks up indexes a migration just added
+    await db.fetchone("SELECT count(*) FROM sqlite_master")
+    for sql, params in INDEXED_QUERIES:
+        plan = await db.fetchall(f"EXPLAIN QUERY PLAN {sql}", params)
+        details = [row[-1] for row in plan]
+        if any(detail.startswith("SCAN") and "USING" not in detail for detail in details):
+            scans.append(f"{' '.join(sql.split())} -> {'; '.join(details)}")
+    return scans
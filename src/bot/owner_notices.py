@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+import discord
+from discord.http import MultipartParameters
+
+# Discord accepts up to 10 embeds in one message
+EMBEDS_PER_MESSAGE = 10
+
+
+class OwnerNotices:
+    """Low-priority lane for the "New Server Joined" notices sent to the owner.
+
+    on_guild_join only queues the notice. One background task sends them
+    while notification delivery is idle, waiting at most
+    OWNER_NOTICE_MAX_DELAY seconds for that, and packs up to ten joins into
+    a message. A wave of joins therefore neither holds up the gateway
+    handlers nor takes rate limit away from status notifications.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channel_id = int(os.getenv("OWNER_NOTIFICATION_CHANNEL", "1316890394415599706"))
+        self.max_delay = float(os.getenv("OWNER_NOTICE_MAX_DELAY", "300"))
+        self._pending: list[dict] = []
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+
+    def guild_joined(self, guild: discord.Guild):
+        # Built now: the guild may be gone from the cache by the time this is sent
+        embed = discord.Embed(
+            title="🎉 New Server Joined",
+            description=f"Bot has been added to a new server!",
+            color=discord.Color.green(),
+            timestamp=discord.utils.utcnow()
+        )
+
+        embed.add_field(
+            name="Server Info",
+            value=f"**Name:** {guild.name}\n**ID:** {guild.id}\n**Members:** {guild.member_count}",
+            inline=False
+        )
+
+        embed.add_field(
+            name="Owner",
+            value=f"{guild.owner} (ID: {guild.owner_id})",
+            inline=False
+        )
+
+        self._pending.append(embed.to_dict())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="owner-notices")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            print(f"Dropping {len(self._pending)} unsent server join notices")
+
+    async def _run(self):
+        while self._pending:
+            await self._wait_for_idle()
+            embeds, self._pending = self._pending[:EMBEDS_PER_MESSAGE], self._pending[EMBEDS_PER_MESSAGE:]
+            params = MultipartParameters(payload={"embeds": embeds}, multipart=None, files=None)
+            try:
+                await self.bot.http.send_message(self.channel_id, params=params)
+                self.sent += len(embeds)
+            except discord.HTTPException as e:
+                # The channel lives in one guild, so only one shard process can usually reach it
+                print(f"Could not send {len(embeds)} server join notices: {e}")
+
+    async def _wait_for_idle(self):
+        delivery = self.bot.delivery
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while loop.time() < deadline and delivery.running and (delivery.depth or delivery.fanout.active_lanes):
+            await asyncio.sleep(1)
@@ -0,0 +1,62 @@
+import os
+
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    # https://discord.com/developers/docs/topics/gateway#sharding-sharding-formula
+    return (guild_id >> 22) % shard_count
+
+
+def parse_shard_ids(spec: str) -> list[int]:
+    """Parse SHARD_IDS, e.g. "0-3" or "0,2,4-5"."""
+    ids = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        first, _, last = item.partition("-")
+        ids.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(ids))
+
+
+class ShardScope:
+    """The gateway shards this process is responsible for.
+
+    With SHARD_IDS unset the process runs every shard (discord.py picks the
+    count when SHARD_COUNT is unset too) and owns every guild. With SHARD_IDS
+    set, several processes split the shards between them and each one only
+    routes, delivers and retries notifications for the guilds on its own
+    shards.
+    """
+
+    __slots__ = ("count", "ids", "_owned")
+
+    def __init__(self, count: int | None = None, ids: list[int] | None = None):
+        if ids is not None and count is None:
+            raise ValueError("SHARD_IDS requires SHARD_COUNT")
+        if ids is not None and any(shard_id >= count for shard_id in ids):
+            raise ValueError(f"SHARD_IDS must be below SHARD_COUNT ({count})")
+        self.count = count
+        self.ids = ids
+        self._owned = frozenset(ids) if ids is not None else None
+
+    @classmethod
+    def from_env(cls) -> "ShardScope":
+        count = os.getenv("SHARD_COUNT")
+        ids = os.getenv("SHARD_IDS")
+        return cls(int(count) if count else None, parse_shard_ids(ids) if ids else None)
+
+    @property
+    def partial(self) -> bool:
+        return self._owned is not None
+
+    def owns(self, guild_id: int) -> bool:
+        return self._owned is None or shard_for(guild_id, self.count) in self._owned
+
+    def sql(self, column: str) -> str:
+        """A WHERE condition selecting the rows whose guild id column is owned."""
+        if self._owned is None:
+            return "1"
+        # Only ever built from parsed integers, so inlining them is safe
+        return f"({column} >> 22) % {self.count} IN ({', '.join(map(str, self.ids))})"
+
+    def __str__(self) -> str:
+        if self._owned is None:
+            return "all shards"
+        return f"shards {','.join(map(str, self.ids))} of {self.count}"
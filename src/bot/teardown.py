@@ -0,0 +1,148 @@
+import asyncio
+import os
+
+import aiohttp
+import discord
+from discord.http import MultipartParameters
+
+from src.bot.database import Database, DELETE_SERVICE
+from src.bot.sharding import ShardScope
+
+INSERT_TEARDOWN = "INSERT INTO service_teardowns (service_id, service_name, delete_channels) VALUES (?, ?, ?)"
+COPY_TEARDOWN_CHANNELS = """
+    INSERT INTO teardown_channels (service_id, guild_id, channel_id)
+    SELECT service_id, guild_id, channel_id FROM server_channels WHERE service_id = ?
+"""
+LIST_TEARDOWNS = "SELECT service_id, service_name, delete_channels FROM service_teardowns"
+SELECT_TEARDOWN_CHANNELS = "SELECT guild_id, channel_id FROM teardown_channels WHERE service_id = ? AND {shards}"
+DELETE_TEARDOWN_CHANNEL = "DELETE FROM teardown_channels WHERE service_id = ? AND channel_id = ?"
+# Other shard processes may still be working through their own channels
+FINISH_TEARDOWN = """
+    DELETE FROM service_teardowns
+    WHERE service_id = ? AND NOT EXISTS (SELECT 1 FROM teardown_channels WHERE service_id = ?)
+"""
+
+
+class TeardownProgress:
+    __slots__ = ("service_name", "delete_channels", "total", "done", "failed")
+
+    def __init__(self, service_name: str, delete_channels: bool, total: int):
+        self.service_name = service_name
+        self.delete_channels = delete_channels
+        self.total = total
+        self.done = 0
+        self.failed = 0
+
+
+class ServiceTeardown:
+    """Removes a deleted service from every channel that subscribed to it.
+
+    /deleteservice deletes the service and records its channels in
+    teardown_channels in one transaction, then this works through them in
+    the background: each channel is either sent a removal notice or deleted,
+    TEARDOWN_CONCURRENCY at a time. discord.py waits out the per-route rate
+    limits, and the concurrency stays low enough to leave the global limit to
+    notification delivery. A channel's row is removed once it has been
+    handled, so a teardown interrupted by a restart picks up where it left
+    off. Channels that fail for a reason that may pass (a 5xx, a timeout, a
+    dropped connection) keep their row and are tried again when the teardown
+    is next resumed. When the shards are split across processes, each one
+    handles the channels in its own guilds.
+    """
+
+    def __init__(self, bot, scope: ShardScope = None):
+        self.bot = bot
+        self.concurrency = int(os.getenv("TEARDOWN_CONCURRENCY", "5"))
+        self._select_channels = SELECT_TEARDOWN_CHANNELS.format(shards=(scope or ShardScope()).sql("guild_id"))
+        self._tasks: dict[int, asyncio.Task] = {}
+        self.progress: dict[int, TeardownProgress] = {}
+
+    @property
+    def db(self) -> Database:
+        return self.bot.db
+
+    async def begin(self, service_id: int, service_name: str, delete_channels: bool) -> asyncio.Task:
+        """Delete the service and start removing it from its channels."""
+        await self.db.transaction([
+            (INSERT_TEARDOWN, (service_id, service_name, int(delete_channels))),
+            (COPY_TEARDOWN_CHANNELS, (service_id,)),
+            # The service's channel mappings go with it (ON DELETE CASCADE)
+            (DELETE_SERVICE, (service_id,)),
+        ])
+        self.bot.routes.remove_service(service_id)
+        self.bot.dashboards.touch()
+        return await self._start(service_id, service_name, delete_channels)
+
+    async def resume(self):
+        """Restart any teardown left unfinished, by a previous run or by another shard process."""
+        for service_id, service_name, delete_channels in await self.db.fetchall(LIST_TEARDOWNS):
+            if service_id not in self._tasks:
+                await self._start(service_id, service_name, bool(delete_channels))
+
+    async def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _start(self, service_id: int, service_name: str, delete_channels: bool) -> asyncio.Task:
+        channels = await self.db.fetchall(self._select_channels, (service_id,))
+        if service_id in self._tasks:
+            # Started by begin() and resume() at the same time
+            return self._tasks[service_id]
+        if channels:
+            print(f"Removing service '{service_name}' from {len(channels)} channels")
+        self.progress[service_id] = TeardownProgress(service_name, delete_channels, len(channels))
+        task = self._tasks[service_id] = asyncio.create_task(
+            self._run(service_id, channels), name=f"teardown-{service_id}"
+        )
+        task.add_done_callback(lambda _: self._tasks.pop(service_id, None))
+        return task
+
+    async def _run(self, service_id: int, channels: list[tuple[int, int]]):
+        progress = self.progress[service_id]
+        pending = iter(channels)
+        # Channels whose rows are kept for the next resume()
+        retried = []
+
+        async def worker():
+            # Workers share one iterator, so each channel is handled once
+            for guild_id, channel_id in pending:
+                outcome = await self._remove(progress, channel_id)
+                if outcome != "removed":
+                    progress.failed += 1
+                progress.done += 1
+                if outcome == "retry":
+                    retried.append(channel_id)
+                else:
+                    self.db.submit([(DELETE_TEARDOWN_CHANNEL, (service_id, channel_id))])
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            await self.db.write(FINISH_TEARDOWN, (service_id, service_id))
+            if progress.total:
+                print(f"Removed service '{progress.service_name}' from {progress.done} channels ({progress.failed} failed)")
+            if retried:
+                print(f"{len(retried)} channels of service '{progress.service_name}' will be tried again on the next resume")
+        finally:
+            # Whoever is reporting on the teardown holds its own reference
+            self.progress.pop(service_id, None)
+
+    async def _remove(self, progress: TeardownProgress, channel_id: int) -> str:
+        """Return "removed", "gone" if the channel can't be reached for good, or "retry"."""
+        try:
+            if progress.delete_channels:
+                await self.bot.http.delete_channel(
+                    channel_id, reason=f"Service '{progress.service_name}' was deleted"
+                )
+            else:
+                notice = f"The service '{progress.service_name}' has been removed. This channel needs to be deleted."
+                params = MultipartParameters(payload={"content": notice}, multipart=None, files=None)
+                await self.bot.http.send_message(channel_id, params=params)
+            return "removed"
+        except (discord.Forbidden, discord.NotFound):
+            # Already gone, or the bot was removed from the guild
+            return "gone"
+        except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Connection errors and timeouts aren't HTTPExceptions, but must not take the worker down with them
+            print(f"Error removing service '{progress.service_name}' from channel {channel_id}: {e!r}")
+            return "retry"
@@ -0,0 +1,85 @@
+import os
+import time
+
+
+class ChannelBreakers:
+    """Per-channel circuit breakers for sends that keep failing permanently.
+
+    A Forbidden or NotFound opens the channel's breaker, and fan-out skips
+    the channel until CHANNEL_BREAKER_COOLDOWN has passed. The next send is
+    then let through as a probe: a success closes the breaker, another
+    failure opens it again. After CHANNEL_FAILURE_THRESHOLD consecutive
+    failures the channel's subscriptions are removed.
+
+    Channels the bot has lost permission to send in are paused outright
+    until their permissions come back.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.threshold = int(os.getenv("CHANNEL_FAILURE_THRESHOLD", "3"))
+        self.cooldown = float(os.getenv("CHANNEL_BREAKER_COOLDOWN", "300"))
+        self._failures: dict[int, int] = {}
+        self._open_until: dict[int, float] = {}
+        self._paused: set[int] = set()
+        # Subscriptions removed by this breaker and by the guild/channel listeners
+        self.pruned = 0
+
+    def blocked(self, channel_id: int) -> bool:
+        """Whether the channel is paused or its breaker is open, without claiming the probe."""
+        if channel_id in self._paused:
+            return True
+        until = self._open_until.get(channel_id)
+        return until is not None and time.monotonic() < until
+
+    def allow(self, channel_id: int) -> bool:
+        """Whether a send to the channel should be attempted now."""
+        if channel_id in self._paused:
+            return False
+        until = self._open_until.get(channel_id)
+        if until is None:
+            return True
+        now = time.monotonic()
+        if now < until:
+            return False
+        # Half-open: this send probes the channel, anything else waits for its result
+        self._open_until[channel_id] = now + self.cooldown
+        return True
+
+    def record(self, channel_id: int, error: str | None, unreachable: bool):
+        if error is None:
+            if channel_id in self._failures:
+                del self._failures[channel_id]
+                self._open_until.pop(channel_id, None)
+            return
+        if not unreachable:
+            return
+        failures = self._failures.get(channel_id, 0) + 1
+        if failures >= self.threshold:
+            print(f"Removing subscriptions for channel {channel_id} after {failures} failed sends ({error})")
+            self.bot.purge_channel(channel_id, "unreachable")
+            return
+        self._failures[channel_id] = failures
+        self._open_until[channel_id] = time.monotonic() + self.cooldown
+
+    def pause(self, channel_id: int):
+        if channel_id not in self._paused:
+            print(f"Pausing delivery to channel {channel_id}: missing permissions")
+            self._paused.add(channel_id)
+
+    def resume(self, channel_id: int):
+        if channel_id in self._paused:
+            print(f"Resuming delivery to channel {channel_id}")
+            self._paused.discard(channel_id)
+        self.reset(channel_id)
+
+    def reset(self, channel_id: int):
+        self._failures.pop(channel_id, None)
+        self._open_until.pop(channel_id, None)
+
+    def forget(self, channel_id: int):
+        self._paused.discard(channel_id)
+        self.reset(channel_id)
+
+    def stats(self) -> dict:
+        return {"open": len(self._open_until), "paused": len(self._paused), "pruned": self.pruned}
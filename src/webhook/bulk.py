@@ -0,0 +1,301 @@
+"""Bulk export and import of subscriptions as newline-delimited JSON.
+
+Both directions work in chunks of BULK_BATCH_SIZE rows, so memory stays flat
+however many subscriptions there are. The export pages through
+server_channels by id. The import reads the request stream line by line and
+commits each chunk in its own transaction before reading on.
+
+Every line is one subscription:
+
+    {"service": "github", "guild_id": "1", "channel_id": "2", "events": "all", "min_severity": "all", "components": null}
+
+Imported lines may also set "op" to "unsubscribe" (channel_id and the filter
+keys are then ignored). Leaving out all the filter keys keeps the
+subscription's current filter, so an export can be imported as it is.
+"""
+import hmac
+import json
+import os
+import sqlite3
+from typing import NamedTuple
+
+from fastapi import HTTPException, Request
+
+from src.bot.database import Database
+from .filters import EVENT_KINDS, SEVERITY_LEVELS, compile_filter
+from .parsing import PayloadError, loads
+
+MAX_LINE_BYTES = 65536
+# Line errors reported back in full; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+SEVERITY_NAMES = {value: name for name, value in SEVERITY_LEVELS.items()}
+FILTER_KEYS = ("events", "min_severity", "components")
+# The server_channels filter columns of a subscription without a filter, as /filterservice stores it
+NO_FILTER = ("all", 0, None)
+
+
+def authorize(request: Request):
+    """Require "Authorization: Bearer <ADMIN_API_TOKEN>". The API doesn't exist while the token is unset."""
+    token = os.getenv("ADMIN_API_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid API token", headers={"WWW-Authenticate": "Bearer"})
+
+
+def batch_size() -> int:
+    return int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+
+async def export_lines(db: Database):
+    """Yield every subscription as NDJSON, one chunk per page."""
+    after_id = 0
+    size = batch_size()
+    while True:
+        rows = await db.export_subscriptions(after_id, size)
+        if not rows:
+            return
+        yield "".join(map(_export_line, rows)).encode()
+        after_id = rows[-1][0]
+
+
+def _export_line(row: tuple) -> str:
+    _, service, guild_id, channel_id, events, min_severity, components = row
+    return json.dumps({
+        "service": service,
+        # Strings, as in Discord's API, so tools that read numbers as doubles don't round them
+        "guild_id": str(guild_id),
+        "channel_id": str(channel_id),
+        "events": events or "all",
+        "min_severity": SEVERITY_NAMES.get(min_severity or 0, "all"),
+        "components": components.split(",") if components else None,
+    }, ensure_ascii=False) + "\n"
+
+
+async def read_lines(request: Request):
+    """Yield (line number, line) for each non-blank line of a streamed body."""
+    number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if len(line) > MAX_LINE_BYTES:
+                raise PayloadError(413, f"Line {number} is longer than {MAX_LINE_BYTES} bytes")
+            if line.strip():
+                yield number, line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise PayloadError(413, f"Line {number + 1} is longer than {MAX_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield number + 1, buffer
+
+
+class ImportLine(NamedTuple):
+    op: str
+    service: str
+    guild_id: int
+    channel_id: int | None
+    # server_channels filter columns, or None to keep the current filter
+    filter: tuple[str, int, str | None] | None
+
+
+def _snowflake(data: dict, key: str) -> int:
+    value = data.get(key)
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 < value < 2 ** 63:
+        raise ValueError(f"'{key}' must be a Discord id")
+    return value
+
+
+def parse_line(line: bytes) -> ImportLine:
+    try:
+        data = loads(line)
+    except (ValueError, RecursionError):
+        raise ValueError("Invalid JSON")
+    if not isinstance(data, dict):
+        raise ValueError("Line must be a JSON object")
+
+    op = data.get("op", "subscribe")
+    if op not in ("subscribe", "unsubscribe"):
+        raise ValueError("'op' must be 'subscribe' or 'unsubscribe'")
+    service = data.get("service")
+    if not isinstance(service, str) or not service:
+        raise ValueError("'service' must be a service name")
+    guild_id = _snowflake(data, "guild_id")
+    if op == "unsubscribe":
+        return ImportLine(op, service, guild_id, None, None)
+
+    channel_id = _snowflake(data, "channel_id")
+    if not any(key in data for key in FILTER_KEYS):
+        return ImportLine(op, service, guild_id, channel_id, None)
+
+    events = data.get("events") or "all"
+    if events not in EVENT_KINDS:
+        raise ValueError(f"'events' must be one of {', '.join(EVENT_KINDS)}")
+    min_severity = data.get("min_severity") or "all"
+    if min_severity not in SEVERITY_LEVELS:
+        raise ValueError(f"'min_severity' must be one of {', '.join(SEVERITY_LEVELS)}")
+    components = data.get("components")
+    if isinstance(components, list) and all(isinstance(name, str) for name in components):
+        components = ",".join(components)
+    elif components is not None and not isinstance(components, str):
+        raise ValueError("'components' must be a list of component names")
+    subscription_filter = compile_filter(events, SEVERITY_LEVELS[min_severity], components)
+    return ImportLine(op, service, guild_id, channel_id, subscription_filter.row() if subscription_filter else NO_FILTER)
+
+
+class RouteChanges:
+    """Committed changes to one service's subscriptions not yet applied to the routing table."""
+
+    __slots__ = ("subscribed", "filters", "removed")
+
+    def __init__(self):
+        self.subscribed: dict[int, int] = {}
+        self.filters: dict = {}
+        self.removed: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.subscribed) + len(self.removed)
+
+    def subscribe(self, guild_id: int, channel_id: int, filter_row: tuple | None):
+        if guild_id in self.removed:
+            # Its row was deleted by an earlier chunk, so it comes back without a filter
+            self.removed.discard(guild_id)
+            self.filters[guild_id] = None
+        self.subscribed[guild_id] = channel_id
+        if filter_row is not None:
+            self.filters[guild_id] = compile_filter(*filter_row)
+
+    def unsubscribe(self, guild_id: int):
+        self.subscribed.pop(guild_id, None)
+        self.filters.pop(guild_id, None)
+        self.removed.add(guild_id)
+
+
+class SubscriptionImport:
+    """One bulk import request.
+
+    Lines are merged by (service, guild) into a chunk of at most
+    BULK_BATCH_SIZE lines, with the later line winning as it would if the
+    lines were applied one by one. Each chunk is written in one transaction.
+
+    Rebuilding a route costs time in proportion to its size, so the routing
+    table isn't updated per chunk. A service's committed changes are held
+    until they reach a quarter of its route (or the import ends) and are
+    then applied in one rebuild. That keeps a large import linear, and what
+    is held never exceeds a fraction of what the routing table already
+    holds. Services that don't exist yet are created, as /addservice would.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.batch_size = batch_size()
+        self._service_ids: dict[str, int | None] = {}
+        self._pending: dict[tuple[int, int], ImportLine] = {}
+        self._pending_lines = 0
+        self._changes: dict[int, RouteChanges] = {}
+        self.lines = 0
+        self.subscribed = 0
+        self.unsubscribed = 0
+        self.services_created = 0
+        self.invalid = 0
+        self.errors: list[dict] = []
+
+    def summary(self) -> dict:
+        return {
+            "lines": self.lines,
+            "subscribed": self.subscribed,
+            "unsubscribed": self.unsubscribed,
+            "services_created": self.services_created,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+    async def run(self, lines):
+        try:
+            async for number, line in lines:
+                self.lines += 1
+                try:
+                    await self.add(parse_line(line))
+                except ValueError as e:
+                    self._error(number, str(e))
+                if self._pending_lines >= self.batch_size:
+                    await self.flush()
+            await self.flush()
+        finally:
+            self.apply_routes(everything=True)
+            if self.services_created:
+                self.bot.update_status()
+
+    async def add(self, line: ImportLine):
+        service_id = await self._service_id(line.service, create=line.op == "subscribe")
+        key = (service_id, line.guild_id)
+        previous = self._pending.get(key)
+        if line.op == "subscribe" and line.filter is None and previous is not None:
+            # Resubscribing keeps the filter, but a subscription removed earlier in the chunk has none left
+            line = line._replace(filter=previous.filter if previous.op == "subscribe" else NO_FILTER)
+        self._pending[key] = line
+        self._pending_lines += 1
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_lines = self._pending, {}, 0
+        subscribed, filters, removed = [], [], []
+        for (service_id, guild_id), line in pending.items():
+            if line.op == "unsubscribe":
+                removed.append((service_id, guild_id))
+            else:
+                subscribed.append((service_id, guild_id, line.channel_id, None, None))
+                if line.filter is not None:
+                    filters.append((*line.filter, service_id, guild_id))
+        await self.bot.db.apply_subscription_batch(subscribed, filters, removed)
+        self.subscribed += len(subscribed)
+        self.unsubscribed += len(removed)
+
+        for (service_id, guild_id), line in pending.items():
+            changes = self._changes.get(service_id)
+            if changes is None:
+                changes = self._changes[service_id] = RouteChanges()
+            if line.op == "unsubscribe":
+                changes.unsubscribe(guild_id)
+            else:
+                changes.subscribe(guild_id, line.channel_id, line.filter)
+        self.apply_routes()
+
+    def apply_routes(self, everything: bool = False):
+        """Apply the held changes of every service that has enough of them (or all of them)."""
+        for service_id, changes in list(self._changes.items()):
+            if everything or len(changes) >= max(self.batch_size, self.bot.routes.subscription_count(service_id) // 4):
+                del self._changes[service_id]
+                self.bot.routes.apply_batch(service_id, changes.subscribed, changes.filters, changes.removed)
+                for guild_id in (*changes.subscribed, *changes.removed):
+                    self.bot.dashboards.touch(guild_id)
+
+    async def _service_id(self, name: str, create: bool) -> int:
+        if name not in self._service_ids:
+            service = await self.bot.db.get_service(name)
+            self._service_ids[name] = service[0] if service else None
+            if service:
+                self.bot.routes.add_service(service[0], name, service[1])
+        service_id = self._service_ids[name]
+        if service_id is None and create:
+            webhook_path = f"/webhook/{name.lower().replace(' ', '_')}"
+            try:
+                service_id = await self.bot.db.create_service(name, webhook_path)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Service '{name}' would use a webhook path another service already has")
+            self.bot.routes.add_service(service_id, name, webhook_path)
+            self._service_ids[name] = service_id
+            self.services_created += 1
+        if service_id is None:
+            raise ValueError(f"Service '{name}' not found")
+        return service_id
+
+    def _error(self, number: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": number, "error": message})
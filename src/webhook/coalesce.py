@@ -0,0 +1,128 @@
+import asyncio
+import dataclasses
+import os
+import uuid
+from typing import Callable
+
+from .formatting import COMPONENT_SEVERITY
+from .parsing import StatuspageEvent
+from .render import render_component_digest
+
+
+def parse_windows(spec: str) -> dict[str, float]:
+    """Parse COALESCE_WINDOWS, e.g. "github=10,openai=0"."""
+    windows = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = item.partition("=")
+        windows[name.strip()] = float(seconds)
+    return windows
+
+
+class Coalescer:
+    """Merges bursts of component updates into one notification per service.
+
+    During an outage Statuspage sends a component_update webhook for every
+    component that changes. Instead of delivering each one, updates for a
+    service are held for its debounce window and then sent as a single embed
+    listing every transition. Incidents and critical changes (a major outage
+    or a critical page indicator) skip the window; anything already held for
+    that service is flushed first so the order is kept.
+
+    hold is called with every job the coalescer absorbs, and emit with the
+    jobs to send when a window closes and the ids of the held jobs they
+    replace.
+    """
+
+    def __init__(self, emit: Callable, hold: Callable = None):
+        self.emit = emit
+        self.hold = hold
+        self.default_window = float(os.getenv("COALESCE_WINDOW", "5"))
+        self.windows = parse_windows(os.getenv("COALESCE_WINDOWS", ""))
+        self.coalesced = 0
+        self._pending: dict[str, list] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+
+    def window_for(self, service_name: str) -> float:
+        return self.windows.get(service_name, self.default_window)
+
+    def offer(self, job) -> bool:
+        """Hold the job if it can be merged. Returns True when it was absorbed.
+
+        Must be called on the bot's loop.
+        """
+        path = job.channels.webhook_path
+        window = self.window_for(job.service_name)
+        if window <= 0 or not self._can_merge(job.event):
+            self.flush(path)
+            return False
+
+        self._pending.setdefault(path, []).append(job)
+        if self.hold:
+            self.hold(job)
+        if path not in self._timers:
+            self._timers[path] = asyncio.get_running_loop().call_later(window, self.flush, path)
+        return True
+
+    def flush(self, path: str):
+        timer = self._timers.pop(path, None)
+        if timer:
+            timer.cancel()
+        jobs = self._pending.pop(path, None)
+        if not jobs:
+            return
+
+        released = [job.event_id for job in jobs]
+        if len(jobs) == 1:
+            self.emit(jobs, released)
+            return
+
+        self.coalesced += len(jobs) - 1
+        latest = jobs[-1]
+        if all(job.channels is latest.channels for job in jobs):
+            self.emit([dataclasses.replace(self._merge(jobs, latest.channels), event_id=uuid.uuid4().hex)], released)
+            return
+
+        # Filtered subscriptions each saw part of the burst: channels that saw the
+        # same updates share a digest listing just those
+        seen: dict[tuple[int, int], list[int]] = {}
+        for index, job in enumerate(jobs):
+            for pair in job.channels:
+                seen.setdefault(pair, []).append(index)
+        groups: dict[tuple[int, ...], list[tuple[int, int]]] = {}
+        for pair, indexes in seen.items():
+            groups.setdefault(tuple(indexes), []).append(pair)
+        # Emitted together so the held jobs are replaced by every digest at once
+        self.emit([
+            dataclasses.replace(self._merge([jobs[index] for index in indexes], latest.channels.subset(pairs)),
+                                event_id=uuid.uuid4().hex)
+            for indexes, pairs in groups.items()
+        ], released)
+
+    @staticmethod
+    def _merge(jobs: list, channels):
+        latest = jobs[-1]
+        if len(jobs) == 1:
+            return dataclasses.replace(latest, channels=channels)
+        payloads = [job.payload for job in jobs]
+        return dataclasses.replace(
+            latest,
+            channels=channels,
+            rendered=render_component_digest(payloads, latest.service_name),
+            payload={"coalesced": payloads},
+        )
+
+    def flush_all(self):
+        for path in list(self._pending):
+            self.flush(path)
+
+    @property
+    def held(self) -> int:
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    @staticmethod
+    def _can_merge(event: StatuspageEvent) -> bool:
+        if event.incident or not event.component_update:
+            return False
+        if event.page and event.page.status_indicator == "critical":
+            return False
+        return COMPONENT_SEVERITY.get(event.component_update.new_status, 0) < COMPONENT_SEVERITY["major_outage"]
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import discord
+from discord.http import MultipartParameters
+
+from src.bot.database import Database
+from src.bot.sharding import ShardScope
+from .formatting import status_label
+from .metrics import DASHBOARD_EDITS
+from .parsing import StatuspageEvent
+from .render import RenderedNotification
+from .routing import Route
+
+LIST_STATES = "SELECT service_id, state FROM service_states"
+UPSERT_STATE = "INSERT OR REPLACE INTO service_states (service_id, state, updated_at) VALUES (?, ?, ?)"
+LIST_DASHBOARDS = "SELECT guild_id, channel_id, message_id, replace_messages FROM guild_dashboards WHERE {shards}"
+UPSERT_DASHBOARD = """
+    INSERT OR REPLACE INTO guild_dashboards (guild_id, channel_id, message_id, replace_messages)
+    VALUES (?, ?, ?, ?)
+"""
+SET_DASHBOARD_MESSAGE = "UPDATE guild_dashboards SET message_id = ? WHERE guild_id = ?"
+DELETE_DASHBOARD = "DELETE FROM guild_dashboards WHERE guild_id = ?"
+
+# Incident statuses after which an incident is no longer shown
+FINISHED = {"resolved", "postmortem", "completed"}
+# Page indicators from best to worst
+INDICATORS = ["none", "maintenance", "minor", "major", "critical"]
+INDICATOR_EMOJI = {"none": "🟢", "maintenance": "🔧", "minor": "🟡", "major": "🟠", "critical": "🔴"}
+INDICATOR_COLORS = {
+    "none": discord.Color.green(),
+    "maintenance": discord.Color.blue(),
+    "minor": discord.Color.orange(),
+    "major": discord.Color.red(),
+    "critical": discord.Color.dark_red(),
+}
+
+
+class ServiceState:
+    """The last known status of one service, folded from its webhooks."""
+
+    __slots__ = ("indicator", "description", "components", "incidents", "updated_at")
+
+    def __init__(self, indicator: str = "", description: str = "", components: dict[str, str] = None,
+                 incidents: dict[str, list[str]] = None, updated_at: float = 0.0):
+        self.indicator = indicator
+        self.description = description
+        # component name -> status, for components that aren't operational
+        self.components = components if components is not None else {}
+        # incident id -> [name, status], for incidents that haven't finished
+        self.incidents = incidents if incidents is not None else {}
+        self.updated_at = updated_at
+
+    def apply(self, event: StatuspageEvent) -> bool:
+        """Fold an event into the state. Returns whether anything visible changed."""
+        changed = False
+        if event.page and event.page.status_indicator is not None:
+            page = (event.page.status_indicator, event.page.status_description or "")
+            changed |= page != (self.indicator, self.description)
+            self.indicator, self.description = page
+
+        if event.component_update:
+            name = (event.component and event.component.name) or event.component_update.component_id or "Unknown"
+            status = event.component_update.new_status
+            if status == "operational" or not status:
+                changed |= self.components.pop(name, None) is not None
+            elif self.components.get(name) != status:
+                self.components[name] = status
+                changed = True
+
+        if event.incident and event.incident.id:
+            incident = event.incident
+            if incident.status in FINISHED:
+                changed |= self.incidents.pop(incident.id, None) is not None
+            elif self.incidents.get(incident.id) != [incident.name or "Incident", incident.status or ""]:
+                self.incidents[incident.id] = [incident.name or "Incident", incident.status or ""]
+                changed = True
+
+        if changed:
+            self.updated_at = time.time()
+        return changed
+
+    def to_json(self) -> str:
+        return json.dumps([self.indicator, self.description, self.components, self.incidents, self.updated_at])
+
+    @classmethod
+    def from_json(cls, data: str) -> "ServiceState":
+        return cls(*json.loads(data))
+
+
+class Dashboard:
+    __slots__ = ("guild_id", "channel_id", "message_id", "replace_messages", "last_body")
+
+    def __init__(self, guild_id: int, channel_id: int, message_id: int | None, replace_messages: bool):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.replace_messages = replace_messages
+        # What the message currently shows, so unchanged renders aren't sent
+        self.last_body: bytes | None = None
+
+
+class Dashboards:
+    """One pinned message per guild showing the status of every service it follows.
+
+    Accepted webhooks are folded into a last-known-state per service, which
+    only marks the service as changed. Every DASHBOARD_INTERVAL seconds the
+    dashboards showing a changed service are re-rendered and edited, at most
+    DASHBOARD_CONCURRENCY at a time, so a burst of updates costs each guild
+    one edit per interval. When a dashboard replaces messages, its guild is
+    muted in the routing table and gets no per-event sends at all.
+    """
+
+    def __init__(self, bot, scope: ShardScope = None):
+        self.bot = bot
+        self.interval = float(os.getenv("DASHBOARD_INTERVAL", "30"))
+        self.concurrency = int(os.getenv("DASHBOARD_CONCURRENCY", "5"))
+        self._list_dashboards = LIST_DASHBOARDS.format(shards=(scope or ShardScope()).sql("guild_id"))
+        self.states: dict[int, ServiceState] = {}
+        self.guilds: dict[int, Dashboard] = {}
+        self._changed: set[int] = set()
+        self._stale: set[int] = set()
+        self._task: asyncio.Task | None = None
+        self.edits = 0
+        self.unchanged = 0
+
+    @property
+    def db(self) -> Database:
+        return self.bot.db
+
+    async def start(self):
+        for service_id, state in await self.db.fetchall(LIST_STATES):
+            self.states[service_id] = ServiceState.from_json(state)
+        for guild_id, channel_id, message_id, replace_messages in await self.db.fetchall(self._list_dashboards):
+            self.guilds[guild_id] = Dashboard(guild_id, channel_id, message_id, bool(replace_messages))
+            if replace_messages:
+                self.bot.routes.set_muted(guild_id, True)
+        # Catch up on anything that changed while the bot was down
+        self._stale.update(self.guilds)
+        self._task = asyncio.create_task(self._refresh_loop(), name="dashboards")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def observe(self, route: Route, event: StatuspageEvent):
+        """Fold an accepted webhook into its service's state. Must be called on the bot's loop."""
+        state = self.states.get(route.service_id)
+        if state is None:
+            state = self.states[route.service_id] = ServiceState()
+        if state.apply(event):
+            self._changed.add(route.service_id)
+
+    def touch(self, guild_id: int = None):
+        """Refresh the guild's dashboard (every dashboard if None) at the next interval."""
+        if guild_id is None:
+            self._stale.update(self.guilds)
+        elif guild_id in self.guilds:
+            self._stale.add(guild_id)
+
+    async def enable(self, guild_id: int, channel_id: int, replace_messages: bool):
+        """Post a dashboard in the channel, replacing any the guild already has."""
+        old = self.guilds.get(guild_id)
+        dashboard = Dashboard(guild_id, channel_id, None, replace_messages)
+        await self._post(dashboard)
+        await self.db.write(UPSERT_DASHBOARD, (guild_id, channel_id, dashboard.message_id, int(replace_messages)))
+        self.guilds[guild_id] = dashboard
+        self.bot.routes.set_muted(guild_id, replace_messages)
+        if old and old.message_id:
+            try:
+                await self.bot.http.delete_message(old.channel_id, old.message_id, reason="Dashboard moved")
+            except discord.HTTPException:
+                pass
+
+    async def disable(self, guild_id: int) -> bool:
+        if guild_id not in self.guilds:
+            return False
+        self.forget_guild(guild_id)
+        return True
+
+    def forget_guild(self, guild_id: int):
+        if self.guilds.pop(guild_id, None):
+            self.bot.routes.set_muted(guild_id, False)
+            self.db.submit([(DELETE_DASHBOARD, (guild_id,))])
+
+    def forget_channel(self, channel_id: int):
+        for dashboard in list(self.guilds.values()):
+            if dashboard.channel_id == channel_id:
+                self.forget_guild(dashboard.guild_id)
+
+    def stats(self) -> dict:
+        return {"dashboards": len(self.guilds), "edits": self.edits, "unchanged": self.unchanged}
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing dashboards: {e}")
+
+    async def refresh(self):
+        """Edit every dashboard showing a service that changed since the last refresh."""
+        changed, self._changed = self._changed, set()
+        stale, self._stale = self._stale, set()
+        if changed:
+            now = time.time()
+            self.db.submit([(UPSERT_STATE, [
+                (service_id, self.states[service_id].to_json(), now) for service_id in changed
+            ])])
+            stale.update(
+                guild_id for guild_id in self.guilds
+                if any(route.service_id in changed for route in self.bot.routes.services_in(guild_id))
+            )
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def update(dashboard: Dashboard):
+            async with semaphore:
+                await self._update(dashboard)
+
+        await asyncio.gather(*(update(self.guilds[guild_id]) for guild_id in stale if guild_id in self.guilds))
+
+    def render(self, guild_id: int) -> RenderedNotification:
+        lines = []
+        worst = 0
+        updated_at = 0.0
+        for route in sorted(self.bot.routes.services_in(guild_id), key=lambda route: route.service_name.lower()):
+            state = self.states.get(route.service_id) or ServiceState()
+            indicator = state.indicator if state.indicator in INDICATOR_EMOJI else "none"
+            worst = max(worst, INDICATORS.index(indicator))
+            updated_at = max(updated_at, state.updated_at)
+            lines.append(f"{INDICATOR_EMOJI[indicator]} **{route.service_name}**: {state.description or 'No updates yet'}")
+            for name, status in sorted(state.components.items()):
+                lines.append(f"└ {name}: {status_label(status)}")
+            for name, status in state.incidents.values():
+                lines.append(f"└ Incident: {name} ({status_label(status)})")
+
+        embed = discord.Embed(
+            title="Service Status",
+            description="\n".join(lines) or "This server isn't subscribed to any services yet.",
+            color=INDICATOR_COLORS[INDICATORS[worst]]
+        )
+        # The newest change, rather than the render time, so an unchanged dashboard renders identically
+        if updated_at:
+            embed.timestamp = datetime.fromtimestamp(updated_at, timezone.utc)
+        embed.set_footer(text=f"Updated at most every {self.interval:.0f}s • Last change")
+        return RenderedNotification.from_embed(embed)
+
+    async def _update(self, dashboard: Dashboard):
+        rendered = self.render(dashboard.guild_id)
+        if rendered.body == dashboard.last_body:
+            self.unchanged += 1
+            return
+        try:
+            if dashboard.message_id:
+                params = MultipartParameters(payload=rendered.payload, multipart=None, files=None)
+                await self.bot.http.edit_message(dashboard.channel_id, dashboard.message_id, params=params)
+                dashboard.last_body = rendered.body
+                self.edits += 1
+                DASHBOARD_EDITS.labels("edit").inc()
+            else:
+                await self._post(dashboard, rendered)
+        except discord.NotFound:
+            if dashboard.message_id:
+                # Someone deleted the message; post a new one next time
+                dashboard.message_id = None
+                self._stale.add(dashboard.guild_id)
+            else:
+                print(f"Dashboard channel {dashboard.channel_id} in guild {dashboard.guild_id} is gone, removing it")
+                self.forget_guild(dashboard.guild_id)
+        except discord.HTTPException as e:
+            print(f"Error updating dashboard in guild {dashboard.guild_id}: {e}")
+            self._stale.add(dashboard.guild_id)
+
+    async def _post(self, dashboard: Dashboard, rendered: RenderedNotification = None):
+        rendered = rendered or self.render(dashboard.guild_id)
+        params = MultipartParameters(payload=rendered.payload, multipart=None, files=None)
+        message = await self.bot.http.send_message(dashboard.channel_id, params=params)
+        dashboard.message_id = int(message["id"])
+        dashboard.last_body = rendered.body
+        self.edits += 1
+        DASHBOARD_EDITS.labels("post").inc()
+        if dashboard.guild_id in self.guilds:
+            self.db.submit([(SET_DASHBOARD_MESSAGE, (dashboard.message_id, dashboard.guild_id))])
+        try:
+            await self.bot.http.pin_message(dashboard.channel_id, dashboard.message_id, reason="Service status dashboard")
+        except discord.HTTPException as e:
+            # Without Manage Messages the dashboard still works, it just isn't pinned
+            print(f"Could not pin dashboard in channel {dashboard.channel_id}: {e}")
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from src.bot.database import Database
+from .parsing import StatuspageEvent
+
+INSERT_KEY = "INSERT OR REPLACE INTO webhook_dedup (key, seen_at) VALUES (?, ?)"
+SELECT_RECENT = "SELECT key, seen_at FROM webhook_dedup WHERE seen_at > ? ORDER BY seen_at"
+PRUNE_KEYS = "DELETE FROM webhook_dedup WHERE seen_at <= ?"
+
+
+def dedup_key(service_path: str, event: StatuspageEvent) -> str:
+    """Identify a webhook by the Statuspage update it carries.
+
+    Falls back to a hash of the payload when it has no update id.
+    """
+    if event.incident and event.incident.update_id:
+        return f"{service_path}:incident_update:{event.incident.update_id}"
+
+    if event.component_update and event.component_update.id:
+        return f"{service_path}:component_update:{event.component_update.id}"
+
+    digest = hashlib.sha256(json.dumps(event.raw, sort_keys=True).encode()).hexdigest()
+    return f"{service_path}:sha256:{digest}"
+
+
+class DedupCache:
+    """TTL + LRU set of recently accepted webhooks.
+
+    Statuspage redelivers a webhook whenever it doesn't get a timely 2xx, and
+    the same update can also arrive more than once on its own. Keys seen
+    within the TTL are acknowledged without being delivered again. With
+    DEDUP_PERSIST enabled the window is also written to the database so it
+    survives a restart.
+    """
+
+    def __init__(self, ttl: float = None, max_size: int = None):
+        self.ttl = ttl or float(os.getenv("DEDUP_TTL_SECONDS", "3600"))
+        self.max_size = max_size or int(os.getenv("DEDUP_MAX_ENTRIES", "10000"))
+        self.persist = os.getenv("DEDUP_PERSIST", "0") == "1"
+        self.accepted = 0
+        self.suppressed = 0
+        self._writes = 0
+        self._entries: OrderedDict[str, float] = OrderedDict()
+
+    async def start(self, db: Database):
+        if not self.persist:
+            return
+        now = time.time()
+        await db.write(PRUNE_KEYS, (now - self.ttl,))
+        for key, seen_at in await db.fetchall(SELECT_RECENT, (now - self.ttl,)):
+            self._store(key, seen_at)
+
+    def check(self, key: str) -> bool:
+        """Record the key, returning True if it was already seen within the TTL."""
+        now = time.time()
+        seen_at = self._entries.get(key)
+        if seen_at is not None and now - seen_at < self.ttl:
+            self._entries.move_to_end(key)
+            self.suppressed += 1
+            return True
+        self._store(key, now)
+        self.accepted += 1
+        return False
+
+    def forget(self, key: str):
+        """Drop a key whose webhook was not accepted after all, so its retry isn't suppressed."""
+        if self._entries.pop(key, None) is not None:
+            self.accepted -= 1
+
+    def remember(self, db: Database, key: str):
+        # Called on the bot's loop once the job is accepted
+        if not self.persist:
+            return
+        now = time.time()
+        statements = [(INSERT_KEY, (key, self._entries.get(key, now)))]
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            statements.append((PRUNE_KEYS, (now - self.ttl,)))
+        db.submit(statements)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "accepted": self.accepted,
+            "suppressed": self.suppressed,
+        }
+
+    def _store(self, key: str, seen_at: float):
+        self._entries[key] = seen_at
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
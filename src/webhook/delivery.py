@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+
+from .coalesce import Coalescer
+from .dedup import DedupCache, dedup_key
+from .fanout import FanoutScheduler
+from .filters import describe_event
+from .metrics import FANOUT_SIZE, NOTIFICATIONS_FILTERED, RENDER_SECONDS, WEBHOOKS_TOTAL, Timer
+from .outbox import Outbox
+from .parsing import PayloadError, StatuspageEvent, parse_event
+from .render import RenderedNotification, render_notification
+from .routing import Route
+
+
+@dataclass
+class DeliveryJob:
+    service_name: str
+    rendered: RenderedNotification
+    channels: Route
+    payload: dict = field(default_factory=dict)
+    event: StatuspageEvent | None = None
+    event_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    dedup_key: str | None = None
+
+
+class DeliveryQueue:
+    """In-process queue of notifications waiting to be fanned out to Discord.
+
+    Jobs are submitted by the webhook server, which runs on the same event
+    loop as the bot, and consumed by a pool of worker tasks, so the HTTP
+    endpoint can acknowledge a webhook without waiting for any send to finish.
+    """
+
+    def __init__(self, bot, workers: int = None, max_size: int = None):
+        self.bot = bot
+        self.worker_count = workers or int(os.getenv("DELIVERY_WORKERS", "4"))
+        self.max_size = max_size or int(os.getenv("DELIVERY_QUEUE_SIZE", "1000"))
+        self.retry_after = int(os.getenv("DELIVERY_RETRY_AFTER", "30"))
+        self.processed = 0
+        self.rejected = 0
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._pending = 0
+        self.fanout: FanoutScheduler | None = None
+        self.outbox: Outbox | None = None
+        self.dedup = DedupCache()
+        self.coalescer = Coalescer(self._emit_coalesced, self._hold)
+
+    @property
+    def depth(self) -> int:
+        return self._pending
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self.fanout = FanoutScheduler(self.bot)
+        await self.fanout.start()
+        self.outbox = Outbox(self.bot.db, self.fanout, self.bot.routes.scope)
+        await self.outbox.start()
+        await self.dedup.start(self.bot.db)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"delivery-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def close(self):
+        # Held updates go to the queue (and so the outbox) before the workers stop
+        self.coalescer.flush_all()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.outbox:
+            await self.outbox.close()
+        if self.fanout:
+            await self.fanout.close()
+
+    def accept_webhook(self, service_name: str, payload: dict | StatuspageEvent) -> tuple[str, Route | None]:
+        """Route, dedup, render and queue a Statuspage webhook.
+
+        Takes the decoded body, or the event the webhook server already
+        parsed it into. Returns the outcome ("queued", "duplicate",
+        "no_channels", "filtered", "invalid" or "full") and the channels it
+        was queued for.
+        """
+        status, channels = self._accept_webhook(service_name, payload)
+        WEBHOOKS_TOTAL.labels(service_name if channels is not None else "unknown", status).inc()
+        return status, channels
+
+    def _accept_webhook(self, service_name: str, payload: dict | StatuspageEvent) -> tuple[str, Route | None]:
+        service_path = f"/webhook/{service_name}"
+        route = self.bot.routes.get(service_path)
+        if not route:
+            return "no_channels", route
+
+        if isinstance(payload, StatuspageEvent):
+            event = payload
+        else:
+            try:
+                event = parse_event(payload)
+            except PayloadError as e:
+                print(f"Dropping malformed webhook for {service_name}: {e}")
+                return "invalid", route
+
+        # Statuspage redelivers on timeouts; acknowledge repeats without sending them again
+        key = dedup_key(service_path, event)
+        if self.dedup.check(key):
+            return "duplicate", route
+        try:
+            return self._queue_event(service_name, route, event, key)
+        except Exception:
+            # The key was claimed above; a failure after it must not turn the redelivery into a "duplicate"
+            self.dedup.forget(key)
+            raise
+
+    def _queue_event(self, service_name: str, route: Route, event: StatuspageEvent, key: str) -> tuple[str, Route]:
+        self.bot.dashboards.observe(route, event)
+
+        # Channels whose subscription filters out this event, or whose guild follows
+        # the service on a dashboard instead, are never sent to
+        channels = route.select(describe_event(event))
+        if len(channels) != len(route):
+            NOTIFICATIONS_FILTERED.labels(service_name).inc(len(route) - len(channels))
+        if not channels:
+            return "filtered", channels
+
+        # Render the notification once for every channel
+        with Timer(RENDER_SECONDS.labels(service_name)):
+            rendered = render_notification(event.raw, service_name)
+        job = DeliveryJob(service_name=service_name, rendered=rendered, channels=channels, payload=event.raw,
+                          event=event, dedup_key=key)
+        if not self.submit(job):
+            self.dedup.forget(key)
+            return "full", channels
+        return "queued", channels
+
+    def submit(self, job: DeliveryJob) -> bool:
+        """Queue a job for delivery. Must be called on the bot's loop.
+
+        Returns False when the queue is full so the caller can shed load.
+        """
+        if self._pending >= self.max_size:
+            self.rejected += 1
+            return False
+        if not self.coalescer.offer(job):
+            # Otherwise held by the coalescer until its window closes, not by the queue
+            self._pending += 1
+            self._enqueue(job)
+        if job.dedup_key:
+            self.dedup.remember(self.bot.db, job.dedup_key)
+        return True
+
+    def _hold(self, job: DeliveryJob):
+        # Acknowledged with a 202, so it must survive a crash inside the window
+        self.outbox.hold(job)
+
+    def _emit_coalesced(self, jobs: list[DeliveryJob], released: list[str]):
+        self._pending += len(jobs)
+        self.outbox.record(jobs, released)
+        for job in jobs:
+            self._queue.put_nowait(job)
+
+    def _enqueue(self, job: DeliveryJob):
+        # Persist first so a crash before delivery can be replayed
+        self.outbox.record([job])
+        self._queue.put_nowait(job)
+
+    async def replay(self):
+        """Resend what a previous run left undelivered, and hold its held updates again."""
+        for event_id, service_name, payload, embed, pairs in await self.outbox.replay():
+            service_path = f"/webhook/{service_name}"
+            route = self.bot.routes.get(service_path) or Route(0, service_name, service_path)
+            try:
+                event = parse_event(json.loads(payload))
+            except (ValueError, PayloadError) as e:
+                print(f"Dropping unreadable held update {event_id}: {e}")
+                self.outbox.record([], [event_id])
+                continue
+            job = DeliveryJob(service_name=service_name, rendered=RenderedNotification(json.loads(embed), service_name),
+                              channels=route.subset(pairs), payload=event.raw, event=event, event_id=event_id)
+            # Already acknowledged, so the queue's capacity doesn't apply
+            if not self.coalescer.offer(job):
+                self._pending += 1
+                self.outbox.record([job], [event_id])
+                self._queue.put_nowait(job)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "capacity": self.max_size,
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "active_channels": self.fanout.active_lanes if self.fanout else 0,
+            "retry_depth": self.outbox.retry_depth if self.outbox else 0,
+            "retried": self.outbox.retried if self.outbox else 0,
+            "dead": self.outbox.dead if self.outbox else 0,
+            "dedup": self.dedup.stats(),
+            "breakers": self.bot.breakers.stats(),
+            "coalescing": {"held": self.coalescer.held, "merged": self.coalescer.coalesced},
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver(job)
+            except Exception as e:
+                print(f"Error delivering notification for {job.service_name}: {e}")
+            finally:
+                self._pending -= 1
+                self.processed += 1
+                self._queue.task_done()
+
+    async def _deliver(self, job: DeliveryJob):
+        FANOUT_SIZE.labels(job.service_name).observe(len(job.channels))
+        failed_channels = await self.fanout.dispatch(job.rendered, job.channels)
+        await self.outbox.complete(job, failed_channels)
+        if failed_channels:
+            print(f"Failed to send to channels: {failed_channels}")
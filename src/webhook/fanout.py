@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Collection
+
+import discord
+from discord.http import MultipartParameters
+
+from src.bot.database import CLEAR_WEBHOOK
+from .metrics import DELIVERY_FAILURES, SEND_SECONDS
+from .render import RenderedNotification
+from .webhooks import WebhookSender, webhook_mode_enabled
+
+
+# Failure reasons that retrying will not fix. circuit_open sends were skipped because
+# the channel keeps failing or the bot can't post there.
+PERMANENT_FAILURES = {"forbidden", "not_found", "circuit_open"}
+# Failures that say the channel itself is unreachable and count towards its breaker.
+# Other 4xx errors (a 400 for one bad payload, say) are about the message, not the channel.
+CHANNEL_FAILURES = {"forbidden", "not_found"}
+
+
+def is_permanent(reason: str) -> bool:
+    return reason in PERMANENT_FAILURES or (reason.startswith("http_4") and reason != "http_429")
+
+
+class _FanoutResult:
+    def __init__(self, total: int):
+        self.remaining = total
+        self.failed: dict[int, str] = {}
+        self.future = asyncio.get_running_loop().create_future()
+        if total == 0:
+            self.future.set_result(self.failed)
+
+    def done(self, channel_id: int, error: str | None):
+        if error:
+            self.failed[channel_id] = error
+        self.remaining -= 1
+        if self.remaining == 0 and not self.future.done():
+            self.future.set_result(self.failed)
+
+
+class _GlobalLimiter:
+    """Token bucket pacing requests under Discord's global rate limit."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = 0.0
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        loop = asyncio.get_running_loop()
+        self.paused_until = max(self.paused_until, loop.time() + seconds)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FanoutScheduler:
+    """Sends one notification to many channels concurrently.
+
+    Every channel gets its own FIFO lane, so messages for a channel are sent
+    in the order they were dispatched and never race each other for the
+    channel's route bucket. Lanes for different channels run in parallel,
+    bounded by a shared concurrency limit and paced by a global token bucket.
+    discord.py still tracks the per-route buckets from the response headers;
+    any 429 that surfaces here pauses the lane (or every lane, for a global
+    limit) for the advertised retry_after before trying again.
+
+    With DELIVERY_MODE=webhook, channels that have a Discord webhook stored
+    are sent to through it instead, outside the bot's global bucket. If the
+    webhook has been deleted the channel falls back to the bot user.
+    """
+
+    def __init__(self, bot, concurrency: int = None, global_rate: float = None):
+        self.bot = bot
+        self.concurrency = concurrency or int(os.getenv("FANOUT_CONCURRENCY", "50"))
+        self.send_timeout = float(os.getenv("FANOUT_SEND_TIMEOUT", "10"))
+        self.max_retries = int(os.getenv("FANOUT_MAX_RETRIES", "3"))
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._limiter = _GlobalLimiter(global_rate or float(os.getenv("FANOUT_GLOBAL_RATE", "45")))
+        self._lanes: dict[int, deque] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.webhooks = WebhookSender() if webhook_mode_enabled() else None
+
+    async def start(self):
+        if self.webhooks:
+            await self.webhooks.start()
+
+    @property
+    def active_lanes(self) -> int:
+        return len(self._lanes)
+
+    def dispatch(self, rendered: RenderedNotification, channels: Collection[tuple[int, int]]) -> asyncio.Future:
+        """Queue the notification on every (guild_id, channel_id) lane.
+
+        Returns a future resolving to a dict of failed channel id -> reason.
+        """
+        result = _FanoutResult(len(channels))
+        breakers = self.bot.breakers
+        for guild_id, channel_id in channels:
+            if breakers.blocked(channel_id):
+                DELIVERY_FAILURES.labels(rendered.service_name, "circuit_open").inc()
+                result.done(channel_id, "circuit_open")
+                continue
+            lane = self._lanes.get(channel_id)
+            if lane is None:
+                lane = self._lanes[channel_id] = deque()
+                task = asyncio.create_task(self._drain(channel_id, lane))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            lane.append((rendered, guild_id, result))
+        return result.future
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.webhooks:
+            await self.webhooks.close()
+
+    async def _drain(self, channel_id: int, lane: deque):
+        try:
+            while lane:
+                rendered, guild_id, result = lane[0]
+                # Checked again per send: the breaker may have opened while this waited in the lane
+                if self.bot.breakers.allow(channel_id):
+                    started = time.perf_counter()
+                    try:
+                        error = await self._send(channel_id, guild_id, rendered)
+                    except Exception as e:
+                        print(f"Error sending to channel {channel_id} in guild {guild_id}: {e}")
+                        error = "error"
+                    SEND_SECONDS.labels(rendered.service_name).observe(time.perf_counter() - started)
+                    self.bot.breakers.record(channel_id, error, error in CHANNEL_FAILURES)
+                else:
+                    error = "circuit_open"
+                if error:
+                    DELIVERY_FAILURES.labels(rendered.service_name, error).inc()
+                lane.popleft()
+                result.done(channel_id, error)
+        finally:
+            # Fail whatever is left if the lane was cancelled mid-way
+            while lane:
+                _, _, result = lane.popleft()
+                result.done(channel_id, "cancelled")
+            del self._lanes[channel_id]
+
+    async def _send(self, channel_id: int, guild_id: int, rendered: RenderedNotification) -> str | None:
+        """Send to one channel, returning the failure reason or None on success."""
+        webhook = self.bot.routes.webhook_for(channel_id) if self.webhooks else None
+        if webhook:
+            async with self._semaphore:
+                error = await self.webhooks.send(*webhook, rendered.body)
+            if error != "webhook_missing":
+                return error
+            print(f"Webhook for channel {channel_id} was deleted or its token revoked, falling back to the bot")
+            self.bot.routes.clear_webhook(channel_id)
+            self.bot.db.submit([(CLEAR_WEBHOOK, (channel_id,))])
+
+        # Sending by id reuses the rendered payload and doesn't depend on the gateway's
+        # channel cache, which is empty during startup and reconnects
+        params = MultipartParameters(payload=rendered.payload, multipart=None, files=None)
+        for attempt in range(self.max_retries + 1):
+            await self._limiter.acquire()
+            async with self._semaphore:
+                try:
+                    await asyncio.wait_for(
+                        self.bot.http.send_message(channel_id, params=params),
+                        timeout=self.send_timeout
+                    )
+                    return None
+                except asyncio.TimeoutError:
+                    return "timeout"
+                except discord.RateLimited as e:
+                    retry_after = e.retry_after
+                except discord.Forbidden:
+                    return "forbidden"
+                except discord.NotFound:
+                    return "not_found"
+                except discord.HTTPException as e:
+                    if e.status != 429:
+                        print(f"Error sending to channel {channel_id} in guild {guild_id}: {e}")
+                        return f"http_{e.status}"
+                    retry_after = float(e.response.headers.get("Retry-After", 1))
+                    if e.response.headers.get("X-RateLimit-Global"):
+                        self._limiter.pause(retry_after)
+            print(f"Rate limited on channel {channel_id}, retrying in {retry_after:.2f}s")
+            await asyncio.sleep(retry_after)
+
+        return "rate_limited"
@@ -0,0 +1,102 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+from .parsing import StatuspageEvent
+
+# Levels a subscription can ask for, lowest first
+SEVERITY_LEVELS = {"all": 0, "minor": 1, "major": 2, "critical": 3}
+EVENT_KINDS = ("all", "incidents", "components")
+
+# Component statuses and incident impacts on the SEVERITY_LEVELS scale
+STATUS_SEVERITY = {
+    "operational": 0,
+    "under_maintenance": 1,
+    "degraded_performance": 1,
+    "partial_outage": 2,
+    "major_outage": 3,
+}
+IMPACT_SEVERITY = {"none": 0, "maintenance": 1, "minor": 1, "major": 2, "critical": 3}
+
+
+class Event(NamedTuple):
+    """What a subscription filter can see of a payload."""
+    kind: str
+    components: frozenset[str]
+    severity: int
+
+
+def describe_event(event: StatuspageEvent) -> Event:
+    if event.incident:
+        incident = event.incident
+        components = frozenset(name.lower() for name in incident.components if name)
+        return Event("incidents", components, IMPACT_SEVERITY.get(incident.impact, 0))
+
+    if event.component_update:
+        update = event.component_update
+        name = event.component.name if event.component else None
+        # A recovery is as important as the outage it ends
+        severity = max(STATUS_SEVERITY.get(update.old_status, 0), STATUS_SEVERITY.get(update.new_status, 0))
+        return Event("components", frozenset([name.lower()] if name else []), severity)
+
+    return Event("other", frozenset(), 0)
+
+
+class SubscriptionFilter:
+    """Which events one subscription wants.
+
+    components is None for every component. Filters are interned by
+    compile_filter(), so subscriptions with the same settings share one
+    instance and the routing index evaluates it once per event.
+    """
+
+    __slots__ = ("events", "min_severity", "components", "_row")
+
+    def __init__(self, events: str, min_severity: int, components: frozenset[str] | None):
+        self.events = events
+        self.min_severity = min_severity
+        self.components = components
+        self._row = (events, min_severity, ",".join(sorted(components)) if components is not None else None)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SubscriptionFilter) and self._row == other._row
+
+    def __hash__(self) -> int:
+        return hash(self._row)
+
+    def matches(self, event: Event) -> bool:
+        if self.events != "all" and event.kind != self.events:
+            return False
+        if event.severity < self.min_severity:
+            return False
+        # Incidents that don't name their components can't be ruled out by component
+        if self.components is not None and event.components and not (event.components & self.components):
+            return False
+        return True
+
+    def row(self) -> tuple[str, int, str | None]:
+        """The (events, min_severity, components) columns stored in server_channels."""
+        return self._row
+
+    def describe(self) -> str:
+        parts = []
+        if self.events != "all":
+            parts.append(f"{self.events} only")
+        if self.min_severity:
+            level = next(name for name, value in SEVERITY_LEVELS.items() if value == self.min_severity)
+            parts.append(f"{level} or worse")
+        if self.components is not None:
+            parts.append("components: " + ", ".join(sorted(self.components)))
+        return "; ".join(parts)
+
+
+def compile_filter(events: str | None, min_severity: int | None, components: str | None) -> SubscriptionFilter | None:
+    """Build the filter for a server_channels row; None when it lets everything through."""
+    names = frozenset(filter(None, (name.strip().lower() for name in components.split(",")))) if components else None
+    return _intern(events or "all", min_severity or 0, names or None)
+
+
+@lru_cache(maxsize=1024)
+def _intern(events: str, min_severity: int, components: frozenset[str] | None) -> SubscriptionFilter | None:
+    if events == "all" and min_severity == 0 and components is None:
+        return None
+    return SubscriptionFilter(events, min_severity, components)
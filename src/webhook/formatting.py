@@ -0,0 +1,148 @@
+import discord
+from datetime import datetime
+from functools import lru_cache
+from .parsing import parse_timestamp
+
+# Component statuses in increasing order of severity
+COMPONENT_SEVERITY = {
+    "operational": 0,
+    "under_maintenance": 1,
+    "degraded_performance": 2,
+    "partial_outage": 3,
+    "major_outage": 4,
+}
+
+@lru_cache(maxsize=256)
+def status_label(status: str) -> str:
+    # Statuspage only uses a handful of status strings, so these are computed once
+    return status.replace("_", " ").title()
+
+def format_statuspage_notification(payload: dict, service_name: str) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"{service_name} Status Update",
+        timestamp=datetime.utcnow(),
+        color=discord.Color.blue()
+    )
+    
+    # Handle page status
+    if "page" in payload:
+        page = payload["page"]
+        status_desc = page.get("status_description", "")
+        indicator = page.get("status_indicator", "")
+        
+        # Set color based on status indicator
+        if indicator in ["none", "operational"]:
+            embed.color = discord.Color.green()
+        elif indicator in ["minor", "degraded_performance"]:
+            embed.color = discord.Color.orange()
+        elif indicator in ["major", "critical"]:
+            embed.color = discord.Color.red()
+            
+        if status_desc:
+            embed.add_field(
+                name="Overall Status",
+                value=status_desc,
+                inline=False
+            )
+
+    # Handle component updates
+    if "component_update" in payload and "component" in payload:
+        component = payload["component"]
+        update = payload["component_update"]
+        
+        embed.add_field(
+            name="Component",
+            value=component.get("name", "Unknown Component"),
+            inline=False
+        )
+        
+        old_status = status_label(update.get("old_status", "unknown"))
+        new_status = status_label(update.get("new_status", "unknown"))
+        
+        embed.add_field(
+            name="Status Change",
+            value=f"{old_status} → {new_status}",
+            inline=False
+        )
+        
+        if update.get("created_at"):
+            embed.timestamp = parse_timestamp(update["created_at"])
+
+    # Handle incident updates
+    if "incident" in payload:
+        incident = payload["incident"]
+        
+        if incident.get("name"):
+            embed.add_field(
+                name="Incident",
+                value=incident["name"],
+                inline=False
+            )
+        
+        status = status_label(incident.get("status", ""))
+        impact = status_label(incident.get("impact", ""))
+        
+        if status:
+            embed.add_field(name="Status", value=status, inline=True)
+        if impact:
+            embed.add_field(name="Impact", value=impact, inline=True)
+        
+        if incident.get("incident_updates"):
+            updates = incident["incident_updates"]
+            if updates:
+                latest_update = updates[0]
+                embed.add_field(
+                    name="Latest Update",
+                    value=latest_update.get("body", "No details available"),
+                    inline=False
+                )
+                
+                if latest_update.get("created_at"):
+                    embed.timestamp = parse_timestamp(latest_update["created_at"])
+
+    return embed
+
+def format_component_digest(payloads: list[dict], service_name: str) -> discord.Embed:
+    """Combine several component_update payloads into a single embed."""
+    embed = discord.Embed(
+        title=f"{service_name} Status Update",
+        timestamp=datetime.utcnow(),
+        color=discord.Color.green()
+    )
+
+    # The most recent page status is the one that still applies
+    for payload in reversed(payloads):
+        status_desc = payload.get("page", {}).get("status_description", "")
+        if status_desc:
+            embed.add_field(name="Overall Status", value=status_desc, inline=False)
+            break
+
+    lines = []
+    worst = 0
+    for payload in payloads:
+        component = payload.get("component", {})
+        update = payload.get("component_update", {})
+        old_status = status_label(update.get("old_status", "unknown"))
+        new_status = status_label(update.get("new_status", "unknown"))
+        lines.append(f"**{component.get('name', 'Unknown Component')}**: {old_status} → {new_status}")
+        worst = max(worst, COMPONENT_SEVERITY.get(update.get("new_status"), 0))
+
+        if update.get("created_at"):
+            embed.timestamp = parse_timestamp(update["created_at"])
+
+    if worst >= 3:
+        embed.color = discord.Color.red()
+    elif worst >= 1:
+        embed.color = discord.Color.orange()
+
+    # Split the transitions over as many fields as needed to stay under 1024 characters each
+    chunk = []
+    for line in lines:
+        if chunk and len("\n".join(chunk + [line])) > 1024:
+            embed.add_field(name="Component Updates", value="\n".join(chunk), inline=False)
+            chunk = []
+        chunk.append(line[:1024])
+    if chunk:
+        embed.add_field(name="Component Updates", value="\n".join(chunk), inline=False)
+
+    return embed
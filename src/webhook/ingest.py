@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+
+from src.bot.database import Database
+from src.bot.sharding import ShardScope
+from .parsing import loads
+
+INSERT_WEBHOOK = "INSERT INTO ingest_queue (service_name, payload, received_at) VALUES (?, ?, ?)"
+SELECT_AFTER = "SELECT id, service_name, payload FROM ingest_queue WHERE id > ? ORDER BY id LIMIT ?"
+COUNT_BACKLOG = """
+    SELECT COUNT(*) FROM ingest_queue
+    WHERE id > (SELECT COALESCE(MIN(last_id), 0) FROM ingest_cursors WHERE updated_at > ?)
+"""
+GET_CURSOR = "SELECT last_id FROM ingest_cursors WHERE consumer = ?"
+UPSERT_CURSOR = "INSERT OR REPLACE INTO ingest_cursors (consumer, last_id, updated_at) VALUES (?, ?, ?)"
+# Rows every live consumer has read; a consumer silent for an hour no longer holds rows back
+PRUNE_CONSUMED = """
+    DELETE FROM ingest_queue
+    WHERE id <= (SELECT COALESCE(MIN(last_id), 0) FROM ingest_cursors WHERE updated_at > ?)
+"""
+LIST_INGEST_PATHS = """
+    SELECT DISTINCT s.webhook_path FROM services s
+    JOIN server_channels c ON c.service_id = s.id
+"""
+
+CONSUMER_TIMEOUT = 3600
+
+
+def ingest_mode_enabled() -> bool:
+    return os.getenv("INGEST_MODE", "integrated") == "split"
+
+
+class IngestConsumer:
+    """Feeds webhooks accepted by the ingestion workers into the delivery queue.
+
+    In split mode the HTTP endpoint runs in separate worker processes that
+    only validate webhooks and append them to ingest_queue in the shared
+    database. This polls the table from the bot's process, keeping its own
+    position in ingest_cursors, and hands each webhook to the same accept
+    path the integrated server uses. When the delivery queue is full it stops
+    reading until there is room, so the backlog waits on disk.
+    """
+
+    def __init__(self, bot, name: str = None):
+        self.bot = bot
+        self.name = name or os.getenv("INGEST_CONSUMER") or self._default_name(bot.scope)
+        self.poll_interval = float(os.getenv("INGEST_POLL_MS", "50")) / 1000
+        self.batch_size = 200
+        self.consumed = 0
+        self.last_id = 0
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def _default_name(scope: ShardScope) -> str:
+        # Every process running a different set of shards needs its own cursor
+        if not scope.partial:
+            return "gateway"
+        return "gateway-" + "-".join(map(str, scope.ids))
+
+    async def start(self):
+        db: Database = self.bot.db
+        row = await db.fetchone(GET_CURSOR, (self.name,))
+        self.last_id = row[0] if row else 0
+        self._task = asyncio.create_task(self._consume_loop(), name="ingest-consumer")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _consume_loop(self):
+        polls = 0
+        while True:
+            try:
+                read, stalled = await self._consume_batch()
+            except Exception as e:
+                print(f"Error reading the ingest queue: {e}")
+                read, stalled = 0, True
+
+            polls += 1
+            if polls % 1000 == 0:
+                # Also refreshes the cursor of an idle consumer so it still counts as live
+                now = time.time()
+                self.bot.db.submit([
+                    (UPSERT_CURSOR, (self.name, self.last_id, now)),
+                    (PRUNE_CONSUMED, (now - CONSUMER_TIMEOUT,)),
+                ])
+            if stalled or read < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _consume_batch(self) -> tuple[int, bool]:
+        """Accept the next batch of webhooks. Returns how many were read and
+        whether delivery ran out of room."""
+        rows = await self.bot.db.fetchall(SELECT_AFTER, (self.last_id, self.batch_size))
+        last_id = self.last_id
+        accepted = 0
+        stalled = False
+        for row_id, service_name, payload in rows:
+            try:
+                status, _ = self.bot.delivery.accept_webhook(service_name, loads(payload))
+            except Exception as e:
+                # Skipped rather than retried, or one bad row would hold up the whole queue
+                print(f"Error accepting queued webhook {row_id} for {service_name}: {e}")
+                last_id = row_id
+                continue
+            if status == "full":
+                stalled = True
+                break
+            if status == "no_channels" and not self.bot.scope.partial:
+                # With split shards another process may well own this service's channels
+                print(f"Dropping queued webhook for {service_name}: no channels configured")
+            last_id = row_id
+            accepted += 1
+
+        if last_id != self.last_id:
+            # Queued after the outbox records of the jobs just accepted, so the
+            # cursor never gets ahead of what has been persisted
+            self.consumed += accepted
+            self.last_id = last_id
+            self.bot.db.submit([(UPSERT_CURSOR, (self.name, last_id, time.time()))])
+        return len(rows), stalled
+
+    def stats(self) -> dict:
+        return {"consumer": self.name, "last_id": self.last_id, "consumed": self.consumed}
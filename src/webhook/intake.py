@@ -0,0 +1,85 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
+import os
+import time
+from src.bot.database import Database
+from src.bot.migrations import MIGRATIONS
+from .ingest import COUNT_BACKLOG, CONSUMER_TIMEOUT, INSERT_WEBHOOK, LIST_INGEST_PATHS
+from .parsing import PayloadError, parse_payload, read_body
+
+
+class IntakeState:
+    """Per-process state of a stateless ingestion worker."""
+
+    def __init__(self):
+        self.db = Database()
+        self.max_backlog = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+        self.retry_after = int(os.getenv("DELIVERY_RETRY_AFTER", "30"))
+        self.refresh_interval = 10
+        self.paths: set[str] = set()
+        self.paths_loaded_at = 0.0
+        self.backlog = 0
+        self.backlog_checked_at = 0.0
+
+    async def knows(self, service_path: str) -> bool:
+        # Refreshed on a timer, and early on a miss so a new service works within a second
+        age = time.monotonic() - self.paths_loaded_at
+        if age > self.refresh_interval or (service_path not in self.paths and age > 1):
+            self.paths = {path for path, in await self.db.fetchall(LIST_INGEST_PATHS)}
+            self.paths_loaded_at = time.monotonic()
+        return service_path in self.paths
+
+    async def full(self) -> bool:
+        if time.monotonic() - self.backlog_checked_at > 0.5:
+            (self.backlog,) = await self.db.fetchone(COUNT_BACKLOG, (time.time() - CONSUMER_TIMEOUT,))
+            self.backlog_checked_at = time.monotonic()
+        return self.backlog >= self.max_backlog
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    state = IntakeState()
+    await state.db.connect()
+    # The bot migrates the shared database before main.py starts the workers
+    version = (await state.db.fetchone("PRAGMA user_version"))[0]
+    if version < len(MIGRATIONS):
+        raise RuntimeError(f"Database is at schema version {version}, expected {len(MIGRATIONS)}; start the bot first")
+    app.state.intake = state
+    yield
+    await state.db.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+@app.post("/webhook/{service_name}", status_code=202)
+async def webhook_handler(service_name: str, request: Request):
+    try:
+        body = await read_body(request)
+        parse_payload(body)
+    except PayloadError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
+
+    state: IntakeState = app.state.intake
+    if not await state.knows(f"/webhook/{service_name}"):
+        raise HTTPException(
+            status_code=400,
+            detail="No channels configured for this service"
+        )
+
+    if await state.full():
+        print(f"Ingest queue full, rejecting webhook for {service_name}")
+        raise HTTPException(
+            status_code=503,
+            detail="Delivery queue is full",
+            headers={"Retry-After": str(state.retry_after)}
+        )
+
+    # Committed before acknowledging; the bot process picks it up from the queue
+    await state.db.write(INSERT_WEBHOOK, (service_name, body.decode(), time.time()))
+    return {"status": "queued"}
+
+@app.get("/queue")
+async def queue_status():
+    state: IntakeState = app.state.intake
+    await state.full()
+    return {"ingest_backlog": state.backlog, "capacity": state.max_backlog, "worker_pid": os.getpid()}
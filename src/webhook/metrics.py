@@ -0,0 +1,174 @@
+import bisect
+import time
+
+# Seconds; spans a cache hit on the render path up to a send that hits the timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._children: dict[tuple, object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        # One dict lookup on the hot path; children are created on first use
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._expose_child(values, child))
+        return lines
+
+    def _expose_child(self, values: tuple, child) -> list[str]:
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def clear(self):
+        self._children.clear()
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf, cumulated only when exposed
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _expose_child(self, values: tuple, child: _HistogramValue) -> list[str]:
+        lines = []
+        total = 0
+        for bound, count in zip((*self.buckets, float("inf")), child.counts):
+            total += count
+            le = _format_labels(self.label_names, values, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{le} {total}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum!r}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Timer:
+    """Observe the duration of a block: `with Timer(RENDER_SECONDS.labels(service)):`"""
+
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: _HistogramValue):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+REGISTRY: list[_Metric] = []
+
+
+def expose() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+WEBHOOK_INTAKE_SECONDS = Histogram(
+    "notifications_webhook_intake_seconds", "Time to validate and queue an incoming webhook", ("service",)
+)
+WEBHOOKS_TOTAL = Counter("notifications_webhooks_total", "Incoming webhooks by outcome", ("service", "status"))
+RENDER_SECONDS = Histogram("notifications_render_seconds", "Time to render a notification", ("service",))
+SEND_SECONDS = Histogram(
+    "notifications_send_seconds", "Latency of a single channel send, including retries", ("service",)
+)
+FANOUT_SIZE = Histogram(
+    "notifications_fanout_channels", "Channels a notification is sent to", ("service",), buckets=SIZE_BUCKETS
+)
+NOTIFICATIONS_FILTERED = Counter(
+    "notifications_filtered_channels_total", "Channel sends skipped by subscription filters", ("service",)
+)
+DELIVERY_FAILURES = Counter(
+    "notifications_delivery_failures_total", "Failed channel sends by reason", ("service", "reason")
+)
+SUBSCRIPTIONS_PRUNED = Counter(
+    "notifications_subscriptions_pruned_total", "Subscriptions removed automatically by reason", ("reason",)
+)
+DASHBOARD_EDITS = Counter("notifications_dashboard_edits_total", "Dashboard messages posted or edited", ("action",))
+QUEUE_DEPTH = Gauge("notifications_queue_depth", "Notifications waiting in each delivery stage", ("stage",))
+DB_QUERY_SECONDS = Histogram("notifications_db_query_seconds", "Database time by operation", ("operation",))
+GATEWAY_LATENCY = Gauge("notifications_gateway_latency_seconds", "Discord gateway heartbeat latency", ("shard",))
@@ -0,0 +1,310 @@
+import asyncio
+import heapq
+import json
+import os
+import random
+import time
+from collections import Counter
+
+from src.bot.database import Database, Statement
+from src.bot.sharding import ShardScope
+from .fanout import FanoutScheduler, is_permanent
+from .render import RenderedNotification
+
+INSERT_EVENT = "INSERT OR IGNORE INTO outbox_events (id, service_name, payload, embed) VALUES (?, ?, ?, ?)"
+INSERT_DELIVERY = """
+    INSERT OR IGNORE INTO outbox_deliveries (event_id, guild_id, channel_id, next_attempt_at)
+    VALUES (?, ?, ?, ?)
+"""
+# Updates held by the coalescer: durable from the moment they're acknowledged, but not sent yet
+INSERT_HELD_DELIVERY = """
+    INSERT OR IGNORE INTO outbox_deliveries (event_id, guild_id, channel_id, status, next_attempt_at)
+    VALUES (?, ?, ?, 'held', ?)
+"""
+DELETE_HELD = "DELETE FROM outbox_deliveries WHERE event_id = ? AND status = 'held'"
+DELETE_PENDING = "DELETE FROM outbox_deliveries WHERE event_id = ? AND status = 'pending'"
+DELETE_DELIVERY = "DELETE FROM outbox_deliveries WHERE event_id = ? AND channel_id = ?"
+SCHEDULE_RETRY = """
+    UPDATE outbox_deliveries SET status = 'retry', attempts = ?, next_attempt_at = ?, last_error = ?
+    WHERE event_id = ? AND channel_id = ?
+"""
+MARK_DEAD = """
+    UPDATE outbox_deliveries SET status = 'dead', attempts = ?, next_attempt_at = ?, last_error = ?
+    WHERE event_id = ? AND channel_id = ?
+"""
+SELECT_DUE = """
+    SELECT d.rowid, d.event_id, d.guild_id, d.channel_id, d.attempts, e.embed, e.service_name
+    FROM outbox_deliveries d JOIN outbox_events e ON e.id = d.event_id
+    WHERE d.status = 'retry' AND d.next_attempt_at <= ? AND d.rowid > ? AND {shards}
+    ORDER BY d.rowid LIMIT ?
+"""
+SELECT_UNFINISHED = """
+    SELECT d.rowid, d.event_id, d.guild_id, d.channel_id, d.attempts, e.embed, e.service_name
+    FROM outbox_deliveries d JOIN outbox_events e ON e.id = d.event_id
+    WHERE d.status IN ('pending', 'retry') AND d.rowid > ? AND {shards}
+    ORDER BY d.rowid LIMIT ?
+"""
+SELECT_HELD = """
+    SELECT d.rowid, d.event_id, d.guild_id, d.channel_id, e.payload, e.embed, e.service_name
+    FROM outbox_deliveries d JOIN outbox_events e ON e.id = d.event_id
+    WHERE d.status = 'held' AND d.rowid > ? AND {shards}
+    ORDER BY d.rowid LIMIT ?
+"""
+PRUNE_DEAD = "DELETE FROM outbox_deliveries WHERE status = 'dead' AND next_attempt_at < ?"
+PRUNE_EVENTS = "DELETE FROM outbox_events WHERE id NOT IN (SELECT event_id FROM outbox_deliveries)"
+
+
+class Outbox:
+    """Durable record of every notification and its per-channel deliveries.
+
+    Each accepted webhook is written to outbox_events with one row per channel
+    in outbox_deliveries. Delivered rows are deleted; failures are rescheduled
+    with exponential backoff and jitter until they succeed, hit a permanent
+    error (Forbidden, NotFound) or run out of attempts.
+
+    Updates the coalescer holds back are written as 'held' rows when they
+    are accepted. When their window closes, the rows are replaced by the
+    notification actually sent (the update itself or a digest), in the same
+    transaction. Held rows left by a crash are handed back to be held again.
+
+    Retries are held in a bounded in-memory heap so the common case never
+    reads from disk. Anything that doesn't fit is picked up by a periodic scan
+    of the table, and replay() resends whatever a previous run left behind.
+    When the shards are split across processes they share the table, and
+    each process only picks up deliveries for guilds on its own shards.
+    """
+
+    def __init__(self, db: Database, fanout: FanoutScheduler, scope: ShardScope = None):
+        self.db = db
+        self.fanout = fanout
+        scope = scope or ShardScope()
+        self._select_due = SELECT_DUE.format(shards=scope.sql("d.guild_id"))
+        self._select_unfinished = SELECT_UNFINISHED.format(shards=scope.sql("d.guild_id"))
+        self._select_held = SELECT_HELD.format(shards=scope.sql("d.guild_id"))
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+        self.base_delay = float(os.getenv("OUTBOX_RETRY_BASE", "2"))
+        self.max_delay = float(os.getenv("OUTBOX_RETRY_MAX", "600"))
+        self.memory_limit = int(os.getenv("OUTBOX_MEMORY_RETRIES", "1000"))
+        self.scan_interval = int(os.getenv("OUTBOX_SCAN_SECONDS", "30"))
+        self.scan_batch = 500
+        self.retried = 0
+        self.dead = 0
+        self._heap: list[tuple[float, str, int, int, int]] = []
+        self._rendered: dict[str, RenderedNotification] = {}
+        self._rendered_refs: Counter = Counter()
+        # Deliveries currently held in memory, and events still owned by the delivery queue
+        self._scheduled: set[tuple[str, int]] = set()
+        self._live: set[str] = set()
+        self._replayed = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def retry_depth(self) -> int:
+        return len(self._scheduled)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._retry_loop(), name="outbox-retry")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def hold(self, job):
+        """Persist a job the coalescer is holding back, so acknowledging it survives a crash."""
+        self._live.add(job.event_id)
+        self.db.submit([
+            self._insert_event(job),
+            (INSERT_HELD_DELIVERY, [(job.event_id, guild_id, channel_id, time.time())
+                                    for guild_id, channel_id in job.channels]),
+        ])
+
+    def record(self, jobs: list, released: list[str] = ()):
+        """Persist newly accepted jobs before they are handed to the workers.
+
+        released are held jobs these replace; their rows go in the same transaction.
+        """
+        now = time.time()
+        self._live.difference_update(released)
+        statements = [(DELETE_HELD, [(event_id,) for event_id in released])] if released else []
+        for job in jobs:
+            self._live.add(job.event_id)
+            statements += [
+                self._insert_event(job),
+                (INSERT_DELIVERY, [(job.event_id, guild_id, channel_id, now) for guild_id, channel_id in job.channels]),
+            ]
+        self.db.submit(statements)
+
+    @staticmethod
+    def _insert_event(job) -> Statement:
+        return (INSERT_EVENT, (job.event_id, job.service_name, json.dumps(job.payload), json.dumps(job.rendered.embed)))
+
+    async def complete(self, job, failed: dict[int, str]):
+        """Record the outcome of a job's first delivery attempt."""
+        statements = []
+        if failed:
+            guilds = dict(zip(job.channels.channel_ids, job.channels.guild_ids))
+            attempts = {channel_id: (guilds[channel_id], 0) for channel_id in failed}
+            statements, _ = self._reschedule(job.event_id, job.rendered, failed, attempts)
+        # Everything still pending after the failures were rescheduled was delivered
+        statements.append((DELETE_PENDING, (job.event_id,)))
+        try:
+            await self.db.transaction(statements)
+        finally:
+            self._live.discard(job.event_id)
+
+    async def replay(self) -> list[tuple]:
+        """Resend deliveries left unfinished by a previous run. Runs once.
+
+        Returns the updates a previous run was still holding, as
+        (event_id, service_name, payload, embed, [(guild_id, channel_id)]),
+        for the caller to hold again.
+        """
+        if self._replayed:
+            return []
+        self._replayed = True
+
+        total = 0
+        last_rowid = 0
+        while True:
+            rows = await self.db.fetchall(self._select_unfinished, (last_rowid, self.scan_batch))
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            rows = [row for row in rows if row[1] not in self._live and (row[1], row[3]) not in self._scheduled]
+            total += len(rows)
+            await self._redeliver(rows)
+
+        if total:
+            print(f"Replayed {total} undelivered notifications from the outbox")
+
+        held: dict[str, tuple] = {}
+        last_rowid = 0
+        while True:
+            rows = await self.db.fetchall(self._select_held, (last_rowid, self.scan_batch))
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            for _, event_id, guild_id, channel_id, payload, embed, service_name in rows:
+                if event_id not in self._live:
+                    held.setdefault(event_id, (event_id, service_name, payload, embed, []))[4].append((guild_id, channel_id))
+        return list(held.values())
+
+    async def _retry_loop(self):
+        last_scan = time.monotonic()
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            try:
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, event_id, guild_id, channel_id, attempts = heapq.heappop(self._heap)
+                    due.append((event_id, guild_id, channel_id, attempts, self._release_rendered(event_id)))
+                if due:
+                    await self._redeliver_memory(due)
+
+                if time.monotonic() - last_scan >= self.scan_interval:
+                    last_scan = time.monotonic()
+                    await self._scan_disk(now)
+
+                if time.monotonic() - last_prune >= 3600:
+                    last_prune = time.monotonic()
+                    await self.db.transaction([
+                        (PRUNE_DEAD, (now - 7 * 86400,)),
+                        (PRUNE_EVENTS, ()),
+                    ])
+            except Exception as e:
+                print(f"Error retrying outbox deliveries: {e}")
+
+    async def _scan_disk(self, now: float):
+        # Picks up retries that overflowed the in-memory heap
+        last_rowid = 0
+        while True:
+            rows = await self.db.fetchall(self._select_due, (now, last_rowid, self.scan_batch))
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            await self._redeliver([row for row in rows if (row[1], row[3]) not in self._scheduled])
+
+    async def _redeliver(self, rows: list[tuple]):
+        rendered: dict[str, RenderedNotification] = {}
+        due = []
+        for _, event_id, guild_id, channel_id, attempts, embed_json, service_name in rows:
+            if event_id not in rendered:
+                rendered[event_id] = RenderedNotification(json.loads(embed_json), service_name)
+            self._scheduled.add((event_id, channel_id))
+            due.append((event_id, guild_id, channel_id, attempts, rendered[event_id]))
+        await self._redeliver_memory(due)
+
+    async def _redeliver_memory(self, due: list[tuple]):
+        events: dict[str, list[tuple]] = {}
+        for entry in due:
+            events.setdefault(entry[0], []).append(entry)
+
+        async def redeliver_event(event_id: str, entries: list[tuple]):
+            rendered = entries[0][4]
+            attempts = {channel_id: (guild_id, tries) for _, guild_id, channel_id, tries, _ in entries}
+            failed = await self.fanout.dispatch(rendered, [(guild_id, channel_id) for _, guild_id, channel_id, _, _ in entries])
+            self.retried += len(entries)
+
+            statements, kept = self._reschedule(event_id, rendered, failed, attempts)
+            delivered = [(event_id, channel_id) for channel_id in attempts if channel_id not in failed]
+            if delivered:
+                statements.append((DELETE_DELIVERY, delivered))
+            try:
+                await self.db.transaction(statements)
+            finally:
+                # Only release once the outcome is on disk, or a scan could resend it
+                for channel_id in attempts:
+                    if channel_id not in kept:
+                        self._scheduled.discard((event_id, channel_id))
+
+        await asyncio.gather(*(redeliver_event(event_id, entries) for event_id, entries in events.items()))
+
+    def _reschedule(self, event_id: str, rendered: RenderedNotification, failed: dict[int, str],
+                    attempts: dict[int, tuple[int, int]]) -> tuple[list[Statement], set[int]]:
+        """Build the writes for a set of failures and queue in-memory retries.
+
+        Returns the statements and the channel ids now held in the retry heap.
+        """
+        now = time.time()
+        retries, dead = [], []
+        kept = set()
+        for channel_id, reason in failed.items():
+            guild_id, tries = attempts[channel_id]
+            tries += 1
+            if is_permanent(reason) or tries >= self.max_attempts:
+                print(f"Giving up on channel {channel_id} in guild {guild_id} after {tries} attempts: {reason}")
+                dead.append((tries, now, reason, event_id, channel_id))
+                continue
+
+            due = now + self._backoff(tries)
+            retries.append((tries, due, reason, event_id, channel_id))
+            if len(self._heap) < self.memory_limit:
+                heapq.heappush(self._heap, (due, event_id, guild_id, channel_id, tries))
+                self._scheduled.add((event_id, channel_id))
+                kept.add(channel_id)
+                self._rendered[event_id] = rendered
+                self._rendered_refs[event_id] += 1
+
+        self.dead += len(dead)
+        statements = []
+        if retries:
+            statements.append((SCHEDULE_RETRY, retries))
+        if dead:
+            statements.append((MARK_DEAD, dead))
+        return statements, kept
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _release_rendered(self, event_id: str) -> RenderedNotification:
+        rendered = self._rendered[event_id]
+        self._rendered_refs[event_id] -= 1
+        if self._rendered_refs[event_id] <= 0:
+            del self._rendered_refs[event_id]
+            del self._rendered[event_id]
+        return rendered
@@ -0,0 +1,192 @@
+"""Bounded reading, decoding and validation of Statuspage webhook bodies.
+
+Bodies are read from the request stream with a hard size cap and decoded
+with orjson when it's installed (pip install orjson), falling back to the
+standard library. The result is checked and parsed into small slotted
+models once at the edge, so nothing downstream walks unvalidated dicts.
+JSON nulls are treated as absent, and timestamps must be ISO 8601, so every
+event that parses can also be rendered.
+"""
+import os
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BYTES", "262144"))
+
+
+class PayloadError(ValueError):
+    """A webhook body that was too large or malformed; status is the HTTP status to answer with."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+async def read_body(request, limit: int = MAX_BODY_BYTES) -> bytes:
+    """Read a request body, giving up as soon as it passes limit bytes."""
+    length = request.headers.get("content-length")
+    if length is not None:
+        if not length.isdigit():
+            raise PayloadError(400, "Invalid Content-Length")
+        if int(length) > limit:
+            raise PayloadError(413, f"Payload larger than {limit} bytes")
+
+    body = bytearray()
+    # Chunked uploads don't declare a length, so the cap is enforced while streaming too
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise PayloadError(413, f"Payload larger than {limit} bytes")
+    return bytes(body)
+
+
+@lru_cache(maxsize=1024)
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _present(data: dict) -> dict:
+    """The object without its null members, so a null reads the same as a missing key."""
+    if None not in data.values():
+        return data
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def _text(data: dict, key: str) -> str | None:
+    value = data.get(key)
+    if value is not None and not isinstance(value, str):
+        raise PayloadError(400, f"'{key}' must be a string")
+    return value
+
+
+def _object(data: dict, key: str) -> dict | None:
+    value = data.get(key)
+    if value is not None and not isinstance(value, dict):
+        raise PayloadError(400, f"'{key}' must be an object")
+    return value
+
+
+def _timestamp(data: dict, key: str) -> str | None:
+    value = _text(data, key)
+    if value is not None:
+        try:
+            parse_timestamp(value)
+        except ValueError:
+            raise PayloadError(400, f"'{key}' must be an ISO 8601 timestamp")
+    return value
+
+
+def _objects(data: dict, key: str) -> list[dict]:
+    value = data.get(key) or []
+    if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+        raise PayloadError(400, f"'{key}' must be a list of objects")
+    return value
+
+
+class Page:
+    __slots__ = ("id", "status_indicator", "status_description")
+
+    def __init__(self, data: dict):
+        self.id = _text(data, "id")
+        self.status_indicator = _text(data, "status_indicator")
+        self.status_description = _text(data, "status_description")
+
+
+class Component:
+    __slots__ = ("id", "name", "status")
+
+    def __init__(self, data: dict):
+        self.id = _text(data, "id")
+        self.name = _text(data, "name")
+        self.status = _text(data, "status")
+
+
+class ComponentUpdate:
+    __slots__ = ("id", "component_id", "old_status", "new_status", "created_at")
+
+    def __init__(self, data: dict):
+        self.id = _text(data, "id")
+        self.component_id = _text(data, "component_id")
+        self.old_status = _text(data, "old_status")
+        self.new_status = _text(data, "new_status")
+        self.created_at = _timestamp(data, "created_at")
+
+
+class Incident:
+    __slots__ = ("id", "name", "status", "impact", "update_id", "components")
+
+    def __init__(self, data: dict):
+        self.id = _text(data, "id")
+        self.name = _text(data, "name")
+        self.status = _text(data, "status")
+        self.impact = _text(data, "impact")
+        _timestamp(data, "created_at")
+        _timestamp(data, "updated_at")
+        updates = _objects(data, "incident_updates")
+        # Statuspage lists updates newest first; only the latest is rendered
+        self.update_id = _text(updates[0], "id") if updates else None
+        if updates:
+            _timestamp(updates[0], "created_at")
+            _timestamp(updates[0], "updated_at")
+        self.components = [_text(component, "name") for component in _objects(data, "components")]
+
+
+class StatuspageEvent:
+    """A validated Statuspage webhook; raw is the decoded body, kept for rendering and storage."""
+
+    __slots__ = ("raw", "page", "component", "component_update", "incident")
+
+    def __init__(self, raw: dict, page: Page | None, component: Component | None,
+                 component_update: ComponentUpdate | None, incident: Incident | None):
+        self.raw = raw
+        self.page = page
+        self.component = component
+        self.component_update = component_update
+        self.incident = incident
+
+
+def parse_event(data) -> StatuspageEvent:
+    """Validate a decoded webhook and build its models."""
+    if not isinstance(data, dict):
+        raise PayloadError(400, "Payload must be a JSON object")
+    data = _present(data)
+    page = _object(data, "page")
+    component = _object(data, "component")
+    component_update = _object(data, "component_update")
+    incident = _object(data, "incident")
+    if page is None and component_update is None and incident is None:
+        raise PayloadError(400, "Payload has no page, component_update or incident")
+    # The raw body is what the formatter reads, so it gets the cleaned objects too
+    page, component, component_update, incident = (
+        _present(value) if value is not None else None for value in (page, component, component_update, incident)
+    )
+    updates = incident.get("incident_updates") if incident is not None else None
+    if isinstance(updates, list) and updates and isinstance(updates[0], dict):
+        latest = _present(updates[0])
+        if latest is not updates[0]:
+            incident = {**incident, "incident_updates": [latest, *updates[1:]]}
+    cleaned = {"page": page, "component": component, "component_update": component_update, "incident": incident}
+    if any(value is not data.get(key) for key, value in cleaned.items()):
+        data = {**data, **{key: value for key, value in cleaned.items() if value is not None}}
+    return StatuspageEvent(
+        data,
+        Page(page) if page is not None else None,
+        Component(component) if component is not None else None,
+        ComponentUpdate(component_update) if component_update is not None else None,
+        Incident(incident) if incident is not None else None,
+    )
+
+
+def parse_payload(body: bytes) -> StatuspageEvent:
+    """Decode and validate a webhook body."""
+    try:
+        data = loads(body)
+    except (ValueError, RecursionError):
+        raise PayloadError(400, "Invalid JSON payload")
+    return parse_event(data)
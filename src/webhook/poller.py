@@ -0,0 +1,236 @@
+import asyncio
+import os
+import random
+
+import aiohttp
+
+
+def poll_sources() -> dict[str, str]:
+    """Parse POLL_SOURCES, e.g. "github=https://www.githubstatus.com,openai=https://status.openai.com".
+
+    The key is the service's webhook slug, as in /webhook/<slug>, since the
+    payloads go through the same path as pushed webhooks. A source is either
+    a status page's base URL or the full URL of its summary.json.
+    """
+    sources = {}
+    for item in filter(None, (part.strip() for part in os.getenv("POLL_SOURCES", "").split(","))):
+        service_name, _, url = item.partition("=")
+        url = url.strip().rstrip("/")
+        if not url.endswith(".json"):
+            url += "/api/v2/summary.json"
+        sources[service_name.strip()] = url
+    return sources
+
+
+class PageState:
+    """What was last seen on one status page."""
+
+    __slots__ = ("service_name", "url", "etag", "last_modified", "components", "incidents", "failures")
+
+    def __init__(self, service_name: str, url: str):
+        self.service_name = service_name
+        self.url = url
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        # component id -> status, incident id -> latest update id; None until the first fetch
+        self.components: dict[str, str] | None = None
+        self.incidents: dict[str, str] | None = None
+        self.failures = 0
+
+
+def _page(summary: dict) -> dict:
+    # summary.json splits the page and its status; webhooks carry them together
+    status = summary.get("status") or {}
+    return {
+        "id": (summary.get("page") or {}).get("id"),
+        "status_indicator": status.get("indicator", ""),
+        "status_description": status.get("description", ""),
+    }
+
+
+def _latest_update_id(incident: dict) -> str:
+    updates = incident.get("incident_updates") or []
+    return updates[0].get("id", "") if updates else incident.get("updated_at", "")
+
+
+def diff_summary(state: PageState, summary: dict) -> tuple[list[tuple[str, str, dict]], list[str], dict, dict]:
+    """Compare a summary.json with the last one seen.
+
+    Returns a (kind, id, payload) webhook-shaped change for every component
+    and incident that changed, the ids of incidents that have dropped off
+    the summary (it only lists unresolved ones), and the component and
+    incident state the summary leaves behind. The state itself is left to
+    the caller, which only commits the changes it managed to hand on. The
+    first summary seen for a page only sets the baseline.
+    """
+    page = _page(summary)
+    components = {
+        component["id"]: component
+        for component in summary.get("components") or []
+        if not component.get("group")
+    }
+    incidents = {
+        incident["id"]: incident
+        for incident in (summary.get("incidents") or []) + (summary.get("scheduled_maintenances") or [])
+    }
+
+    changes, gone = [], []
+    if state.components is not None:
+        for component_id, component in components.items():
+            old_status = state.components.get(component_id)
+            if old_status is not None and old_status != component.get("status"):
+                changes.append(("component", component_id, {
+                    "page": page,
+                    "component_update": {
+                        "id": f"{component_id}:{component.get('updated_at', '')}",
+                        "component_id": component_id,
+                        "old_status": old_status,
+                        "new_status": component.get("status"),
+                        "created_at": component.get("updated_at"),
+                    },
+                    "component": component,
+                }))
+        for incident_id, incident in incidents.items():
+            if state.incidents.get(incident_id) != _latest_update_id(incident):
+                changes.append(("incident", incident_id, {"page": page, "incident": incident}))
+        gone = [incident_id for incident_id in state.incidents if incident_id not in incidents]
+
+    return (
+        changes,
+        gone,
+        {component_id: component.get("status") for component_id, component in components.items()},
+        {incident_id: _latest_update_id(incident) for incident_id, incident in incidents.items()},
+    )
+
+
+class StatusPoller:
+    """Polls Statuspage summary.json endpoints for services that can't push webhooks.
+
+    Every page is fetched every POLL_INTERVAL seconds, give or take
+    POLL_JITTER, through one pooled HTTP session. Requests are conditional
+    (If-None-Match / If-Modified-Since), so an unchanged page costs a 304.
+    Each new summary is diffed against the last one, and only the changes
+    are fed into the same accept path as pushed webhooks, so they're
+    deduplicated, rendered and delivered exactly like them.
+    """
+
+    def __init__(self, bot, sources: dict[str, str] = None):
+        self.bot = bot
+        self.interval = float(os.getenv("POLL_INTERVAL", "60"))
+        self.jitter = float(os.getenv("POLL_JITTER", "0.2"))
+        self.concurrency = int(os.getenv("POLL_CONCURRENCY", "20"))
+        self.timeout = float(os.getenv("POLL_TIMEOUT", "10"))
+        self.pages = [PageState(name, url) for name, url in (sources or poll_sources()).items()]
+        self.session: aiohttp.ClientSession | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.fetched = 0
+        self.not_modified = 0
+        self.changes = 0
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        for page in self.pages:
+            self._tasks.append(asyncio.create_task(self._poll_loop(page), name=f"poll-{page.service_name}"))
+        print(f"Polling {len(self.pages)} status pages every {self.interval:.0f}s")
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def stats(self) -> dict:
+        return {
+            "pages": len(self.pages),
+            "fetched": self.fetched,
+            "not_modified": self.not_modified,
+            "changes": self.changes,
+            "failing": sum(1 for page in self.pages if page.failures),
+        }
+
+    async def _poll_loop(self, page: PageState):
+        # Spread the first fetches over one interval so hundreds of pages don't start at once
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            try:
+                await self.poll(page)
+                page.failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                page.failures += 1
+                if page.failures == 1:
+                    print(f"Error polling {page.url} for {page.service_name}: {e!r}")
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def poll(self, page: PageState):
+        headers = {}
+        if page.etag:
+            headers["If-None-Match"] = page.etag
+        if page.last_modified:
+            headers["If-Modified-Since"] = page.last_modified
+
+        async with self.session.get(page.url, headers=headers) as response:
+            if response.status == 304:
+                self.not_modified += 1
+                return
+            response.raise_for_status()
+            summary = await response.json(content_type=None)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        self.fetched += 1
+
+        # A change that couldn't be handed on keeps its old state, and the page keeps its
+        # old validators so the next poll fetches it in full and emits the change again
+        changes, gone, components, incidents = diff_summary(page, summary)
+        complete = True
+        for kind, item_id, payload in changes:
+            if not self._accept(page, payload):
+                complete = False
+                if kind == "component":
+                    components[item_id] = page.components[item_id]
+                elif item_id in page.incidents:
+                    incidents[item_id] = page.incidents[item_id]
+                else:
+                    del incidents[item_id]
+        try:
+            if gone:
+                # Resolved incidents leave the summary; their final update is in incidents.json
+                resolved = await self._resolved_incidents(page, summary, set(gone))
+                for incident_id in gone:
+                    payload = resolved.get(incident_id)
+                    if payload and not self._accept(page, payload):
+                        complete = False
+                        incidents[incident_id] = page.incidents[incident_id]
+        except Exception:
+            complete = False
+            incidents.update((incident_id, page.incidents[incident_id]) for incident_id in gone)
+            raise
+        finally:
+            page.components, page.incidents = components, incidents
+            if complete:
+                page.etag, page.last_modified = etag, last_modified
+
+    def _accept(self, page: PageState, payload: dict) -> bool:
+        """Hand a change to delivery and return whether it was taken."""
+        status, _ = self.bot.delivery.accept_webhook(page.service_name, payload)
+        if status == "queued":
+            self.changes += 1
+        # Every other outcome is final; a full queue may have room next time
+        return status != "full"
+
+    async def _resolved_incidents(self, page: PageState, summary: dict, incident_ids: set[str]) -> dict[str, dict]:
+        url = page.url.replace("summary.json", "incidents.json")
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            incidents = (await response.json(content_type=None)).get("incidents") or []
+        return {
+            incident["id"]: {"page": _page(summary), "incident": incident}
+            for incident in incidents if incident.get("id") in incident_ids
+        }
@@ -0,0 +1,102 @@
+import json
+
+import discord
+
+from .formatting import format_component_digest, format_statuspage_notification
+
+# https://discord.com/developers/docs/resources/message#embed-object-embed-limits
+TITLE_LIMIT = 256
+DESCRIPTION_LIMIT = 4096
+FIELD_COUNT_LIMIT = 25
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FOOTER_LIMIT = 2048
+AUTHOR_LIMIT = 256
+TOTAL_LIMIT = 6000
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1] + "…"
+
+
+def _embed_length(data: dict) -> int:
+    total = len(data.get("title", "")) + len(data.get("description", ""))
+    total += len(data.get("footer", {}).get("text", "")) + len(data.get("author", {}).get("name", ""))
+    return total + sum(len(field["name"]) + len(field["value"]) for field in data.get("fields", []))
+
+
+def fit_embed(data: dict) -> dict:
+    """Clamp an embed dict to Discord's size limits.
+
+    Oversized text is truncated and empty field values are filled in, so an
+    over-long update is fixed once here instead of being rejected by Discord
+    in every channel.
+    """
+    data = dict(data)
+    if "title" in data:
+        data["title"] = _truncate(data["title"], TITLE_LIMIT)
+    if "description" in data:
+        data["description"] = _truncate(data["description"], DESCRIPTION_LIMIT)
+    if "footer" in data:
+        data["footer"] = {**data["footer"], "text": _truncate(data["footer"].get("text", ""), FOOTER_LIMIT)}
+    if "author" in data:
+        data["author"] = {**data["author"], "name": _truncate(data["author"].get("name", ""), AUTHOR_LIMIT)}
+
+    fields = [
+        {
+            **field,
+            "name": _truncate(str(field.get("name") or "\u200b"), FIELD_NAME_LIMIT),
+            "value": _truncate(str(field.get("value") or "\u200b"), FIELD_VALUE_LIMIT),
+        }
+        for field in data.get("fields", [])[:FIELD_COUNT_LIMIT]
+    ]
+    if fields:
+        data["fields"] = fields
+
+    # Over the total limit: shorten the last fields first, they are the least important
+    excess = _embed_length(data) - TOTAL_LIMIT
+    while excess > 0 and fields:
+        last = fields[-1]
+        room = len(last["value"]) - excess
+        if room >= 32:
+            last["value"] = _truncate(last["value"], room)
+            break
+        excess -= len(last["name"]) + len(last["value"])
+        fields.pop()
+    return data
+
+
+class RenderedNotification:
+    """A notification rendered once and reused for every channel.
+
+    payload is the message body for discord.py's send_message, and body is
+    the same payload serialized to JSON for the webhook path, so no channel
+    has to rebuild or re-serialize the embed.
+    """
+
+    __slots__ = ("embed", "service_name", "payload", "body")
+
+    def __init__(self, embed: dict, service_name: str = ""):
+        self.embed = embed
+        self.service_name = service_name
+        self.payload = {"embeds": [embed]}
+        self.body = json.dumps(self.payload, separators=(",", ":")).encode()
+
+    @classmethod
+    def from_embed(cls, embed: discord.Embed, service_name: str = "") -> "RenderedNotification":
+        return cls(fit_embed(embed.to_dict()), service_name)
+
+
+def render_notification(payload: dict, service_name: str) -> RenderedNotification:
+    """Format, size-check and serialize a Statuspage payload.
+
+    Not memoized: repeated payloads are already dropped by the dedup check
+    before they get here, so a cache would never hit.
+    """
+    return RenderedNotification.from_embed(format_statuspage_notification(payload, service_name), service_name)
+
+
+def render_component_digest(payloads: list[dict], service_name: str) -> RenderedNotification:
+    return RenderedNotification.from_embed(format_component_digest(payloads, service_name), service_name)
@@ -0,0 +1,351 @@
+from array import array
+from itertools import compress
+
+from src.bot.database import Database, LIST_ROUTE_CHANNELS, LIST_ROUTE_SERVICES
+from src.bot.sharding import ShardScope
+from .filters import Event, SubscriptionFilter, compile_filter
+
+# Distinct event shapes remembered per route
+SELECTION_MEMO_SIZE = 256
+
+
+class Route:
+    """The channels subscribed to one service.
+
+    Guild and channel ids are kept in two parallel int64 arrays. Routes are
+    never mutated in place: every change builds a new Route and swaps it
+    into the table, so a delivery that already holds a Route keeps a
+    consistent snapshot while the table moves on.
+
+    Subscriptions with a filter are listed in filters by guild id. On the
+    first select() they are compiled into one channel group per distinct
+    filter, so routing an event evaluates each filter once rather than each
+    subscriber, and the selection is memoized per event shape. Guilds in
+    muted follow the service on a dashboard instead and are never selected.
+    """
+
+    __slots__ = ("service_id", "service_name", "webhook_path", "guild_ids", "channel_ids", "filters", "muted",
+                 "_groups", "_selections")
+
+    def __init__(self, service_id: int, service_name: str, webhook_path: str,
+                 guild_ids: array = None, channel_ids: array = None,
+                 filters: dict[int, SubscriptionFilter] = None, muted: frozenset[int] = frozenset()):
+        self.service_id = service_id
+        self.service_name = service_name
+        self.webhook_path = webhook_path
+        self.guild_ids = guild_ids if guild_ids is not None else array("q")
+        self.channel_ids = channel_ids if channel_ids is not None else array("q")
+        self.filters = filters if filters is not None else {}
+        self.muted = muted
+        self._groups: list[tuple[SubscriptionFilter | None, array, array]] | None = None
+        self._selections: dict[Event, Route] = {}
+
+    def __len__(self) -> int:
+        return len(self.channel_ids)
+
+    def __iter__(self):
+        return zip(self.guild_ids, self.channel_ids)
+
+    def pairs(self) -> set[tuple[int, int]]:
+        return set(self)
+
+    def select(self, event: Event) -> "Route":
+        """The subscriptions whose filters want the event, as a Route of their own."""
+        if not self.filters and not self.muted:
+            return self
+        selection = self._selections.get(event)
+        if selection is None:
+            if self._groups is None:
+                self._groups = self._compile()
+            guild_ids, channel_ids = array("q"), array("q")
+            for subscription_filter, group_guilds, group_channels in self._groups:
+                if subscription_filter is None or subscription_filter.matches(event):
+                    guild_ids.extend(group_guilds)
+                    channel_ids.extend(group_channels)
+            selection = Route(self.service_id, self.service_name, self.webhook_path, guild_ids, channel_ids)
+            if len(self._selections) >= SELECTION_MEMO_SIZE:
+                self._selections.clear()
+            self._selections[event] = selection
+        return selection
+
+    def subset(self, pairs) -> "Route":
+        guild_ids, channel_ids = array("q"), array("q")
+        for guild_id, channel_id in pairs:
+            guild_ids.append(guild_id)
+            channel_ids.append(channel_id)
+        return Route(self.service_id, self.service_name, self.webhook_path, guild_ids, channel_ids)
+
+    def with_subscription(self, guild_id: int, channel_id: int) -> "Route":
+        # server_channels is UNIQUE(service_id, guild_id), so a guild has at most one channel.
+        # Moving to another channel keeps the guild's filter, as the database does.
+        route = self.without_guild(guild_id)
+        route.guild_ids.append(guild_id)
+        route.channel_ids.append(channel_id)
+        if guild_id in self.filters:
+            route.filters[guild_id] = self.filters[guild_id]
+        route.muted = self.muted
+        return route
+
+    def with_changes(self, dropped: set[int], subscribed: dict[int, int],
+                     filters: dict[int, SubscriptionFilter | None], muted: frozenset[int]) -> "Route":
+        """Apply many changes in one copy: the rows of the dropped guilds are taken out, then
+        the guild -> channel subscriptions appended, and each guild -> filter set (None clears it)."""
+        if dropped:
+            # Filtered with C-level iterators; a Python loop per row would dominate large imports
+            keep = [not g for g in map(dropped.__contains__, self.guild_ids)]
+            guild_ids = array("q", compress(self.guild_ids, keep))
+            channel_ids = array("q", compress(self.channel_ids, keep))
+        else:
+            guild_ids, channel_ids = array("q", self.guild_ids), array("q", self.channel_ids)
+        guild_ids.extend(subscribed.keys())
+        channel_ids.extend(subscribed.values())
+        route_filters = dict(self.filters)
+        for guild_id, subscription_filter in filters.items():
+            if subscription_filter is None:
+                route_filters.pop(guild_id, None)
+            else:
+                route_filters[guild_id] = subscription_filter
+        return Route(self.service_id, self.service_name, self.webhook_path, guild_ids, channel_ids, route_filters,
+                     muted)
+
+    def with_filter(self, guild_id: int, subscription_filter: SubscriptionFilter | None) -> "Route":
+        filters = {g: f for g, f in self.filters.items() if g != guild_id}
+        if subscription_filter is not None:
+            filters[guild_id] = subscription_filter
+        return Route(self.service_id, self.service_name, self.webhook_path, self.guild_ids, self.channel_ids,
+                     filters, self.muted)
+
+    def with_muted(self, muted: frozenset[int]) -> "Route":
+        return Route(self.service_id, self.service_name, self.webhook_path, self.guild_ids, self.channel_ids,
+                     self.filters, muted)
+
+    def without_guild(self, guild_id: int) -> "Route":
+        guild_ids, channel_ids = array("q"), array("q")
+        for g, c in self:
+            if g != guild_id:
+                guild_ids.append(g)
+                channel_ids.append(c)
+        filters = {g: f for g, f in self.filters.items() if g != guild_id}
+        return Route(self.service_id, self.service_name, self.webhook_path, guild_ids, channel_ids, filters,
+                     self.muted - {guild_id})
+
+    def _compile(self) -> list[tuple[SubscriptionFilter | None, array, array]]:
+        groups: dict[SubscriptionFilter | None, tuple[array, array]] = {}
+        for guild_id, channel_id in self:
+            if guild_id in self.muted:
+                continue
+            group_guilds, group_channels = groups.setdefault(self.filters.get(guild_id), (array("q"), array("q")))
+            group_guilds.append(guild_id)
+            group_channels.append(channel_id)
+        return [(subscription_filter, *group) for subscription_filter, group in groups.items()]
+
+
+class RoutingTable:
+    """In-memory index of webhook_path -> subscribed channels.
+
+    Built from the database at startup and kept up to date by the cogs as
+    they write, so routing a webhook never touches the disk. verify()
+    compares the index against the database and repairs any drift.
+
+    Channels set up for webhook delivery also have their Discord webhook
+    (id, token) indexed by channel id, and each guild's subscribed services
+    are indexed by guild id.
+    """
+
+    def __init__(self, scope: ShardScope = None):
+        # Only guilds on this process's shards are routed here
+        self.scope = scope or ShardScope()
+        self._by_path: dict[str, Route] = {}
+        self._by_id: dict[int, Route] = {}
+        self._webhooks: dict[int, tuple[int, str]] = {}
+        self._guild_services: dict[int, set[int]] = {}
+        # Guilds whose dashboard replaces per-event messages
+        self._muted: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._by_path)
+
+    def get(self, webhook_path: str) -> Route | None:
+        return self._by_path.get(webhook_path)
+
+    def webhook_for(self, channel_id: int) -> tuple[int, str] | None:
+        return self._webhooks.get(channel_id)
+
+    def clear_webhook(self, channel_id: int):
+        self._webhooks.pop(channel_id, None)
+
+    async def load(self, db: Database):
+        by_path, by_id, webhooks, guild_services = await self._read(db)
+        self._by_path, self._by_id, self._webhooks, self._guild_services = by_path, by_id, webhooks, guild_services
+        print(f"Loaded routes for {len(by_path)} services")
+
+    async def verify(self, db: Database) -> list[str]:
+        """Check the index against the database, rebuilding it on mismatch.
+
+        Returns the webhook paths that were out of sync.
+        """
+        current = dict(self._by_path)
+        # Changes are applied here first and written through db.submit(), so let those
+        # land before reading, or the rebuild would undo them
+        await db.flush()
+        by_path, by_id, webhooks, guild_services = await self._read(db)
+        mismatched = [
+            path for path in set(by_path) | set(self._by_path)
+            if path not in by_path or path not in self._by_path
+            or by_path[path].pairs() != self._by_path[path].pairs()
+            or by_path[path].filters != self._by_path[path].filters
+        ]
+        if any(self._by_path.get(path) is not current.get(path) for path in mismatched):
+            # Routes are replaced on every change, so these changed after the check began
+            print(f"Routing table out of sync for {mismatched} while it was being changed, not rebuilding")
+        elif mismatched:
+            print(f"Routing table out of sync for {mismatched}, rebuilding")
+            self._by_path, self._by_id, self._webhooks = by_path, by_id, webhooks
+            self._guild_services = guild_services
+        return mismatched
+
+    def add_service(self, service_id: int, service_name: str, webhook_path: str):
+        if service_id not in self._by_id:
+            self._store(Route(service_id, service_name, webhook_path))
+
+    def remove_service(self, service_id: int):
+        route = self._by_id.pop(service_id, None)
+        if route is not None:
+            self._by_path.pop(route.webhook_path, None)
+            for channel_id in route.channel_ids:
+                self._webhooks.pop(channel_id, None)
+            for guild_id in route.guild_ids:
+                self._forget_service(guild_id, service_id)
+
+    def subscribe(self, service_id: int, guild_id: int, channel_id: int,
+                  webhook: tuple[int, str] | None = None):
+        route = self._by_id.get(service_id)
+        if route is not None and self.scope.owns(guild_id):
+            self._drop_guild_webhook(route, guild_id)
+            route = route.with_subscription(guild_id, channel_id)
+            if guild_id in self._muted:
+                route = route.with_muted(route.muted | {guild_id})
+            self._store(route)
+            self._guild_services.setdefault(guild_id, set()).add(service_id)
+            if webhook:
+                self._webhooks[channel_id] = webhook
+
+    def set_filter(self, service_id: int, guild_id: int, subscription_filter: SubscriptionFilter | None):
+        route = self._by_id.get(service_id)
+        if route is not None and guild_id in route.guild_ids:
+            self._store(route.with_filter(guild_id, subscription_filter))
+
+    def unsubscribe(self, service_id: int, guild_id: int):
+        route = self._by_id.get(service_id)
+        if route is not None:
+            self._drop_guild_webhook(route, guild_id)
+            self._store(route.without_guild(guild_id))
+            self._forget_service(guild_id, service_id)
+
+    def apply_batch(self, service_id: int, subscribed: dict[int, int],
+                    filters: dict[int, SubscriptionFilter | None], removed: set[int]):
+        """Apply a chunk of a bulk import to one service, rebuilding its route once rather than per row.
+
+        Imported subscriptions have no Discord webhook, so they are sent by the bot user.
+        """
+        route = self._by_id.get(service_id)
+        if route is None:
+            return
+        subscribed = {g: c for g, c in subscribed.items() if self.scope.owns(g)}
+        # The guild index says which guilds already have a row, without scanning the route
+        dropped = {g for g in removed | subscribed.keys() if service_id in self._guild_services.get(g, ())}
+        if dropped and self._webhooks:
+            for channel_id in compress(route.channel_ids, map(dropped.__contains__, route.guild_ids)):
+                self._webhooks.pop(channel_id, None)
+        filters = {g: f for g, f in filters.items() if g in subscribed}
+        filters.update((guild_id, None) for guild_id in removed)
+        muted = (route.muted - removed) | (subscribed.keys() & self._muted)
+        self._store(route.with_changes(dropped, subscribed, filters, frozenset(muted)))
+        for guild_id in removed:
+            self._forget_service(guild_id, service_id)
+        for guild_id in subscribed:
+            self._guild_services.setdefault(guild_id, set()).add(service_id)
+
+    def subscription_count(self, service_id: int) -> int:
+        route = self._by_id.get(service_id)
+        return len(route) if route is not None else 0
+
+    def set_muted(self, guild_id: int, muted: bool):
+        """Leave the guild out of every selection, or put it back."""
+        if muted:
+            self._muted.add(guild_id)
+        else:
+            self._muted.discard(guild_id)
+        for route in self.services_in(guild_id):
+            self._store(route.with_muted(route.muted | {guild_id} if muted else route.muted - {guild_id}))
+
+    def services_in(self, guild_id: int) -> list[Route]:
+        return [self._by_id[service_id] for service_id in self._guild_services.get(guild_id, ())]
+
+    def remove_channel(self, channel_id: int) -> int:
+        """Drop every subscription delivering to the channel; returns how many there were."""
+        removed = 0
+        for route in list(self._by_id.values()):
+            if channel_id in route.channel_ids:
+                for guild_id, c in route:
+                    if c == channel_id:
+                        self.unsubscribe(route.service_id, guild_id)
+                        removed += 1
+                        break
+        return removed
+
+    def remove_guild(self, guild_id: int) -> list[int]:
+        """Drop every subscription in the guild; returns the channels that were subscribed."""
+        channel_ids = []
+        for route in self.services_in(guild_id):
+            channel_ids.extend(c for g, c in route if g == guild_id)
+            self.unsubscribe(route.service_id, guild_id)
+        return channel_ids
+
+    def channels_in(self, guild_id: int) -> set[int]:
+        channel_ids = set()
+        for route in self.services_in(guild_id):
+            channel_ids.update(c for g, c in route if g == guild_id)
+        return channel_ids
+
+    def _forget_service(self, guild_id: int, service_id: int):
+        services = self._guild_services.get(guild_id)
+        if services is not None:
+            services.discard(service_id)
+            if not services:
+                del self._guild_services[guild_id]
+
+    def _drop_guild_webhook(self, route: Route, guild_id: int):
+        for g, channel_id in route:
+            if g == guild_id:
+                self._webhooks.pop(channel_id, None)
+
+    def _store(self, route: Route):
+        self._by_id[route.service_id] = route
+        self._by_path[route.webhook_path] = route
+
+    async def _read(self, db: Database):
+        by_id: dict[int, Route] = {}
+        webhooks: dict[int, tuple[int, str]] = {}
+        guild_services: dict[int, set[int]] = {}
+        for service_id, name, webhook_path in await db.fetchall(LIST_ROUTE_SERVICES):
+            by_id[service_id] = Route(service_id, name, webhook_path)
+
+        for (service_id, guild_id, channel_id, webhook_id, webhook_token,
+             events, min_severity, components) in await db.fetchall(LIST_ROUTE_CHANNELS):
+            route = by_id.get(service_id)
+            if route is not None and self.scope.owns(guild_id):
+                route.guild_ids.append(guild_id)
+                route.channel_ids.append(channel_id)
+                guild_services.setdefault(guild_id, set()).add(service_id)
+                subscription_filter = compile_filter(events, min_severity, components)
+                if subscription_filter is not None:
+                    route.filters[guild_id] = subscription_filter
+                if webhook_id and webhook_token:
+                    webhooks[channel_id] = (webhook_id, webhook_token)
+
+        for guild_id in self._muted:
+            for service_id in guild_services.get(guild_id, ()):
+                by_id[service_id].muted = by_id[service_id].muted | {guild_id}
+
+        return {route.webhook_path: route for route in by_id.values()}, by_id, webhooks, guild_services
@@ -1,162 +1,117 @@
 from fastapi import FastAPI, Request, HTTPException
-import sqlite3
-import discord
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from discord.ext import commands
-import os
-import json
+import math
+import sqlite3
+import time
 from typing import Optional
-from datetime import datetime
-import asyncio
+from . import metrics
+from .bulk import SubscriptionImport, authorize, export_lines, read_lines
+from .parsing import PayloadError, parse_payload, read_body
+from .routing import Route
 
 app = FastAPI()
 
 def get_bot() -> Optional[commands.Bot]:
     return app.state.bot
 
-def get_service_channels(service_path: str) -> list[tuple[str, int, int]]:
-    with sqlite3.connect("config/services.db") as conn:
-        return conn.execute("""
-            SELECT s.name, sc.channel_id, sc.guild_id
-            FROM services s
-            JOIN server_channels sc ON s.id = sc.service_id
-            WHERE s.webhook_path = ?
-        """, (service_path,)).fetchall()
-
-def format_statuspage_notification(payload: dict, service_name: str) -> discord.Embed:
-    embed = discord.Embed(
-        title=f"{service_name} Status Update",
-        timestamp=datetime.utcnow(),
-        color=discord.Color.blue()
-    )
-    
-    # Handle page status
-    if "page" in payload:
-        page = payload["page"]
-        status_desc = page.get("status_description", "")
-        indicator = page.get("status_indicator", "")
-        
-        # Set color based on status indicator
-        if indicator in ["none", "operational"]:
-            embed.color = discord.Color.green()
-        elif indicator in ["minor", "degraded_performance"]:
-            embed.color = discord.Color.orange()
-        elif indicator in ["major", "critical"]:
-            embed.color = discord.Color.red()
-            
-        if status_desc:
-            embed.add_field(
-                name="Overall Status",
-                value=status_desc,
-                inline=False
-            )
-
-    # Handle component updates
-    if "component_update" in payload and "component" in payload:
-        component = payload["component"]
-        update = payload["component_update"]
-        
-        embed.add_field(
-            name="Component",
-            value=component.get("name", "Unknown Component"),
-            inline=False
-        )
-        
-        old_status = update.get("old_status", "unknown").replace("_", " ").title()
-        new_status = update.get("new_status", "unknown").replace("_", " ").title()
-        
-        embed.add_field(
-            name="Status Change",
-            value=f"{old_status} → {new_status}",
-            inline=False
-        )
-        
-        if update.get("created_at"):
-            embed.timestamp = datetime.fromisoformat(
-                update["created_at"].replace("Z", "+00:00")
-            )
-
-    # Handle incident updates
-    if "incident" in payload:
-        incident = payload["incident"]
-        
-        if incident.get("name"):
-            embed.add_field(
-                name="Incident",
-                value=incident["name"],
-                inline=False
-            )
-        
-        status = incident.get("status", "").replace("_", " ").title()
-        impact = incident.get("impact", "").replace("_", " ").title()
-        
-        if status:
-            embed.add_field(name="Status", value=status, inline=True)
-        if impact:
-            embed.add_field(name="Impact", value=impact, inline=True)
-        
-        if incident.get("incident_updates"):
-            updates = incident["incident_updates"]
-            if updates:
-                latest_update = updates[0]
-                embed.add_field(
-                    name="Latest Update",
-                    value=latest_update.get("body", "No details available"),
-                    inline=False
-                )
-                
-                if latest_update.get("created_at"):
-                    embed.timestamp = datetime.fromisoformat(
-                        latest_update["created_at"].replace("Z", "+00:00")
-                    )
-
-    return embed
+def get_service_channels(service_path: str) -> Optional[Route]:
+    bot = get_bot()
+    return bot.routes.get(service_path) if bot else None
 
-@app.post("/webhook/{service_name}")
+@app.post("/webhook/{service_name}", status_code=202)
 async def webhook_handler(service_name: str, request: Request):
-    service_path = f"/webhook/{service_name}"
+    started = time.perf_counter()
+    try:
+        return await _accept_webhook(service_name, request)
+    finally:
+        # Unknown names come straight from the URL, so they share one label
+        known = get_service_channels(f"/webhook/{service_name}") is not None
+        metrics.WEBHOOK_INTAKE_SECONDS.labels(service_name if known else "unknown").observe(time.perf_counter() - started)
+
+async def _accept_webhook(service_name: str, request: Request):
+    # Oversized and malformed bodies are turned away before any bot or database work
     try:
-        payload = await request.json()
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+        event = parse_payload(await read_body(request))
+    except PayloadError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
+
+    bot = get_bot()
+    if not bot or not bot.delivery.running:
+        raise HTTPException(
+            status_code=503,
+            detail="Bot not initialized",
+            headers={"Retry-After": "5"}
+        )
 
-    channels = get_service_channels(service_path)
-    if not channels:
+    # Hand the fan-out to the delivery workers and acknowledge straight away
+    status, channels = bot.delivery.accept_webhook(service_name, event)
+    if status == "no_channels":
         raise HTTPException(
             status_code=400,
             detail="No channels configured for this service"
         )
-
-    bot = get_bot()
-    if not bot:
+    if status in ("duplicate", "filtered"):
+        return JSONResponse(status_code=200, content={"status": status})
+    if status == "full":
+        print(f"Delivery queue full, rejecting webhook for {service_name}")
         raise HTTPException(
-            status_code=500,
-            detail="Bot not initialized"
+            status_code=503,
+            detail="Delivery queue is full",
+            headers={"Retry-After": str(bot.delivery.retry_after)}
         )
 
-    # Format the notification
-    embed = format_statuspage_notification(payload, service_name)
+    return {"status": "queued", "channels": len(channels), "queue_depth": bot.delivery.depth}
 
-    # Send to all configured channels
-    failed_channels = []
-    for service_name, channel_id, guild_id in channels:
-        channel = bot.get_channel(channel_id)
-        if channel:
-            try:
-                future = asyncio.run_coroutine_threadsafe(
-                    channel.send(embed=embed),
-                    bot.loop
-                )
-                future.result(timeout=10)
-            except Exception as e:
-                print(f"Error sending to channel {channel_id} in guild {guild_id}: {e}")
-                failed_channels.append(channel_id)
+@app.get("/subscriptions/export")
+async def export_subscriptions(request: Request):
+    authorize(request)
+    bot = get_bot()
+    if not bot or not bot.delivery.running:
+        raise HTTPException(status_code=503, detail="Bot not initialized", headers={"Retry-After": "5"})
+    return StreamingResponse(export_lines(bot.db), media_type="application/x-ndjson")
 
-    if failed_channels:
-        print(f"Failed to send to channels: {failed_channels}")
-        if len(failed_channels) == len(channels):
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to send message to all Discord channels"
-            )
+@app.post("/subscriptions/import")
+async def import_subscriptions(request: Request):
+    authorize(request)
+    bot = get_bot()
+    if not bot or not bot.delivery.running:
+        raise HTTPException(status_code=503, detail="Bot not initialized", headers={"Retry-After": "5"})
 
-    return {"status": "ok", "failed_channels": failed_channels} 
\ No newline at end of file
+    # Chunks committed before a failure stay committed; the summary says how far the import got
+    job = SubscriptionImport(bot)
+    try:
+        await job.run(read_lines(request))
+    except PayloadError as e:
+        return JSONResponse(status_code=e.status, content={"detail": e.detail, **job.summary()})
+    except sqlite3.Error as e:
+        print(f"Database error during subscription import: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Database error", **job.summary()})
+    return job.summary()
+
+@app.get("/queue")
+async def queue_status():
+    bot = get_bot()
+    if not bot:
+        raise HTTPException(status_code=503, detail="Bot not initialized")
+    stats = bot.delivery.stats()
+    if bot.ingest:
+        stats["ingest"] = bot.ingest.stats()
+    if bot.poller:
+        stats["polling"] = bot.poller.stats()
+    stats["dashboards"] = bot.dashboards.stats()
+    return stats
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    bot = get_bot()
+    if bot and bot.delivery.running:
+        # Point-in-time values are read at scrape time rather than tracked on the hot path
+        metrics.QUEUE_DEPTH.labels("delivery").set(bot.delivery.depth)
+        metrics.QUEUE_DEPTH.labels("retry").set(bot.delivery.outbox.retry_depth)
+        metrics.QUEUE_DEPTH.labels("coalescing").set(bot.delivery.coalescer.held)
+        metrics.GATEWAY_LATENCY.clear()
+        for shard_id, latency in bot.latencies:
+            if math.isfinite(latency):
+                metrics.GATEWAY_LATENCY.labels(shard_id).set(latency)
+    return PlainTextResponse(metrics.expose(), media_type="text/plain; version=0.0.4")
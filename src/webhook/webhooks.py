@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import aiohttp
+from discord.http import Route as DiscordRoute
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def webhook_mode_enabled() -> bool:
+    return os.getenv("DELIVERY_MODE", "bot") == "webhook"
+
+
+class WebhookSender:
+    """Posts notifications through per-channel Discord webhooks.
+
+    Webhook executions are rate limited per webhook rather than against the
+    bot's global bucket, so busy services don't compete with everything else
+    the bot sends. Requests share one pooled aiohttp session; each webhook's
+    bucket is tracked from the X-RateLimit headers and waited out before the
+    next request instead of running into a 429.
+    """
+
+    def __init__(self):
+        self.pool_size = int(os.getenv("WEBHOOK_POOL_SIZE", "100"))
+        self.timeout = float(os.getenv("FANOUT_SEND_TIMEOUT", "10"))
+        self.max_retries = int(os.getenv("FANOUT_MAX_RETRIES", "3"))
+        self.session: aiohttp.ClientSession | None = None
+        # webhook_id -> loop time at which its exhausted bucket resets
+        self._resets: dict[int, float] = {}
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def send(self, webhook_id: int, token: str, body: bytes) -> str | None:
+        """Execute the webhook with a pre-serialized JSON body.
+
+        Returns the failure reason, or None on success.
+
+        "webhook_missing" means the webhook was deleted or its token is no
+        longer valid, and the caller should fall back to sending as the bot.
+        """
+        loop = asyncio.get_running_loop()
+        url = f"{DiscordRoute.BASE}/webhooks/{webhook_id}/{token}"
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._resets.get(webhook_id, 0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                async with self.session.post(url, data=body, headers=JSON_HEADERS) as response:
+                    self._track_bucket(webhook_id, response.headers)
+                    if response.status < 300:
+                        return None
+                    if response.status in (401, 404):
+                        return "webhook_missing"
+                    if response.status == 403:
+                        return "forbidden"
+                    if response.status != 429:
+                        print(f"Webhook {webhook_id} returned HTTP {response.status}")
+                        return f"http_{response.status}"
+                    retry_after = float(response.headers.get("Retry-After", 1))
+            except asyncio.TimeoutError:
+                return "timeout"
+            except aiohttp.ClientError as e:
+                print(f"Error executing webhook {webhook_id}: {e}")
+                return "error"
+
+            print(f"Webhook {webhook_id} rate limited, retrying in {retry_after:.2f}s")
+            self._resets[webhook_id] = loop.time() + retry_after
+
+        return "rate_limited"
+
+    def _track_bucket(self, webhook_id: int, headers):
+        if headers.get("X-RateLimit-Remaining") == "0":
+            reset_after = float(headers.get("X-RateLimit-Reset-After", 0))
+            self._resets[webhook_id] = asyncio.get_running_loop().time() + reset_after
+        else:
+            self._resets.pop(webhook_id, None)
@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+
+from src.bot.database import Database
+from src.bot.migrations import MIGRATIONS, check_query_plans, migrate
+
+# What BaseServiceCog created before the schema was versioned, plus an outbox
+# table the delivery code used to create on its own
+LEGACY_SCHEMA = """
+    CREATE TABLE services (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        webhook_path TEXT UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE server_channels (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        service_id INTEGER,
+        guild_id INTEGER,
+        channel_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(service_id, guild_id),
+        FOREIGN KEY(service_id) REFERENCES services(id)
+    );
+    CREATE TABLE outbox_events (
+        id TEXT PRIMARY KEY,
+        service_name TEXT,
+        payload TEXT,
+        embed TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT INTO services (name, webhook_path) VALUES ('github', '/webhook/github');
+    INSERT INTO server_channels (service_id, guild_id, channel_id) VALUES (1, 10, 100);
+    INSERT INTO outbox_events (id, service_name, payload, embed) VALUES ('e1', 'github', '{}', '{}');
+"""
+
+
+def migrate_database(path: str) -> tuple[int, list[str], Database]:
+    async def run():
+        db = Database(path)
+        await db.connect()
+        try:
+            await migrate(db)
+            version = (await db.fetchone("PRAGMA user_version"))[0]
+            return version, await check_query_plans(db), await db.fetchall(
+                "SELECT s.name, c.guild_id, c.channel_id, c.filter_events FROM server_channels c "
+                "JOIN services s ON s.id = c.service_id"
+            )
+        finally:
+            await db.close()
+
+    return asyncio.run(run())
+
+
+def test_migrates_an_empty_database(tmp_path):
+    version, scans, rows = migrate_database(str(tmp_path / "services.db"))
+    assert version == len(MIGRATIONS)
+    assert scans == []
+    assert rows == []
+
+
+def test_migrates_a_baseline_database(tmp_path):
+    path = str(tmp_path / "services.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+
+    version, scans, rows = migrate_database(path)
+    assert version == len(MIGRATIONS)
+    assert scans == []
+    assert rows == [("github", 10, 100, "all")]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT id FROM outbox_events").fetchall() == [("e1",)]
+
+
+def test_migrate_is_idempotent(tmp_path):
+    path = str(tmp_path / "services.db")
+    migrate_database(path)
+    version, scans, _ = migrate_database(path)
+    assert version == len(MIGRATIONS)
+    assert scans == []